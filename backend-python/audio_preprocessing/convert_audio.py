@@ -7,8 +7,9 @@ from pydub import AudioSegment
 
 
 # Converts w.e file type to the correct WAV format
+# timeout (seconds): FFmpeg is killed and subprocess.TimeoutExpired raised when it takes longer
 
-def to_wav(input_path: str) -> AudioSegment | None:
+def to_wav(input_path: str, timeout: float | None = None) -> AudioSegment | None:
     # Create a temp file with a .wav extension to store the FFmpeg output
     with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
         output_path = tmp_file.name
@@ -27,12 +28,15 @@ def to_wav(input_path: str) -> AudioSegment | None:
     
     try:
         # Execute the FFmpeg Command
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout)
         
         # Load & return the converted WAV file into a pydub AudioSegment Object
         return pydub.AudioSegment.from_wav(output_path)
     
     # Error Handling
+    except subprocess.TimeoutExpired:
+        print(f"FFmpeg conversion timed out after {timeout}s")
+        raise
     except subprocess.CalledProcessError as e:
         print("Error during FFmpeg conversion:")
         print(f"Command: {' '.join(e.cmd)}")
@@ -0,0 +1,130 @@
+import argparse
+import time
+
+import numpy as np
+
+from tasks import transcribe, asr_backends
+from benchmarks.common import (
+    TEST_AUDIO_DIR,
+    REFERENCE_TRANSCRIPTS,
+    word_error_rate,
+    machine_info,
+    write_results
+)
+
+# --- ASR accuracy/speed comparison
+# Transcribes the tests/audio fixtures with each backend/load mode and reports WER and real-time factor (RTF)
+# RTF = processing time / audio duration, lower is faster (0.5 means twice as fast as real time)
+#
+# Usage (from backend-python):
+#   python -m benchmarks.asr_benchmark --model tiny --modes openai-whisper:fp32 faster-whisper:int8 --output asr.json
+
+# mode name -> (backend name, backend options), all on CPU
+LOAD_MODES = {
+    "openai-whisper:fp32": (asr_backends.OpenAIWhisperBackend.name, {"quantize": "none"}),
+    "openai-whisper:int8": (asr_backends.OpenAIWhisperBackend.name, {"quantize": "int8"}),
+    "faster-whisper:int8": (asr_backends.FasterWhisperBackend.name, {"compute_type": "int8"}),
+    "faster-whisper:fp32": (asr_backends.FasterWhisperBackend.name, {"compute_type": "float32"}),
+}
+
+
+def load_model(model_name: str, mode: str) -> asr_backends.ASRBackend:
+    """
+    Builds & loads the ASR backend for a load mode on the CPU
+    """
+    backend_name, backend_options = LOAD_MODES[mode]
+    backend = asr_backends.create_backend(backend_name, model_name, "cpu", **backend_options)
+    backend.load()
+    return backend
+
+
+def chunk_to_float32(audio_chunk) -> np.ndarray:
+    """
+    Converts a 16-bit pydub chunk to the float32 array Whisper expects
+    """
+    return np.array(audio_chunk.get_array_of_samples()).astype(np.float32) / 32768.0
+
+
+def benchmark_mode(model_name: str, mode: str, audio_files: list[str]) -> dict:
+    """
+    Transcribes every fixture chunk by chunk (same as the server pipeline) with one backend/load mode
+
+    Returns:
+        dict: Per-file WER/RTF plus totals for the mode.
+    """
+    print(f"Loading '{model_name}' ({mode})")
+    load_start = time.perf_counter()
+    model = load_model(model_name, mode)
+    load_seconds = time.perf_counter() - load_start
+
+    # Warm up so the first timed chunk doesn't pay for lazy init
+    model.transcribe(np.zeros(16000, dtype=np.float32), task="translate")
+
+    file_results = {}
+    total_audio_seconds = 0.0
+    total_processing_seconds = 0.0
+
+    for file_name in audio_files:
+        chunks = transcribe.prepare_audio(str(TEST_AUDIO_DIR / file_name))
+        if not chunks:
+            print(f"Skipping {file_name}: audio prep failed")
+            continue
+
+        audio_seconds = sum(len(chunk) for chunk in chunks) / 1000.0
+        texts = []
+
+        start = time.perf_counter()
+        for chunk in chunks:
+            result = model.transcribe(chunk_to_float32(chunk), task="translate")
+            texts.append(result.get("text", "").strip())
+        processing_seconds = time.perf_counter() - start
+
+        hypothesis = " ".join(texts)
+        file_results[file_name] = {
+            "audio_seconds": round(audio_seconds, 3),
+            "processing_seconds": round(processing_seconds, 3),
+            "rtf": round(processing_seconds / audio_seconds, 4),
+            "wer": round(word_error_rate(REFERENCE_TRANSCRIPTS[file_name], hypothesis), 4),
+            "hypothesis": hypothesis
+        }
+
+        total_audio_seconds += audio_seconds
+        total_processing_seconds += processing_seconds
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "rtf": round(total_processing_seconds / total_audio_seconds, 4) if total_audio_seconds else None,
+        "mean_wer": round(sum(r["wer"] for r in file_results.values()) / len(file_results), 4) if file_results else None,
+        "files": file_results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR backends & load modes on the tests/audio fixtures")
+    parser.add_argument("--model", default=transcribe.WHISPER_MODEL_NAME, help="Whisper model name")
+    parser.add_argument("--modes", nargs="+", default=list(LOAD_MODES), choices=list(LOAD_MODES))
+    parser.add_argument("--files", nargs="+", default=list(REFERENCE_TRANSCRIPTS.keys()))
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    results = {
+        "machine": machine_info(),
+        "model": args.model,
+        "modes": {}
+    }
+
+    for mode in args.modes:
+        results["modes"][mode] = benchmark_mode(args.model, mode, args.files)
+
+    # --- Summary table
+    print(f"\n{'mode':<22} {'RTF':>8} {'WER':>8} {'speedup':>8}")
+    baseline_rtf = results["modes"].get(args.modes[0], {}).get("rtf")
+    for mode, mode_result in results["modes"].items():
+        speedup = baseline_rtf / mode_result["rtf"] if baseline_rtf and mode_result["rtf"] else 0.0
+        print(f"{mode:<22} {mode_result['rtf'] or 0:>8.3f} {mode_result['mean_wer'] or 0:>8.3f} {speedup:>7.2f}x")
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
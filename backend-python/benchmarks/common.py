@@ -0,0 +1,97 @@
+import json
+import os
+import platform
+import re
+import time
+from pathlib import Path
+
+# --- Shared helpers for the benchmark scripts
+# Run scripts from the backend-python directory, e.g. `python -m benchmarks.asr_benchmark`
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEST_AUDIO_DIR = BASE_DIR / "tests" / "audio"
+
+# Reference transcripts for the tests/audio fixtures (same text as tests/api_t.py)
+REFERENCE_TRANSCRIPTS = {
+    "test_en.mp3": """Hey, I have something to show you. I cannot be interrupted. There's a new content cop. What? A new content cop. Content cop. I haven't heard that name in almost 10 years. Well, iDubbbz did a content cop on H3. Is this like when Gen X gets excited they're doing a Goonies remake? You're excited about this? I thought iDubbbz quit YouTube. No, he just stopped saying slurs. Exactly, I thought he quit YouTube. Look, a lot has changed on YouTube since 2015. Drama videos are now usually five and a half hours long. iDubbbz is woke. So much has changed. I got married, I have seven kids now. That's a weird amount of kids in a relatively short amount of time. I switched political ideologies, gosh, probably seven times. Those kids really messed you up, huh? I was a different person back then. I'm so much better off now. I'm glad that era of YouTube is over. Do you want to watch it? Okay.""",
+    "test_fa.mp3": """Dear friends, welcome to the Mashalv program. I took a new mic and I am very happy that I will be able to read beautiful poems for you. I am very happy to read poems from Afghanistan and Persian poetry. Thank you for your time, I love you. Have a nice day for everyone. Khuda hafiz. Keep an eye out for my content.""",
+}
+
+
+def reference_sentences() -> list[str]:
+    """
+    The reference transcripts split into sentences, material for synthetic transcripts & stub model outputs
+    """
+    return [
+        sentence.strip()
+        for text in REFERENCE_TRANSCRIPTS.values()
+        for sentence in re.split(r"(?<=[.?!])\s+", text)
+        if sentence.strip()
+    ]
+
+
+def normalize_text(text: str) -> list[str]:
+    """
+    Lowercases, strips punctuation and splits text into words for WER scoring
+    """
+    text = text.lower()
+    text = re.sub(r"[^\w\s']", " ", text)
+    return text.split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Word error rate: (substitutions + deletions + insertions) / reference word count.
+
+    Args:
+        reference (str): The expected transcript.
+        hypothesis (str): The transcript produced by the model.
+
+    Returns:
+        float: The WER (0.0 is a perfect match, can exceed 1.0 with many insertions).
+    """
+    ref_words = normalize_text(reference)
+    hyp_words = normalize_text(hypothesis)
+
+    if not ref_words:
+        return 0.0 if not hyp_words else 1.0
+
+    # Single row Levenshtein distance over words
+    previous_row = list(range(len(hyp_words) + 1))
+    for i, ref_word in enumerate(ref_words, start=1):
+        current_row = [i] + [0] * len(hyp_words)
+        for j, hyp_word in enumerate(hyp_words, start=1):
+            current_row[j] = min(
+                previous_row[j] + 1,        # Deletion
+                current_row[j - 1] + 1,     # Insertion
+                previous_row[j - 1] + (ref_word != hyp_word)  # Substitution
+            )
+        previous_row = current_row
+
+    return previous_row[-1] / len(ref_words)
+
+
+def machine_info() -> dict:
+    """
+    Basic info about the machine the benchmark ran on, so results can be compared
+    """
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def write_results(results: dict, output_path: str | None):
+    """
+    Writes benchmark results as JSON when an output path is given
+    """
+    if not output_path:
+        return
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"Results written to {output_path}")
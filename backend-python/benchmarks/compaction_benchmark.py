@@ -0,0 +1,104 @@
+import argparse
+import random
+
+from transformers import AutoTokenizer
+
+from tasks import summarize
+from benchmarks.common import reference_sentences, machine_info, write_results
+
+# --- Transcript compaction benchmark
+# Builds synthetic meetings of several lengths (speech from the reference transcripts, whisper sized
+# segments, speakers talking in runs of several segments) and compares the per-segment transcript
+# format with the compacted one: characters, LLM tokens and number of map chunks
+# Only the tokenizer is loaded, not the model
+#
+# Usage (from backend-python):
+#   python -m benchmarks.compaction_benchmark --minutes 10 60 180 --speakers 4 --output compaction.json
+
+
+def synthetic_meeting(minutes: int, speakers: int, seed: int = 0) -> list[dict]:
+    """
+    Merged segments (speaker, start, end, text) covering `minutes` of a meeting
+    """
+    rng = random.Random(seed)
+    sentences = reference_sentences()
+
+    segments = []
+    current_time = 0.0
+    speaker = 0
+    while current_time < minutes * 60:
+        # A turn of 1-6 segments, then someone else talks
+        for _ in range(rng.randint(1, 6)):
+            duration = rng.uniform(2.0, 8.0)
+            segments.append({
+                "speaker": f"SPEAKER_{speaker:02d}",
+                "start": round(current_time, 2),
+                "end": round(current_time + duration, 2),
+                "text": " ".join(rng.sample(sentences, rng.randint(1, 3)))
+            })
+            current_time += duration + rng.uniform(0.0, 1.0)
+        speaker = (speaker + rng.randint(1, speakers - 1)) % speakers if speakers > 1 else 0
+    return segments
+
+
+def measure(text: str) -> dict:
+    """
+    Size of one formatted transcript
+    """
+    tokens = len(summarize.llm_tokenizer_instance(text).input_ids)
+    map_chunks = 1 if len(text) <= summarize.SINGLE_PASS_CHUNK_SIZE else len(summarize.chunk_text_with_overlap(text))
+    return {
+        "characters": len(text),
+        "tokens": tokens,
+        "map_chunks": map_chunks
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens saved by transcript compaction")
+    parser.add_argument("--minutes", nargs="+", type=int, default=[10, 60, 180])
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    summarize.llm_tokenizer_instance = AutoTokenizer.from_pretrained(
+        summarize.LLM_MODEL_NAME,
+        token=summarize.HUGGING_FACE_HUB_TOKEN if summarize.HUGGING_FACE_HUB_TOKEN else None
+    )
+
+    results = {
+        "machine": machine_info(),
+        "model": summarize.LLM_MODEL_NAME,
+        "timestamp_interval": summarize.TRANSCRIPT_TIMESTAMP_INTERVAL,
+        "turn_gap": summarize.TRANSCRIPT_TURN_GAP,
+        "meetings": []
+    }
+
+    for minutes in args.minutes:
+        segments = synthetic_meeting(minutes, args.speakers)
+        original = measure(summarize.format_transcript_for_llm(segments))
+        compacted = measure(summarize.format_transcript_for_llm(segments, compactor=summarize.TranscriptCompactor()))
+
+        results["meetings"].append({
+            "minutes": minutes,
+            "segments": len(segments),
+            "original": original,
+            "compacted": compacted,
+            "token_reduction": round(1 - compacted["tokens"] / original["tokens"], 4)
+        })
+
+    # --- Summary table
+    print(f"\n{'minutes':>7} {'segments':>9} {'tokens':>9} {'compact':>9} {'saved':>7} {'chunks':>7} {'compact':>8}")
+    for meeting in results["meetings"]:
+        print(
+            f"{meeting['minutes']:>7} {meeting['segments']:>9} "
+            f"{meeting['original']['tokens']:>9} {meeting['compacted']['tokens']:>9} "
+            f"{meeting['token_reduction']:>7.1%} "
+            f"{meeting['original']['map_chunks']:>7} {meeting['compacted']['map_chunks']:>8}"
+        )
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import itertools
+import time
+
+from pyannote.audio import Audio
+
+from tasks import diarize
+from benchmarks.common import (
+    TEST_AUDIO_DIR,
+    REFERENCE_TRANSCRIPTS,
+    machine_info,
+    write_results
+)
+
+# --- Diarization speed benchmark
+# Diarizes the tests/audio fixtures once per combination of settings and reports
+# processing seconds per minute of audio (lower is faster)
+#
+# Usage (from backend-python):
+#   python -m benchmarks.diarization_benchmark --segmentation-batch-sizes 1 32 --embedding-batch-sizes 1 32 --num-speakers 0 2
+#   python -m benchmarks.diarization_benchmark --backends pytorch onnx   # PyTorch vs ONNX Runtime speed
+
+
+def parse_optional_ints(values: list[int]) -> list[int | None]:
+    """ 0 on the command line means "not set" (let pyannote decide / keep the default) """
+    return [value or None for value in values]
+
+
+def benchmark_setting(options: dict, audio_files: list[str], repeats: int) -> dict:
+    """
+    Diarizes every file with one set of options (best of `repeats` runs per file)
+
+    Returns:
+        dict: Per-file timings and the overall seconds per audio minute.
+    """
+    file_results = {}
+    total_audio_seconds = 0.0
+    total_processing_seconds = 0.0
+
+    for file_name in audio_files:
+        file_path = str(TEST_AUDIO_DIR / file_name)
+        audio_seconds = Audio().get_duration(file_path)
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            speaker_segments = diarize.diarize_file(file_path, options)
+            timings.append(time.perf_counter() - start)
+
+        processing_seconds = min(timings)
+        file_results[file_name] = {
+            "audio_seconds": round(audio_seconds, 3),
+            "processing_seconds": round(processing_seconds, 3),
+            "seconds_per_audio_minute": round(processing_seconds / (audio_seconds / 60.0), 3),
+            "speakers": len({segment["speaker"] for segment in speaker_segments})
+        }
+
+        total_audio_seconds += audio_seconds
+        total_processing_seconds += processing_seconds
+
+    return {
+        "options": options,
+        "seconds_per_audio_minute": round(total_processing_seconds / (total_audio_seconds / 60.0), 3),
+        "files": file_results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diarization time per audio minute for each setting")
+    parser.add_argument("--segmentation-batch-sizes", nargs="+", type=int, default=[0])
+    parser.add_argument("--embedding-batch-sizes", nargs="+", type=int, default=[0])
+    parser.add_argument("--num-speakers", nargs="+", type=int, default=[0])
+    parser.add_argument("--backends", nargs="+", default=[diarize.DIARIZATION_BACKEND], choices=["pytorch", "onnx"])
+    parser.add_argument("--files", nargs="+", default=list(REFERENCE_TRANSCRIPTS.keys()))
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    results = {
+        "machine": machine_info(),
+        "pipeline": diarize.PYANNOTE_PIPELINE_NAME,
+        "settings": []
+    }
+
+    for backend in args.backends:
+        # Fresh pipeline per backend, the ONNX swap modifies the loaded pipeline in place
+        diarize.pyannote_pipeline_instance = None
+        diarize.load_pyannote_pipeline(from_local_cache_only=False, backend=backend)
+        if diarize.pyannote_pipeline_instance is None:
+            raise SystemExit("Pyannote pipeline failed to load")
+
+        # Warm up (first call pays for lazy init)
+        diarize.diarize_file(str(TEST_AUDIO_DIR / args.files[0]), diarize.resolve_diarization_options())
+
+        for segmentation_batch_size, embedding_batch_size, num_speakers in itertools.product(
+            parse_optional_ints(args.segmentation_batch_sizes),
+            parse_optional_ints(args.embedding_batch_sizes),
+            parse_optional_ints(args.num_speakers)
+        ):
+            options = diarize.resolve_diarization_options(
+                num_speakers=num_speakers,
+                segmentation_batch_size=segmentation_batch_size,
+                embedding_batch_size=embedding_batch_size
+            )
+            print(f"Benchmarking {backend}: {options}")
+            setting_result = benchmark_setting(options, args.files, args.repeats)
+            setting_result["backend"] = backend
+            results["settings"].append(setting_result)
+
+    # --- Summary table
+    print(f"\n{'backend':<8} {'seg bs':>7} {'emb bs':>7} {'speakers':>9} {'s / audio min':>14}")
+    for setting in results["settings"]:
+        options = setting["options"]
+        print(
+            f"{setting['backend']:<8} "
+            f"{options['segmentation_batch_size'] or '-':>7} "
+            f"{options['embedding_batch_size'] or '-':>7} "
+            f"{options['num_speakers'] or '-':>9} "
+            f"{setting['seconds_per_audio_minute']:>14.3f}"
+        )
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
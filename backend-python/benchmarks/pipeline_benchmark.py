@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from main import merge_transcription_and_diarization
+from audio_preprocessing import chunk_audio, convert_audio, trim_silence
+from tasks import diarize, summarize, transcribe
+from tasks.fake_backends import (
+    LatencyProfile,
+    FakeASRBackend,
+    FakeDiarizationPipeline,
+    FakeTokenizer,
+    FakeLLM,
+    fake_summary_text
+)
+from tasks.model_registry import model_registry
+from utils.cache import TwoTierCache
+from benchmarks.common import reference_sentences, machine_info, write_results
+from benchmarks.synthetic_audio import synthetic_speech
+
+# --- Pipeline benchmark
+# Generates synthetic speech-like audio (see synthetic_audio.py, no recordings or network needed),
+# times every pipeline stage on its own, then runs the whole /transcribe_and_diarize + /summarize path
+# (diarize -> transcribe -> merge -> summarize) with fake or real models.
+#
+# Fake models (tasks/fake_backends.py) keep the plumbing (scheduler, registry, chunking, merge, prompt building,
+# parsing) real and replace the inference with a latency proportional to the input, so numbers from two machines
+# or two commits are comparable. Their FAKE_* env settings (distribution, CPU burn, failures) apply, the mean
+# latencies come from the command line. Real models must already be in the local cache (HF_HUB_OFFLINE=1).
+# Caches & chunk checkpoints are disabled, every repeat does the full work.
+#
+# Usage (from backend-python):
+#   python -m benchmarks.pipeline_benchmark --minutes 5 30 --speakers 3 --models fake --output pipeline.json
+#   python -m benchmarks.pipeline_benchmark --minutes 10 --models real --e2e-repeats 1
+
+
+# --- Stage benchmarks
+def time_stage(fn, repeats: int) -> tuple[dict, object]:
+    """
+    Runs fn `repeats` times, returns its timings and the last result.
+    Stage functions log a lot, their output is swallowed so terminal speed doesn't count.
+    """
+    timings = []
+    result = None
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+    return {
+        "repeats": repeats,
+        "min_seconds": round(min(timings), 5),
+        "median_seconds": round(statistics.median(timings), 5)
+    }, result
+
+
+def benchmark_stages(input_path: str, turns: list[dict], repeats: int, seed: int) -> tuple[dict, dict]:
+    """
+    Times each preprocessing / postprocessing step on its own, the output of one step is the input of the next.
+    Transcription results come from the fake ASR (no latency) so the merge gets a realistic amount of segments.
+
+    Returns:
+        tuple[dict, dict]: Timings per stage, sizes of the intermediate results.
+    """
+    stages = {}
+
+    stages["convert_audio.to_wav"], audio_wav = time_stage(lambda: convert_audio.to_wav(input_path), repeats)
+    if audio_wav is None:
+        raise RuntimeError("FFmpeg conversion failed (is ffmpeg installed?)")
+
+    stages["trim_silence.apply"], _ = time_stage(lambda: trim_silence.apply(audio_wav), repeats)
+    stages["chunk_audio.split"], chunks = time_stage(lambda: chunk_audio.split(audio_wav), repeats)
+
+    fake_asr = FakeASRBackend("fake", profile=LatencyProfile())
+    transcription_results = [fake_asr.transcribe(transcribe.chunk_to_float32(chunk)) for chunk in chunks]
+
+    stages["merge_transcription_and_diarization"], merged_segments = time_stage(
+        lambda: merge_transcription_and_diarization(transcription_results, turns, len(audio_wav)),
+        repeats
+    )
+    stages["format_transcript_for_llm"], transcript_text = time_stage(
+        lambda: summarize.format_transcript_for_llm(merged_segments),
+        repeats
+    )
+    stages["format_transcript_for_llm:compacted"], compacted_text = time_stage(
+        lambda: summarize.format_transcript_for_llm(merged_segments, compactor=summarize.TranscriptCompactor()),
+        repeats
+    )
+    stages["chunk_text_with_overlap"], text_chunks = time_stage(
+        lambda: summarize.chunk_text_with_overlap(transcript_text),
+        repeats
+    )
+
+    # A complete structured output followed by the kind of rambling the stopping criteria cut off
+    llm_output = fake_summary_text(random.Random(seed), key_points=12) + "\n" + " ".join(reference_sentences())
+    stages["parse_llm_output"], _ = time_stage(lambda: summarize.parse_llm_output(llm_output), repeats)
+
+    sizes = {
+        "audio_chunks": len(chunks),
+        "merged_segments": len(merged_segments),
+        "transcript_characters": len(transcript_text),
+        "compacted_characters": len(compacted_text),
+        "text_chunks": len(text_chunks)
+    }
+    return stages, sizes
+
+
+# --- End to end
+def fake_profile(prefix: str, seconds_per_unit: float) -> LatencyProfile:
+    """ The FAKE_* env settings of a model with the mean latency from the command line """
+    profile = LatencyProfile.from_env(prefix, seconds_per_unit)
+    profile.seconds_per_unit = seconds_per_unit
+    return profile
+
+
+def setup_models(models: str, args: argparse.Namespace) -> str:
+    """
+    Loads the real models or installs the fakes, returns the Whisper model name to transcribe with
+    """
+    # Repeats must do the full work
+    transcribe.CHUNK_CHECKPOINT_DIR = ""
+    summarize.summary_cache = TwoTierCache("summary", 0)
+
+    if models == "real":
+        transcribe.load_whisper_model()
+        diarize.load_pyannote_pipeline(from_local_cache_only=True)
+        model_registry.load(summarize.LLM_MODEL_KEY)
+        return transcribe.WHISPER_MODEL_NAME
+
+    def load_fake_asr():
+        backend = FakeASRBackend("fake", profile=fake_profile("FAKE_WHISPER", args.fake_asr_rtf))
+        backend.load()
+        return backend
+
+    model_registry.register(transcribe.whisper_key(FakeASRBackend.name), load_fake_asr)
+    diarize.pyannote_pipeline_instance = FakeDiarizationPipeline(profile=fake_profile("FAKE_DIARIZATION", args.fake_diarization_rtf))
+    summarize.llm_tokenizer_instance = FakeTokenizer()
+    summarize.llm_model_instance = FakeLLM(
+        summarize.llm_tokenizer_instance,
+        profile=fake_profile("FAKE_LLM", args.fake_llm_ms_per_token / 1000)
+    )
+    return FakeASRBackend.name
+
+
+async def run_end_to_end(input_path: str, audio_length_ms: int, whisper_model: str) -> dict:
+    """
+    One request's worth of work, in the order /transcribe_and_diarize and /summarize run it
+    """
+    seconds = {}
+    total_start = time.perf_counter()
+
+    start = time.perf_counter()
+    diarization_segments = await diarize.run(input_path)
+    seconds["diarization"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transcription_results = await transcribe.run_transcription_pipeline(input_path, model_name=whisper_model)
+    seconds["transcription"] = time.perf_counter() - start
+
+    if diarization_segments is None or transcription_results is None:
+        raise RuntimeError("Diarization or transcription failed")
+
+    start = time.perf_counter()
+    merged_segments = merge_transcription_and_diarization(transcription_results, diarization_segments, audio_length_ms)
+    seconds["merge"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = await summarize.run(merged_segments)
+    seconds["summarization"] = time.perf_counter() - start
+
+    seconds["total"] = time.perf_counter() - total_start
+    return {
+        "seconds": {stage: round(value, 4) for stage, value in seconds.items()},
+        "speakers_found": len({segment["speaker"] for segment in diarization_segments}),
+        "merged_segments": len(merged_segments),
+        "summary_ok": bool(summary) and "error" not in summary and "Error" not in summary
+    }
+
+
+def benchmark_end_to_end(input_path: str, audio_length_ms: int, whisper_model: str, repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs.append(asyncio.run(run_end_to_end(input_path, audio_length_ms, whisper_model)))
+
+    results = dict(runs[-1])
+    results["repeats"] = repeats
+    results["seconds"] = {
+        stage: round(statistics.median(run["seconds"][stage] for run in runs), 4)
+        for stage in runs[-1]["seconds"]
+    }
+    results["real_time_factor"] = round(results["seconds"]["total"] / (audio_length_ms / 1000), 4)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage and end to end pipeline timings on synthetic audio")
+    parser.add_argument("--minutes", nargs="+", type=float, default=[5, 30], help="Lengths of synthetic audio to run")
+    parser.add_argument("--speakers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--input-format", default="mp3", help="Container the synthetic audio is uploaded as (ffmpeg format)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per stage, the min & median are reported")
+    parser.add_argument("--models", choices=["fake", "real", "none"], default="fake", help="Models for the end to end run (none skips it)")
+    parser.add_argument("--e2e-repeats", type=int, default=1)
+    parser.add_argument("--fake-asr-rtf", type=float, default=0.02, help="Fake Whisper seconds per audio second")
+    parser.add_argument("--fake-diarization-rtf", type=float, default=0.01, help="Fake pyannote seconds per audio second")
+    parser.add_argument("--fake-llm-ms-per-token", type=float, default=2.0, help="Fake LLM milliseconds per generated token")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    whisper_model = setup_models(args.models, args) if args.models != "none" else None
+
+    results = {"machine": machine_info(), "config": vars(args), "runs": []}
+    for minutes in args.minutes:
+        print(f"\n{minutes:g} min, {args.speakers} speakers")
+
+        synthesis_start = time.perf_counter()
+        audio, turns = synthetic_speech(minutes * 60, args.speakers, seed=args.seed)
+        synthesis_seconds = time.perf_counter() - synthesis_start
+
+        with tempfile.NamedTemporaryFile(suffix=f".{args.input_format}", delete=False) as tmp_file:
+            input_path = tmp_file.name
+        try:
+            audio.export(input_path, format=args.input_format)
+
+            stages, sizes = benchmark_stages(input_path, turns, args.repeats, args.seed)
+            for stage, timing in stages.items():
+                timing["seconds_per_audio_minute"] = round(timing["median_seconds"] / minutes, 5)
+                print(f"  {stage:<40} median {timing['median_seconds']:.4f}s  min {timing['min_seconds']:.4f}s")
+
+            run = {
+                "minutes": minutes,
+                "speakers": args.speakers,
+                "audio": {
+                    "duration_seconds": len(audio) / 1000,
+                    "turns": len(turns),
+                    "file_bytes": os.path.getsize(input_path),
+                    "synthesis_seconds": round(synthesis_seconds, 3)
+                },
+                "sizes": sizes,
+                "stages": stages
+            }
+
+            if whisper_model is not None:
+                run["end_to_end"] = benchmark_end_to_end(input_path, len(audio), whisper_model, args.e2e_repeats)
+                end_to_end = run["end_to_end"]
+                print(f"  end to end ({args.models}): {end_to_end['seconds']} RTF {end_to_end['real_time_factor']}, "
+                      f"{end_to_end['speakers_found']} speakers found, summary ok: {end_to_end['summary_ok']}")
+
+            results["runs"].append(run)
+        finally:
+            os.remove(input_path)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
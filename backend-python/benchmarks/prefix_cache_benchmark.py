@@ -0,0 +1,102 @@
+import argparse
+import copy
+import statistics
+import time
+
+import torch
+
+from tasks import summarize
+from benchmarks.common import machine_info, write_results
+
+# --- Shared prefix KV cache benchmark
+# For every prompt type, times prefill of a full prompt vs prefill of only the tokens after the
+# cached prefix (including the cost of copying the cache), i.e. the time saved per LLM call
+#
+# Usage (from backend-python):
+#   python -m benchmarks.prefix_cache_benchmark --repeats 5 --output prefix.json
+
+SAMPLE_SEGMENTS = [
+    {"speaker": "SPEAKER_00", "start": 0.0, "end": 5.5, "text": "Thanks for joining, let's go over the release plan."},
+    {"speaker": "SPEAKER_01", "start": 6.0, "end": 10.2, "text": "The backend is ready, the mobile app still needs review."},
+    {"speaker": "SPEAKER_00", "start": 11.0, "end": 15.0, "text": "Can you finish the review by Friday?"},
+    {"speaker": "SPEAKER_01", "start": 16.0, "end": 20.0, "text": "Yes, I will complete it by Friday."},
+]
+
+
+def time_prefill(input_ids: torch.Tensor, prefix_cache: dict | None) -> float:
+    """
+    One prefill forward pass, with or without the cached prefix
+    """
+    with torch.no_grad():
+        start = time.perf_counter()
+        if prefix_cache is None:
+            summarize.llm_model_instance(input_ids, use_cache=True)
+        else:
+            past_key_values = copy.deepcopy(prefix_cache["past_key_values"])
+            summarize.llm_model_instance(
+                input_ids[:, prefix_cache["tokens"]:],
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefill time saved per call by the shared prefix KV cache")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    summarize.load_llm_model()
+    if summarize.llm_model_instance is None:
+        raise SystemExit("LLM failed to load")
+    if not summarize.prompt_prefix_caches:
+        summarize.build_prompt_prefix_caches()
+
+    content = summarize.format_transcript_for_llm(SAMPLE_SEGMENTS)
+
+    results = {
+        "machine": machine_info(),
+        "model": summarize.LLM_MODEL_NAME,
+        "device": summarize.DEVICE,
+        "prompt_types": {}
+    }
+
+    for prompt_type in summarize.PREFIX_CACHED_PROMPT_TYPES:
+        prompt = summarize.get_llm_prompt(prompt_type, content)
+        input_ids = summarize.llm_tokenizer_instance(prompt, return_tensors="pt").input_ids.to(summarize.DEVICE)
+
+        prefix_cache = summarize.find_prompt_prefix_cache(input_ids)
+        if prefix_cache is None:
+            print(f"Skipping '{prompt_type}': no matching prefix cache")
+            continue
+
+        # Warm up both paths
+        time_prefill(input_ids, None)
+        time_prefill(input_ids, prefix_cache)
+
+        full_seconds = statistics.median(time_prefill(input_ids, None) for _ in range(args.repeats))
+        cached_seconds = statistics.median(time_prefill(input_ids, prefix_cache) for _ in range(args.repeats))
+
+        results["prompt_types"][prompt_type] = {
+            "prompt_tokens": input_ids.shape[-1],
+            "prefix_tokens": prefix_cache["tokens"],
+            "full_prefill_seconds": round(full_seconds, 4),
+            "cached_prefill_seconds": round(cached_seconds, 4),
+            "saved_seconds_per_call": round(full_seconds - cached_seconds, 4)
+        }
+
+    # --- Summary table
+    print(f"\n{'prompt type':<32} {'prefix':>7} {'prompt':>7} {'full s':>8} {'cached s':>9} {'saved s':>8}")
+    for prompt_type, result in results["prompt_types"].items():
+        print(
+            f"{prompt_type:<32} {result['prefix_tokens']:>7} {result['prompt_tokens']:>7} "
+            f"{result['full_prefill_seconds']:>8.3f} {result['cached_prefill_seconds']:>9.3f} "
+            f"{result['saved_seconds_per_call']:>8.3f}"
+        )
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
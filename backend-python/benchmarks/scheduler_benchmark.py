@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils import scheduler
+from benchmarks.common import machine_info, write_results
+
+# --- Scheduler benchmark
+# Mixed synthetic load on one resource: a free user uploading a long file, other free users and
+# paid users sending short files over time. Every chunk is a sleep standing in for a Whisper call
+# (torch releases the GIL the same way), so the numbers show queuing behaviour, not model speed.
+# Compares request latency per tier with the shared FIFO thread pool vs the fair scheduler.
+#
+# Usage (from backend-python):
+#   python -m benchmarks.scheduler_benchmark --long-chunks 480 --short-jobs 40 --chunk-ms 20 --output scheduler.json
+
+
+def synthetic_load(long_chunks: int, short_jobs: int, seed: int = 0) -> list[dict]:
+    """
+    Jobs (user, tier, arrival offset in chunk durations, chunk count), the long free upload arrives first
+    """
+    rng = random.Random(seed)
+    jobs = [{"user": "free-long", "tier": "free", "arrival": 0.0, "chunks": long_chunks}]
+    for i in range(short_jobs):
+        tier = "paid" if i % 2 else "free"
+        jobs.append({
+            "user": f"{tier}-{i}",
+            "tier": tier,
+            "arrival": rng.uniform(1.0, long_chunks / 2),
+            "chunks": rng.randint(1, 6)
+        })
+    return jobs
+
+
+async def run_job(job: dict, chunk_seconds: float, workers: int, fifo_executor: ThreadPoolExecutor | None) -> float:
+    """
+    Submits every chunk of a job at once (like run_transcription_pipeline), returns the job latency
+    """
+    await asyncio.sleep(job["arrival"] * chunk_seconds / workers)
+    scheduler.set_request_context(job["user"], job["tier"])
+    start = time.perf_counter()
+
+    if fifo_executor is not None:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(fifo_executor, time.sleep, chunk_seconds)
+            for _ in range(job["chunks"])
+        ])
+    else:
+        await asyncio.gather(*[
+            scheduler.schedulers["whisper"].run(time.sleep, chunk_seconds)
+            for _ in range(job["chunks"])
+        ])
+
+    return time.perf_counter() - start
+
+
+async def run_load(jobs: list[dict], chunk_seconds: float, workers: int, mode: str) -> dict:
+    fifo_executor = ThreadPoolExecutor(max_workers=workers) if mode == "fifo" else None
+    if mode == "fair":
+        scheduler.schedulers["whisper"] = scheduler.FairScheduler("whisper", workers)
+
+    latencies = await asyncio.gather(*[run_job(job, chunk_seconds, workers, fifo_executor) for job in jobs])
+
+    results = {}
+    for tier in ("free", "paid"):
+        # The long job itself is reported separately, the point is what it does to everyone else
+        tier_latencies = np.asarray([
+            latency for job, latency in zip(jobs, latencies)
+            if job["tier"] == tier and job["user"] != "free-long"
+        ])
+        results[tier] = {
+            "jobs": len(tier_latencies),
+            "p50_seconds": round(float(np.percentile(tier_latencies, 50)), 3),
+            "p99_seconds": round(float(np.percentile(tier_latencies, 99)), 3)
+        }
+    results["long_job_seconds"] = round(latencies[0], 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency per tier under a mixed load, FIFO pool vs fair scheduler")
+    parser.add_argument("--long-chunks", type=int, default=480, help="Chunks of the long free upload (480 = 4 hours)")
+    parser.add_argument("--short-jobs", type=int, default=40, help="Short jobs, alternating free/paid")
+    parser.add_argument("--chunk-ms", type=float, default=20, help="Simulated inference time per chunk")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    jobs = synthetic_load(args.long_chunks, args.short_jobs)
+    chunk_seconds = args.chunk_ms / 1000
+
+    results = {"machine": machine_info(), "config": vars(args), "modes": {}}
+    for mode in ("fifo", "fair"):
+        results["modes"][mode] = asyncio.run(run_load(jobs, chunk_seconds, args.workers, mode))
+
+        print(f"\n{mode}:")
+        for tier in ("free", "paid"):
+            tier_results = results["modes"][mode][tier]
+            print(f"  {tier}: {tier_results['jobs']} jobs, p50 {tier_results['p50_seconds']}s, p99 {tier_results['p99_seconds']}s")
+        print(f"  long free job: {results['modes'][mode]['long_job_seconds']}s")
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
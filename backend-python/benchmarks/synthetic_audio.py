@@ -0,0 +1,117 @@
+import random
+
+import numpy as np
+from pydub import AudioSegment
+
+from tasks.fake_backends import SAMPLE_RATE, BASE_PITCH_HZ, PITCH_STEP_HZ, MAX_PITCH_BANDS
+
+# --- Synthetic speech-like audio
+# No recordings or downloads needed: every speaker is a voiced source at its own pitch (fundamental + decaying
+# harmonics) cut into syllables with a smooth envelope, grouped into words and turns separated by pauses,
+# over a quiet noise floor. Not intelligible, but it has the energy / pause structure of a meeting, so
+# conversion, silence trimming, chunking and VAD-like steps do realistic work, and it is fully seeded.
+#
+# Speakers are told apart by pitch only: speaker k talks around BASE_PITCH_HZ + k * PITCH_STEP_HZ,
+# pitch jitter stays well inside the step, so each speaker keeps to one pitch band of the fake diarization
+# pipeline (fake_backends.py).
+
+MAX_SPEAKERS = MAX_PITCH_BANDS # Keeps every fundamental under ~300 Hz
+HARMONICS = 6
+NOISE_FLOOR_DBFS = -60.0
+
+
+def speaker_pitch(speaker_index: int) -> float:
+    """ Mean fundamental frequency of a synthetic speaker """
+    return BASE_PITCH_HZ + speaker_index * PITCH_STEP_HZ
+
+
+def syllable(rng: random.Random, pitch_hz: float, level: float) -> np.ndarray:
+    """
+    One voiced syllable: a slightly gliding pitch with 1/h harmonics under a Hann envelope
+    """
+    samples = int(rng.uniform(0.12, 0.30) * SAMPLE_RATE)
+    t = np.arange(samples, dtype=np.float32) / SAMPLE_RATE
+
+    start_pitch = pitch_hz * rng.uniform(0.97, 1.03)
+    end_pitch = pitch_hz * rng.uniform(0.97, 1.03)
+    # Phase of a linear glide from start_pitch to end_pitch
+    phase = 2 * np.pi * (start_pitch * t + (end_pitch - start_pitch) * t * t / (2 * t[-1]))
+
+    wave = np.zeros(samples, dtype=np.float32)
+    for harmonic in range(1, HARMONICS + 1):
+        # Vowel colour: the upper harmonics vary per syllable, the fundamental stays the strongest
+        weight = 1.0 if harmonic == 1 else rng.uniform(0.3, 0.9) / harmonic
+        wave += weight * np.sin(harmonic * phase)
+
+    return level * wave * np.hanning(samples).astype(np.float32) / HARMONICS * 2
+
+
+def turn_samples(rng: random.Random, pitch_hz: float, level: float, seconds: float) -> np.ndarray:
+    """
+    About `seconds` of one speaker talking: words of 1-3 syllables with short gaps in between
+    """
+    parts = []
+    length = 0
+    target = int(seconds * SAMPLE_RATE)
+    while length < target:
+        for _ in range(rng.randint(1, 3)):
+            parts.append(syllable(rng, pitch_hz, level))
+            parts.append(np.zeros(int(rng.uniform(0.03, 0.08) * SAMPLE_RATE), dtype=np.float32))
+        parts.append(np.zeros(int(rng.uniform(0.10, 0.25) * SAMPLE_RATE), dtype=np.float32))
+        length = sum(len(part) for part in parts)
+    return np.concatenate(parts)
+
+
+def synthetic_speech(seconds: float, speakers: int, seed: int = 0) -> tuple[AudioSegment, list[dict]]:
+    """
+    Generates a synthetic conversation.
+
+    Args:
+        seconds (float): Length of the audio.
+        speakers (int): Number of speakers taking turns (1 - MAX_SPEAKERS).
+        seed (int): Same seed, same audio.
+
+    Returns:
+        tuple[AudioSegment, list[dict]]: 16 kHz mono 16-bit audio, and the reference speaker turns
+                                         ('speaker', 'start', 'end' in seconds, same shape as diarize.run).
+
+    Raises:
+        ValueError: If speakers is out of range.
+    """
+    if not 1 <= speakers <= MAX_SPEAKERS:
+        raise ValueError(f"speakers must be between 1 and {MAX_SPEAKERS}, got {speakers}")
+
+    rng = random.Random(seed)
+    levels = [rng.uniform(0.5, 0.9) for _ in range(speakers)]
+    total = int(seconds * SAMPLE_RATE)
+
+    parts = []
+    turns = []
+    position = 0
+    speaker = 0
+    while position < total:
+        # Pause before the turn
+        pause = np.zeros(int(rng.uniform(0.3, 1.5) * SAMPLE_RATE), dtype=np.float32)
+        parts.append(pause)
+        position += len(pause)
+
+        turn = turn_samples(rng, speaker_pitch(speaker), levels[speaker], rng.uniform(3.0, 12.0))
+        parts.append(turn)
+        turns.append({
+            "speaker": f"SPEAKER_{speaker:02d}",
+            "start": round(position / SAMPLE_RATE, 3),
+            "end": round(min(position + len(turn), total) / SAMPLE_RATE, 3)
+        })
+        position += len(turn)
+
+        speaker = (speaker + rng.randint(1, speakers - 1)) % speakers if speakers > 1 else 0
+
+    samples = np.concatenate(parts)[:total]
+    turns = [turn for turn in turns if turn["start"] < seconds]
+
+    noise_level = 10 ** (NOISE_FLOOR_DBFS / 20)
+    samples += np.random.default_rng(seed).normal(0.0, noise_level, len(samples)).astype(np.float32)
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    audio = AudioSegment(pcm.tobytes(), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+    return audio, turns
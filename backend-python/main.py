@@ -1,13 +1,22 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks
-from fastapi import UploadFile, File
+from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks, Query
+from fastapi import UploadFile, File, Form
+from fastapi.responses import ORJSONResponse, Response, PlainTextResponse
 
 import tempfile
 import os
-from tasks import transcribe, diarize, summarize
+import asyncio
+import functools
+import numpy as np
+from tasks import transcribe, diarize, summarize, retrieval
+from tasks.model_registry import model_registry, ModelUnavailableError
 
 # Idk if i need these models?
 import models
 import utils.auth
+from utils import metrics, scheduler
+from utils.transcript_store import transcript_store
+from utils.deadlines import RequestDeadline, DeadlineExceeded
+from utils.segments import SegmentColumns, SegmentColumnsBuilder
 
 from pydub import AudioSegment
 
@@ -18,6 +27,8 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     """ 
     Loads the Whisper and Pyannote model when the application starts
+    The default Whisper model and the LLM are preloaded through the model registry,
+    other Whisper sizes load on first use
     """
     print("Starting up application")
 
@@ -31,17 +42,23 @@ async def lifespan(app: FastAPI):
     
     
     print("Loading up Summarization model")
-    summarize.load_llm_model()
+    try:
+        model_registry.load(summarize.LLM_MODEL_KEY)
+    except ModelUnavailableError as e:
+        print(e)
     print("Mistral model Loaded!")
+    
+    # Optional, retrieval falls back to BM25 only without it
+    retrieval.load_embedding_model()
         
      # Optional: Check if models loaded successfully and raise error if critical
-    if transcribe.whisper_model_instance is None:
+    if model_registry.get_loaded(transcribe.whisper_key(transcribe.WHISPER_MODEL_NAME)) is None:
         print("Startup Error: Whisper model failed to load. Transcription will not work.")
         raise RuntimeError("Whisper model load failed")
     if diarize.pyannote_pipeline_instance is None:
         print("Startup Error: Pyannote pipeline failed to load. Diarization will not work.")
         raise RuntimeError("Pyannote pipeline load failed")
-    if summarize.llm_model_instance is None:
+    if model_registry.get_loaded(summarize.LLM_MODEL_KEY) is None:
         print("Startup Error: Summarization pipeline failed to load. Summarization will not work.")
         raise RuntimeError("Summarization pipeline load failed")
     
@@ -52,7 +69,52 @@ async def lifespan(app: FastAPI):
     
 # --- Initalize FastAPI with the lifespan
 
-app = FastAPI(lifespan=lifespan)
+# orjson encodes large responses (tens of thousands of segments) several times faster than the stdlib encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+# --- Response encoding
+# Clients can ask for MessagePack instead of JSON with the Accept header
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+SEGMENT_LAYOUTS = ("rows", "columns")
+
+
+def encode_msgpack_default(value):
+    """ 
+    msgpack hook for NumPy arrays & scalars (orjson handles those natively)
+    """
+    
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def negotiated_response(request: Request, payload: dict) -> Response:
+    """ 
+    MessagePack when the Accept header asks for it (and msgpack is installed), JSON (orjson) otherwise
+    """
+    
+    accept = request.headers.get("accept", "")
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        try:
+            import msgpack
+            return Response(
+                msgpack.packb(payload, default=encode_msgpack_default, use_bin_type=True),
+                media_type="application/msgpack"
+            )
+        except ImportError:
+            print("Warning: msgpack not installed, responding with JSON")
+    return ORJSONResponse(payload)
+
+
+def segments_payload(merged_segments: SegmentColumns, layout: str):
+    """ 
+    "rows": a list of segment dicts (default), "columns": the columnar form (see SegmentColumns.to_columns)
+    """
+    
+    return merged_segments.to_columns() if layout == "columns" else merged_segments.to_dicts()
 
 
 # --- Auth Dependancy
@@ -67,12 +129,137 @@ async def require_auth(request: Request):
         raise HTTPException(status_code=401, detail="Unauthorized")
     return True
 
+
+async def get_request_tier(request: Request) -> str:
+    """ 
+    FastAPI Dependency returning the caller's subscription tier
+    Use after require_auth, unverified tokens fall back to the free tier
+    """
+    
+    return await utils.auth.get_user_tier(request.headers.get("Authorization"))
+
+
+async def get_request_user(request: Request) -> str | None:
+    """ 
+    FastAPI Dependency returning the caller's user id (owner of stored transcripts)
+    """
+    
+    return await utils.auth.get_user_id(request.headers.get("Authorization"))
+
+
+def get_decoding_profile(requested_profile: str | None, tier: str) -> str:
+    """ 
+    Resolves the decoding profile for a request, unknown profile names are a client error
+    """
+    
+    try:
+        return transcribe.resolve_decoding_profile(requested_profile, tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_language(requested_language: str | None) -> str | None:
+    """ 
+    Validates the language hint of a request, unknown language codes are a client error
+    """
+    
+    try:
+        return transcribe.resolve_language(requested_language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_whisper_model(requested_model: str | None, tier: str) -> str:
+    """ 
+    Resolves the Whisper model for a request, models that aren't served are a client error
+    """
+    
+    try:
+        return transcribe.resolve_whisper_model(requested_model, tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def model_unavailable(e: ModelUnavailableError) -> HTTPException:
+    """ 
+    A model failed to load on demand: the service is temporarily unavailable, not a client error
+    """
+    
+    print(f"Error: {e}")
+    return HTTPException(status_code=503, detail=f"Service is not ready: {e}")
+
+
+def deadline_exceeded(e: DeadlineExceeded) -> HTTPException:
+    """ 
+    A stage ran out of time before there was anything to return (partial results are returned as 200)
+    """
+    
+    print(f"Error: {e}")
+    return HTTPException(status_code=504, detail=str(e))
+
+
+# --- Client disconnects
+# A client that drops off (mobile network, app closed) doesn't cancel the route by itself, the pipeline
+# would keep running to completion on cores other requests are waiting for
+CLIENT_DISCONNECT_POLL_SECONDS = float(os.getenv("CLIENT_DISCONNECT_POLL_SECONDS", "1"))
+CLIENT_CLOSED_REQUEST = 499 # nginx's status for a client that went away (never actually delivered)
+
+metrics.describe("client_disconnects_total", "counter", "Requests cancelled because the client disconnected")
+
+
+async def run_until_disconnected(request: Request, awaitable):
+    """ 
+    Awaits a pipeline step while polling the client connection. On disconnect the step's task is cancelled:
+    queued chunks are dropped by the scheduler, in-flight LLM generation & windowed diarization stop early.
+
+    Raises:
+        HTTPException: 499 when the client disconnected.
+    """
+    
+    work = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=CLIENT_DISCONNECT_POLL_SECONDS)
+            if done:
+                return work.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    
+    print(f"Client disconnected, cancelling {request.url.path}")
+    metrics.increment("client_disconnects_total", route=request.url.path)
+    work.cancel()
+    try:
+        await work
+    except BaseException:
+        pass
+    raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+
+
+def cleanup_temp_file(temp_file_path: str | None, background_tasks: BackgroundTasks, client_gone: bool):
+    """ 
+    Removes an uploaded temp file: after the response is sent (BackgroundTasks),
+    or right away when the client is gone (there is no response to wait for)
+    """
+    
+    if not temp_file_path or not os.path.exists(temp_file_path):
+        print("No files to cleanup")
+        return
+    
+    print(f"Cleaning up temp file: {temp_file_path}")
+    if client_gone:
+        os.remove(temp_file_path)
+    else:
+        background_tasks.add_task(os.remove, temp_file_path)
+
 # --- Helper function
 def merge_transcription_and_diarization(
     transcription_results: list[dict],
     diarization_segments: list[dict],
     original_audio_length_ms: int
-) -> list[dict]:
+) -> SegmentColumns:
     """
     Merges transcription results (with segment timestamps relative to chunks)
     with speaker diarization segments (with absolute timestamps).
@@ -87,119 +274,149 @@ def merge_transcription_and_diarization(
         original_audio_length_ms (int): The length of the original audio in milliseconds.
 
     Returns:
-        list[dict]: A list of merged segments, each including speaker, absolute start/end times, and text.
-                    Includes error markers for failed chunks. Returns an empty list
-                    if transcription_results is empty or merging fails.
+        SegmentColumns: The merged segments (speaker, absolute start/end times, text), sorted by start time.
+                        Includes error markers for failed chunks. Empty if transcription_results is empty.
     """
  
     print("Starting merging transcription and diarization results...")
-    merged_segments = []
-    diarization_index = 0 
+    merged_builder = SegmentColumnsBuilder()
+    transcribed_rows = [] # Rows that get their speaker from the diarization
     
     # Get Chunk time from env
     chunk_length_ms = 30000
 
     if not transcription_results:
-        # Returning empty list means no merged segments.
+        # Returning empty columns means no merged segments.
         print("No transcription results to merge")
-        return []
+        return merged_builder.build()
 
 
     for chunk_index, result in enumerate(transcription_results):
         # Process each item in the results list. 
         # Item can be a success dict, an error dict, or an Exception.
         
+        chunk_start_time_abs_sec = chunk_index * (chunk_length_ms / 1000.0)
+        chunk_end_time_abs_sec = min(chunk_start_time_abs_sec + (chunk_length_ms / 1000.0), original_audio_length_ms / 1000.0)
         
         # This means an unexpected exception occurred during the execution of this specific chunk task
         if isinstance(result, Exception):
             print(f"Error transcribing chunk {chunk_index}: {result}")
-
-            error_start_abs_sec = chunk_index * (chunk_length_ms / 1000.0)
-            error_end_abs_sec = min(error_start_abs_sec + (chunk_length_ms / 1000.0), original_audio_length_ms / 1000.0)
-            merged_segments.append({
-                "speaker": "Error",
-                "start": round(error_start_abs_sec, 3),
-                "end": round(error_end_abs_sec, 3),
-                "text": f"[[Processing Error for chunk {chunk_index}: {result}]]",
-                "error": str(result)
-            })
+            merged_builder.append(
+                "Error",
+                chunk_start_time_abs_sec,
+                chunk_end_time_abs_sec,
+                f"[[Processing Error for chunk {chunk_index}: {result}]]",
+                str(result)
+            )
             
         # This means transcribe_chunk_async returned a dictionary indicating an error (e.g., model not loaded, audio prep error)    
         elif isinstance(result, dict) and "error" in result:
              print(f"Transcription error reported by chunk {chunk_index} processing: {result.get('error', 'Unknown error')}")
-             
-             error_start_abs_sec = chunk_index * (chunk_length_ms / 1000.0)
-             error_end_abs_sec = min(error_start_abs_sec + (chunk_length_ms / 1000.0), original_audio_length_ms / 1000.0)
-             merged_segments.append({
-                 "speaker": "Error",
-                 "start": round(error_start_abs_sec, 3),
-                 "end": round(error_end_abs_sec, 3),
-                 "text": result.get("text", "Transcription Error"), # Use the text provided in the error dict
-                 "error": result.get("error", "Transcription Error")
-             })
+             merged_builder.append(
+                 "Error",
+                 chunk_start_time_abs_sec,
+                 chunk_end_time_abs_sec,
+                 result.get("text", "Transcription Error"), # Use the text provided in the error dict
+                 result.get("error", "Transcription Error")
+             )
              
         # This means the chunk was successfully transcribed and returned a valid result dictionary with segments
         elif isinstance(result, dict) and "segments" in result and isinstance(result["segments"], list):
             print(f"Merging successful result for chunk {chunk_index}")
          
-            chunk_start_time_abs_sec = chunk_index * (chunk_length_ms / 1000.0)
             for segment in result.get("segments", []): # Use .get for safety, default to empty list
                 # Ensure segment has required keys (at least 'start', 'end', 'text')
                 if not isinstance(segment, dict) or "start" not in segment or "end" not in segment or "text" not in segment:
                     print(f"Skipping invalid transcription segment format in chunk {chunk_index}: {segment}")
                     continue
 
-                segment_start_abs_sec = chunk_start_time_abs_sec + segment.get("start", 0.0)
-                segment_end_abs_sec = chunk_start_time_abs_sec + segment.get("end", 0.0)
-
-                # --- Find the corresponding speaker for this transcription segment ---
-                current_speaker = "Unknown"
-
-                # Advance the diarization_index to efficiently find potentially overlapping segments
-                while diarization_index < len(diarization_segments) - 1 and \
-                      diarization_segments[diarization_index + 1].get("start", float('inf')) <= segment_start_abs_sec:
-                    diarization_index += 1
-
-                # Now, check the current diarization segment (at diarization_index) for overlap
-                if diarization_index < len(diarization_segments):
-                    dia_seg = diarization_segments[diarization_index]
-                    dia_start = dia_seg.get("start", float('-inf'))
-                    dia_end = dia_seg.get("end", float('inf'))
-
-                    # Check if transcription segment overlaps with or is contained within the current diarization segment
-                    if max(segment_start_abs_sec, dia_start) < min(segment_end_abs_sec, dia_end):
-                         current_speaker = dia_seg.get("speaker", "Unknown")
-
-                # --- Add the merged segment to the results ---
-                merged_segments.append({
-                    "speaker": current_speaker,
-                    "start": round(segment_start_abs_sec, 3),
-                    "end": round(segment_end_abs_sec, 3),
-                    "text": segment.get("text", "")
-                })
+                # Speaker is filled in below for all rows at once
+                transcribed_rows.append(len(merged_builder))
+                merged_builder.append(
+                    "Unknown",
+                    chunk_start_time_abs_sec + segment.get("start", 0.0),
+                    chunk_start_time_abs_sec + segment.get("end", 0.0),
+                    segment.get("text", "")
+                )
 
         # Handle any other unexpected item format in the transcription_results list
         else:
-            unknown_start_abs_sec = chunk_index * (chunk_length_ms / 1000.0)
-            unknown_end_abs_sec = min(unknown_start_abs_sec + (chunk_length_ms / 1000.0), original_audio_length_ms / 1000.0)
-            merged_segments.append({
-                "speaker": "Unknown",
-                "start": round(unknown_start_abs_sec, 3),
-                "end": round(unknown_end_abs_sec, 3),
-                "text": f"[[Unexpected result format for chunk {chunk_index}: {result}]]",
-                "error": "Unexpected result format"
-            })
+            merged_builder.append(
+                "Unknown",
+                chunk_start_time_abs_sec,
+                chunk_end_time_abs_sec,
+                f"[[Unexpected result format for chunk {chunk_index}: {result}]]",
+                "Unexpected result format"
+            )
 
+    merged_segments = merged_builder.build()
+    assign_speakers(merged_segments, np.asarray(transcribed_rows, dtype=np.int64), diarization_segments)
+    
+    merged_segments.start = np.round(merged_segments.start, 3)
+    merged_segments.end = np.round(merged_segments.end, 3)
 
     print(f"Merging complete. Created {len(merged_segments)} merged segments.")
 
     # Just to be safe, sort all segments based on start time
-    merged_segments.sort(key=lambda x: x.get("start", float('inf')))
+    return merged_segments.sorted_by_start()
+
 
-    return merged_segments
+def assign_speakers(merged_segments: SegmentColumns, rows: np.ndarray, diarization_segments: list[dict]):
+    """
+    Sets the speaker of the given rows to the diarization segment that starts last at or before
+    the row's start, when the two overlap (otherwise the speaker stays "Unknown").
+    All rows are matched at once with a binary search over the diarization start times.
+    """
+    
+    if len(rows) == 0 or not diarization_segments:
+        return
+    
+    diarization_starts = np.asarray([segment.get("start", float('-inf')) for segment in diarization_segments], dtype=np.float64)
+    order = np.argsort(diarization_starts, kind="stable")
+    diarization_starts = diarization_starts[order]
+    diarization_ends = np.asarray([diarization_segments[i].get("end", float('inf')) for i in order.tolist()], dtype=np.float64)
+    diarization_labels = [diarization_segments[i].get("speaker", "Unknown") for i in order.tolist()]
+    
+    segment_starts = merged_segments.start[rows]
+    segment_ends = merged_segments.end[rows]
+    
+    match = np.clip(np.searchsorted(diarization_starts, segment_starts, side="right") - 1, 0, None)
+    overlaps = np.maximum(segment_starts, diarization_starts[match]) < np.minimum(segment_ends, diarization_ends[match])
+    
+    # Diarization labels -> speaker ids of the columns
+    speaker_index = {speaker: speaker_id for speaker_id, speaker in enumerate(merged_segments.speakers)}
+    label_ids = np.asarray(
+        [speaker_index.setdefault(label, len(speaker_index)) for label in diarization_labels],
+        dtype=np.int32
+    )
+    merged_segments.speakers = list(speaker_index)
+    merged_segments.speaker_ids[rows[overlaps]] = label_ids[match[overlaps]]
 
     
 
+# --- Helper function
+def segments_from_request(segments: list[models.Segment]) -> SegmentColumns:
+    """
+    Columns straight from the validated request models (no intermediate dicts)
+    """
+    builder = SegmentColumnsBuilder()
+    for segment in segments:
+        builder.append(segment.speaker, segment.start, segment.end, segment.text, segment.error)
+    return builder.build()
+
+
+# --- Helper function
+def get_pipeline_language(transcription_results: list) -> str | None:
+    """
+    Returns the language used for the file (every chunk is transcribed with the same one),
+    taken from the first successfully transcribed chunk
+    """
+    for result in transcription_results:
+        if isinstance(result, dict) and "error" not in result and result.get("language"):
+            return result["language"]
+    return None
+
+
 # --- Routes
 
 @app.get("/")
@@ -212,26 +429,38 @@ def root():
 
 @app.post("/transcribe")
 async def transcribe_audio(
+    request: Request,
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
+    language: str | None = Form(None),
+    decoding_profile: str | None = Form(None),
+    whisper_model: str | None = Form(None),
     auth: bool = Depends(require_auth),
-    background_tasks = BackgroundTasks
+    tier: str = Depends(get_request_tier),
+    user_id: str | None = Depends(get_request_user)
 ):
     """ 
     Receives an audio file upload, processes it through the transcription pipleine and returns the transcription result.
     Handles temporary file storage and cleanup
+    
+    An optional `language` form field (e.g. "fa") skips language detection,
+    otherwise the language is detected once for the whole file.
+    An optional `decoding_profile` form field ("fast", "balanced", "accurate") overrides the tier's default profile.
+    An optional `whisper_model` form field (one of the served WHISPER_MODELS) overrides the tier's Whisper model.
     """
     
-    # Check if model loaded successfully
-    if transcribe.whisper_model_instance is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Transcription service is not ready. Model failed to load on startup"
-        )
+    # Inference work of this request is queued under this user & tier (fair scheduler)
+    scheduler.set_request_context(user_id, tier)
+    deadline = RequestDeadline()
+    language = get_language(language)
+    decoding_profile = get_decoding_profile(decoding_profile, tier)
+    whisper_model = get_whisper_model(whisper_model, tier)
         
     # Handle uploaded file: Temp storage
     # audio pipeline expects file path
     # Save the uplaoded file to a temp file server side
     temp_file_path = None
+    client_gone = False
     try:
         # Create a temp file with original file extension
         file_extension = os.path.splitext(audio_file.filename)[1] if audio_file.filename else ".tmp"
@@ -248,7 +477,13 @@ async def transcribe_audio(
         
         # --- Run Pipeline
         print("Starting transcription pipeline")
-        transcription_results = await transcribe.run_transcription_pipeline(temp_file_path)
+        transcription_results = await run_until_disconnected(request, transcribe.run_transcription_pipeline(
+            temp_file_path,
+            language=language,
+            decoding_profile=decoding_profile,
+            model_name=whisper_model,
+            deadline=deadline
+        ))
         print("Finished transcription pipeline")
         
         
@@ -266,7 +501,9 @@ async def transcribe_audio(
             print("Pipeline resulted in no audio chunks")
             return {
                 "message": "No audio contetnt detected, or processing resulted in no chunks",
-                "transcript": ""
+                "transcript": "",
+                "decoding_profile": decoding_profile,
+                "whisper_model": whisper_model
             }
             
         # --- Format final response
@@ -280,10 +517,23 @@ async def transcribe_audio(
         # return {"chunks": transcription_results}
         
         # --- Return the successful response
-        return {"transcript": combined_text}
+        return {
+            "transcript": combined_text,
+            "language": get_pipeline_language(transcription_results),
+            "decoding_profile": decoding_profile,
+            "whisper_model": whisper_model,
+            # Deadline reached: the transcript misses these time ranges
+            "partial": deadline.partial,
+            "uncovered_ranges": deadline.uncovered_ranges()
+        }
         
     except HTTPException as e:
+        client_gone = e.status_code == CLIENT_CLOSED_REQUEST
         raise e
+    except ModelUnavailableError as e:
+        raise model_unavailable(e)
+    except DeadlineExceeded as e:
+        raise deadline_exceeded(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -293,36 +543,79 @@ async def transcribe_audio(
     finally:
         # --- Clean up temp files
         # Scheduled with BackgroundTasks, ensures this happens AFTER the HTTP response has been sent
-        if temp_file_path and os.path.exists(temp_file_path):
-            print(f"Cleaning up temp file: {temp_file_path}")
-            background_tasks.add_task(os.remove, temp_file_path)
-        else:
-            print("No files to cleanup")
+        cleanup_temp_file(temp_file_path, background_tasks, client_gone)
     
     
 @app.post("/transcribe_and_diarize")
 async def transcribe_and_diarize_audio(
+    request: Request,
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
+    language: str | None = Form(None),
+    decoding_profile: str | None = Form(None),
+    whisper_model: str | None = Form(None),
+    num_speakers: int | None = Form(None),
+    min_speakers: int | None = Form(None),
+    max_speakers: int | None = Form(None),
+    segmentation_batch_size: int | None = Form(None),
+    embedding_batch_size: int | None = Form(None),
+    segment_layout: str = Form("rows"),
     auth: bool = Depends(require_auth),
-    background_tasks = BackgroundTasks
+    tier: str = Depends(get_request_tier),
+    user_id: str | None = Depends(get_request_user)
 ):
     """ 
     Receives an audio file upload, runs both transcription & diarization pipeline
     then merges the result and returns the speaker-attributed transcript segments
     
+    Optional `language`, `decoding_profile` and `whisper_model` form fields work the same as on /transcribe
+    Optional diarization form fields (server defaults apply when omitted):
+        num_speakers / min_speakers / max_speakers: speaker count hints when the client knows them
+        segmentation_batch_size / embedding_batch_size: pyannote batch sizes (CPU throughput tuning)
+    Optional `segment_layout` form field: "rows" (list of segment dicts, default) or "columns"
+    (start / end / speaker id arrays + text list, much smaller for long recordings).
+    Send `Accept: application/msgpack` for a MessagePack response instead of JSON.
+    
+    The merged segments are also stored server side, the returned `transcript_id`
+    can be passed to /summarize instead of sending the segments back, and to /ask for follow-up questions
+    
+    Per-request and per-stage deadlines apply (see utils/deadlines.py): when one runs out the segments done
+    so far are returned with `partial: true` and the `uncovered_ranges` (seconds) of each stage,
+    untranscribed chunks appear as error markers like failed chunks.
+    
     Handles temp file storage & cleanup
     """
     
-    # Check if both required models are loaded at startup
-    if transcribe.whisper_model_instance is None or diarize.pyannote_pipeline_instance is None \
-       or summarize.llm_model_instance is None or summarize.llm_tokenizer_instance is None:
-        print("Error: One or more required models not loaded.")
+    scheduler.set_request_context(user_id, tier)
+    deadline = RequestDeadline()
+    language = get_language(language)
+    decoding_profile = get_decoding_profile(decoding_profile, tier)
+    whisper_model = get_whisper_model(whisper_model, tier)
+    
+    if segment_layout not in SEGMENT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown segment_layout '{segment_layout}', expected one of {list(SEGMENT_LAYOUTS)}")
+    
+    try:
+        diarization_options = diarize.resolve_diarization_options(
+            num_speakers=num_speakers,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers,
+            segmentation_batch_size=segmentation_batch_size,
+            embedding_batch_size=embedding_batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Whisper models load on demand (registry), the diarization pipeline must be loaded at startup
+    if diarize.pyannote_pipeline_instance is None:
+        print("Error: Diarization pipeline not loaded.")
         raise HTTPException(
             status_code=503,
-            detail="One or more required services are not ready (models not loaded at startup)."
+            detail="Diarization service is not ready (model not loaded at startup)."
         )
         
     temp_file_path = None
+    client_gone = False
     original_audio_length_ms = 0
     
     try:
@@ -336,7 +629,7 @@ async def transcribe_and_diarize_audio(
             temp_file_path = tmp_upload_file.name
             await audio_file.seek(0)
             
-            while content := audio_file.read(1024 * 1024):
+            while content := await audio_file.read(1024 * 1024):
                 tmp_upload_file.write(content)
 
         print(f"Saved uploaded file temporarily to: {temp_file_path}")
@@ -353,7 +646,7 @@ async def transcribe_and_diarize_audio(
         
         # Run on full audio file
         print("Starting Diarization Pipeline")
-        diarization_segments = await diarize.run(temp_file_path)
+        diarization_segments = await run_until_disconnected(request, diarize.run(temp_file_path, diarization_options, deadline))
         print("Finished Diarization Pipeline")
         
         if diarization_segments is None:
@@ -365,7 +658,13 @@ async def transcribe_and_diarize_audio(
             
         # --- Run Transcription Pipeline
         print("Starting Transcription Pipeline")
-        transcription_results = await transcribe.run_transcription_pipeline(temp_file_path)
+        transcription_results = await run_until_disconnected(request, transcribe.run_transcription_pipeline(
+            temp_file_path,
+            language=language,
+            decoding_profile=decoding_profile,
+            model_name=whisper_model,
+            deadline=deadline
+        ))
         print("Finished Transcription Pipeline")
         
         if transcription_results is None:
@@ -384,10 +683,40 @@ async def transcribe_and_diarize_audio(
         
         print(f"Combined processing: Created {len(merged_segments)} merged segments.")
         
-        return {"segments": merged_segments}
+        pipeline_language = get_pipeline_language(transcription_results)
+        # One transaction for the whole transcript, off the event loop
+        transcript_id = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                transcript_store.save,
+                merged_segments,
+                owner=user_id,
+                language=pipeline_language,
+                partial=deadline.partial
+            )
+        )
+        
+        # Index the transcript in the background so follow-up questions (/ask) don't pay for it
+        # (one asked before the index is ready waits for this build instead of starting another)
+        retrieval.ensure_index(transcript_id, lambda: merged_segments)
+        
+        return negotiated_response(request, {
+            "transcript_id": transcript_id,
+            "segments": segments_payload(merged_segments, segment_layout),
+            "language": pipeline_language,
+            "decoding_profile": decoding_profile,
+            "whisper_model": whisper_model,
+            "partial": deadline.partial,
+            "uncovered_ranges": deadline.uncovered_ranges()
+        })
     
     except HTTPException as e:
+        client_gone = e.status_code == CLIENT_CLOSED_REQUEST
         raise e
+    except ModelUnavailableError as e:
+        raise model_unavailable(e)
+    except DeadlineExceeded as e:
+        raise deadline_exceeded(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -396,29 +725,38 @@ async def transcribe_and_diarize_audio(
         
     finally:
         # --- Clean up temp files
-        if temp_file_path and os.path.exists(temp_file_path):
-            background_tasks.add_task(os.remove, temp_file_path)
-        else:
-            print("No files to clean")
+        cleanup_temp_file(temp_file_path, background_tasks, client_gone)
             
             
 @app.post("/summarize")
 async def summarize_audio(
+    request: Request,
     data: models.SummaryRequest,
-    auth: bool = Depends(require_auth)
+    auth: bool = Depends(require_auth),
+    tier: str = Depends(get_request_tier),
+    user_id: str | None = Depends(get_request_user)
 ):
     """
-    Receives the merged transcription/diarization segments from the client,
+    Summarizes a transcript stored by /transcribe_and_diarize ({"transcript_id": ...}),
+    or the merged transcription/diarization segments sent by the client ({"segments": [...]}),
     runs the summarization pipeline, and returns the summary.
     This route is typically for a paid tier with unlimited summarization access.
     """
     
-    if summarize.llm_model_instance is None or summarize.llm_tokenizer_instance is None:
-         print("Error: Summarization service not ready (model not loaded).")
-         raise HTTPException(status_code=503, detail="Summarization service is not ready.")
+    scheduler.set_request_context(user_id, tier)
     
-
-    merged_segments_from_client = data.segments
+    if (data.transcript_id is None) == (data.segments is None):
+        raise HTTPException(status_code=400, detail="Provide either 'transcript_id' or 'segments'.")
+    
+    if data.transcript_id is not None:
+        stored_transcript = transcript_store.get(data.transcript_id, owner=user_id)
+        if stored_transcript is None:
+            raise HTTPException(status_code=404, detail=f"Transcript '{data.transcript_id}' not found or expired.")
+        merged_segments_from_client = await asyncio.get_running_loop().run_in_executor(
+            None, transcript_store.load_segments, data.transcript_id
+        )
+    else:
+        merged_segments_from_client = segments_from_request(data.segments)
 
     if not merged_segments_from_client:
         print("No merged segments provided by the client for summarization.")
@@ -431,7 +769,12 @@ async def summarize_audio(
 
     try:
         print("Starting Summarization Pipeline")
-        summary_result = await summarize.run(merged_segments_from_client)
+        # Loads the LLM if the registry unloaded it, and keeps it loaded until the summary is done
+        async with model_registry.use(summarize.LLM_MODEL_KEY):
+            summary_result = await run_until_disconnected(request, asyncio.wait_for(
+                summarize.run(merged_segments_from_client),
+                timeout=RequestDeadline().stage_timeout("summarization")
+            ))
         print("Finished Summarization Pipeline")
         
         if summary_result is None:
@@ -443,7 +786,175 @@ async def summarize_audio(
 
     except HTTPException as e:
         raise e
+    except ModelUnavailableError as e:
+        raise model_unavailable(e)
+    except asyncio.TimeoutError:
+        # Map step summaries finished so far are cached, a retry picks up from there
+        raise deadline_exceeded(DeadlineExceeded("summarization"))
     except Exception as e:
         print(f"An unexpected error occurred during summarization: {e}")
         raise HTTPException(status_code=500, detail="An internal server error occurred during summarization.")
     
+
+
+
+@app.post("/summarize/incremental")
+async def summarize_incremental(
+    data: models.IncrementalSummaryRequest,
+    auth: bool = Depends(require_auth),
+    tier: str = Depends(get_request_tier),
+    user_id: str | None = Depends(get_request_user)
+):
+    """
+    Updates the rolling summary of a live or long meeting with newly appended segments.
+    Only the new segments are summarized, then folded into the running summary,
+    so each update costs roughly the same no matter how long the meeting is.
+    """
+    
+    scheduler.set_request_context(user_id, tier)
+    
+    try:
+        new_segments = segments_from_request(data.segments)
+        async with model_registry.use(summarize.LLM_MODEL_KEY):
+            # Checked right before run_incremental claims the id (no await in between)
+            if summarize.rolling_summary_taken(data.transcript_id, owner=user_id):
+                raise HTTPException(status_code=404, detail=f"Transcript '{data.transcript_id}' not found.")
+            summary_result = await summarize.run_incremental(data.transcript_id, new_segments, reset=data.reset, owner=user_id)
+        
+        if summary_result is None:
+             raise HTTPException(status_code=500, detail="Incremental summarization failed unexpectedly.")
+        
+        state = summarize.rolling_summary_states.get((user_id, data.transcript_id))
+        return {
+            "transcript_id": data.transcript_id,
+            "segments_summarized": state.segment_count if state else None,
+            "summary": summary_result
+        }
+    
+    except HTTPException as e:
+        raise e
+    except ModelUnavailableError as e:
+        raise model_unavailable(e)
+    except Exception as e:
+        print(f"An unexpected error occurred during incremental summarization: {e}")
+        raise HTTPException(status_code=500, detail="An internal server error occurred during summarization.")
+
+
+
+@app.post("/ask")
+async def ask_question(
+    request: Request,
+    data: models.AskRequest,
+    auth: bool = Depends(require_auth),
+    tier: str = Depends(get_request_tier),
+    user_id: str | None = Depends(get_request_user)
+):
+    """
+    Answers a follow-up question about a transcript stored by /transcribe_and_diarize.
+    Only the transcript passages most relevant to the question are sent to the LLM,
+    so answering takes about the same time no matter how long the meeting was.
+    """
+    
+    scheduler.set_request_context(user_id, tier)
+    
+    if not data.question.strip():
+        raise HTTPException(status_code=400, detail="'question' must not be empty.")
+    
+    top_k = data.top_k or retrieval.RETRIEVAL_TOP_K
+    if not 1 <= top_k <= 50:
+        raise HTTPException(status_code=400, detail="'top_k' must be between 1 and 50.")
+    
+    stored_transcript = transcript_store.get(data.transcript_id, owner=user_id)
+    if stored_transcript is None:
+        raise HTTPException(status_code=404, detail=f"Transcript '{data.transcript_id}' not found or expired.")
+    
+    try:
+        async with model_registry.use(summarize.LLM_MODEL_KEY):
+            result = await run_until_disconnected(request, asyncio.wait_for(
+                retrieval.answer_question(
+                    data.transcript_id,
+                    functools.partial(transcript_store.load_segments, data.transcript_id),
+                    data.question,
+                    top_k=top_k
+                ),
+                timeout=RequestDeadline().stage_timeout("summarization")
+            ))
+        
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        return {
+            "transcript_id": data.transcript_id,
+            "question": data.question,
+            **result
+        }
+    
+    except HTTPException as e:
+        raise e
+    except ModelUnavailableError as e:
+        raise model_unavailable(e)
+    except asyncio.TimeoutError:
+        raise deadline_exceeded(DeadlineExceeded("summarization"))
+    except Exception as e:
+        print(f"An unexpected error occurred while answering a question: {e}")
+        raise HTTPException(status_code=500, detail="An internal server error occurred while answering the question.")
+
+
+
+@app.get("/transcripts/{transcript_id}/segments")
+async def get_transcript_segments(
+    request: Request,
+    transcript_id: str,
+    time_from: float | None = Query(None, alias="from", description="Start of the time range (seconds)"),
+    time_to: float | None = Query(None, alias="to", description="End of the time range (seconds)"),
+    speaker: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    segment_layout: str = Query("rows"),
+    auth: bool = Depends(require_auth),
+    user_id: str | None = Depends(get_request_user)
+):
+    """
+    Returns one page of a stored transcript's segments overlapping a time range, optionally of one speaker,
+    e.g. /transcripts/{id}/segments?from=2400&to=2700 for minutes 40-45.
+    Pass the returned `next_cursor` as `cursor` for the next page (null on the last page).
+    Supports the same `segment_layout` and `Accept: application/msgpack` options as /transcribe_and_diarize.
+    """
+    
+    if segment_layout not in SEGMENT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown segment_layout '{segment_layout}', expected one of {list(SEGMENT_LAYOUTS)}")
+    if time_from is not None and time_to is not None and time_to <= time_from:
+        raise HTTPException(status_code=400, detail="'to' must be greater than 'from'.")
+    
+    stored_transcript = transcript_store.get(transcript_id, owner=user_id)
+    if stored_transcript is None:
+        raise HTTPException(status_code=404, detail=f"Transcript '{transcript_id}' not found or expired.")
+    
+    try:
+        segments, next_cursor = transcript_store.query_segments(
+            stored_transcript,
+            time_from=time_from,
+            time_to=time_to,
+            speaker=speaker,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return negotiated_response(request, {
+        "transcript_id": transcript_id,
+        "segment_count": stored_transcript["segment_count"],
+        "segments": segments_payload(segments, segment_layout),
+        "next_cursor": next_cursor
+    })
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(auth: bool = Depends(require_auth)):
+    """
+    Server metrics in the Prometheus text format: model loads / evictions / load failures,
+    memory held per model and against the registry budget, scheduler queue waits per resource & tier
+    Requires auth like every other route (Prometheus scrapes with an Authorization header)
+    """
+    return PlainTextResponse(metrics.render_prometheus())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any # Import types for the merged_segments structure
+from typing import List, Optional # Import types for the merged_segments structure
 # If using Pydantic v2, you might import from typing_extensions
 
 class AudioRequest(BaseModel):
@@ -9,15 +9,48 @@ class AudioRequest(BaseModel):
     """
     audio_url: str # Assuming this is a URL or path accessible by the server
 
+
+class Segment(BaseModel):
+    """
+    One merged transcription/diarization segment, as returned by /transcribe_and_diarize.
+    Typed so validation is a flat field check instead of walking arbitrary dicts.
+    """
+    speaker: str = "Unknown"
+    start: float = 0.0 # Seconds from the start of the audio
+    end: float = 0.0
+    text: str = ""
+    error: Optional[str] = None # Set on error markers for chunks that failed to process
+
+
 # Update SummaryRequest to accept the merged_segments structure
 class SummaryRequest(BaseModel):
     """
     Request model for the summarization endpoint.
-    Assumes the client sends the merged transcription/diarization segments.
+    Either references a transcript stored by /transcribe_and_diarize (transcript_id),
+    or sends the merged transcription/diarization segments inline.
     """
-    # Define a field to hold the list of merged segments
-    segments: List[Dict[str, Any]]
+    transcript_id: Optional[str] = None
+    segments: Optional[List[Segment]] = None
 
     # Optional: You might include other fields if needed, e.g., user_id, preferences
     # user_id: str
-    # format_preference: str = "structured" # e.g., "structured", "paragraph"
\ No newline at end of file
+    # format_preference: str = "structured" # e.g., "structured", "paragraph"
+
+
+class IncrementalSummaryRequest(BaseModel):
+    """
+    Request model for the incremental summarization endpoint.
+    The client sends only the segments appended since its last call for this transcript.
+    """
+    transcript_id: str
+    segments: List[Segment]
+    reset: bool = False # Start the rolling summary over
+
+
+class AskRequest(BaseModel):
+    """
+    Request model for follow-up questions about a stored transcript.
+    """
+    transcript_id: str
+    question: str
+    top_k: Optional[int] = None # Transcript passages given to the model, server default when omitted
@@ -0,0 +1,299 @@
+import os
+import numpy as np
+import torch
+
+# --- ASR Backends
+# Every backend takes a 16kHz mono float32 numpy array and returns the same result schema
+# (what merge_transcription_and_diarization consumes):
+#   {
+#       "text": str,
+#       "language": str,
+#       "segments": [{"start": float, "end": float, "text": str}, ...]  # seconds, relative to the audio passed in
+#   }
+#
+# Backends are selected with the ASR_BACKEND env var (see transcribe.py), ASR_BACKEND=fake runs without a model
+
+# faster-whisper / CTranslate2 config
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE") # Defaults to int8 on CPU, float16 on CUDA
+FASTER_WHISPER_CPU_THREADS = int(os.getenv("FASTER_WHISPER_CPU_THREADS", "0")) # 0 lets CTranslate2 decide
+
+# --- Decoding profiles
+# Named speed/quality trade offs, backend neutral (each backend maps them onto its own options)
+#   beam_size: None = greedy decoding
+#   best_of: candidates sampled per fallback temperature > 0
+#   temperature: the fallback schedule, a chunk is re-decoded at the next temperature when
+#                the output looks degenerate (compression ratio / avg logprob thresholds)
+#   condition_on_previous_text: feeds the previous window's text as the decoder prompt
+DECODING_PROFILES = {
+    "fast": {
+        "beam_size": None,
+        "best_of": None,
+        "temperature": (0.0,), # No fallback, one decoder pass per window
+        "condition_on_previous_text": False,
+    },
+    "balanced": {
+        "beam_size": None,
+        "best_of": 3,
+        "temperature": (0.0, 0.4, 0.8),
+        "condition_on_previous_text": True,
+    },
+    "accurate": {
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0), # Whisper's default fallback schedule
+        "condition_on_previous_text": True,
+    },
+}
+
+
+def quantize_whisper_model(model):
+    """
+    Applies int8 dynamic quantization to the Linear layers of a Whisper model.
+    Weights are stored as int8, activations are quantized on the fly at inference time.
+
+    Whisper uses its own Linear subclass (casts weights to the input dtype), which
+    torch's dynamic quantization does not recognise, so every Linear is swapped for a
+    plain torch.nn.Linear holding the same weights before quantizing.
+
+    Args:
+        model (whisper.model.Whisper): A fp32 Whisper model loaded on the CPU.
+
+    Returns:
+        whisper.model.Whisper: The quantized model (modified in place).
+    """
+
+    for parent in list(model.modules()):
+        for child_name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                plain_linear = torch.nn.Linear(
+                    child.in_features,
+                    child.out_features,
+                    bias=child.bias is not None
+                )
+                plain_linear.weight = child.weight
+                plain_linear.bias = child.bias
+                setattr(parent, child_name, plain_linear)
+
+    return torch.quantization.quantize_dynamic(
+        model,
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+        inplace=True
+    )
+
+
+class ASRBackend:
+    """
+    Base class for speech recognition engines.
+    Subclasses implement load(), transcribe() and detect_language(), all blocking and meant to run in a thread pool.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str, device: str):
+        self.model_name = model_name
+        self.device = device
+        self.model = None
+
+    def load(self):
+        """ Loads the model weights into memory """
+        raise NotImplementedError
+
+    def transcribe(self, audio: np.ndarray, task: str = "translate", language: str | None = None, **decoding_options) -> dict:
+        """
+        Transcribes (or translates) a single audio array.
+
+        Args:
+            audio (np.ndarray): 16kHz mono float32 samples in [-1, 1].
+            task (str): "transcribe" or "translate" (to English).
+            language (str | None): Source language code, None lets the model detect it.
+            **decoding_options: Options from a DECODING_PROFILES entry, the backend's defaults are used when omitted.
+
+        Returns:
+            dict: Result in the common schema described at the top of this module.
+        """
+        raise NotImplementedError
+
+    def detect_language(self, audio: np.ndarray) -> dict[str, float]:
+        """
+        Runs language identification on (the first 30 seconds of) an audio array.
+
+        Args:
+            audio (np.ndarray): 16kHz mono float32 samples in [-1, 1].
+
+        Returns:
+            dict[str, float]: Language code -> probability.
+        """
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        """ Short identifier for logs & benchmark output """
+        return f"{self.name}:{self.model_name}"
+
+
+class OpenAIWhisperBackend(ASRBackend):
+    """
+    The original openai-whisper (PyTorch) engine.
+    Optionally int8 dynamically quantized on CPU (quantize="int8").
+    """
+
+    name = "openai-whisper"
+
+    def __init__(self, model_name: str, device: str, quantize: str = "none"):
+        super().__init__(model_name, device)
+        self.quantize = quantize
+
+    def load(self):
+        import whisper
+
+        self.model = whisper.load_model(self.model_name, device=self.device)
+
+        if self.quantize == "int8":
+            if self.device == "cpu":
+                self.model = quantize_whisper_model(self.model)
+                print(f"Whisper model '{self.model_name}' quantized to int8 (dynamic)")
+            else:
+                print(f"Warning: int8 quantization only applies on CPU, loading fp16 on '{self.device}'")
+        elif self.quantize != "none":
+            print(f"Warning: Unknown Whisper quantization '{self.quantize}', loading unquantized model")
+
+    def transcribe(self, audio: np.ndarray, task: str = "translate", language: str | None = None, **decoding_options) -> dict:
+        result = self.model.transcribe(
+            audio,
+            task=task,
+            language=language,
+            fp16=self.device == "cuda",
+            **decoding_options
+        )
+
+        return {
+            "text": result.get("text", ""),
+            "language": result.get("language", language or ""),
+            "segments": [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                for segment in result.get("segments", [])
+            ]
+        }
+
+    def detect_language(self, audio: np.ndarray) -> dict[str, float]:
+        import whisper
+
+        # English-only models (*.en) have no language token to predict
+        if not self.model.is_multilingual:
+            return {"en": 1.0}
+
+        mel = whisper.log_mel_spectrogram(
+            whisper.pad_or_trim(audio),
+            n_mels=self.model.dims.n_mels
+        ).to(self.model.device)
+        _, language_probabilities = self.model.detect_language(mel)
+        return language_probabilities
+
+    def describe(self) -> str:
+        return f"{self.name}:{self.model_name}:{'int8' if self.quantize == 'int8' else 'fp16' if self.device == 'cuda' else 'fp32'}"
+
+
+class FasterWhisperBackend(ASRBackend):
+    """
+    CTranslate2 based faster-whisper engine.
+    Uses int8 compute on CPU by default (override with FASTER_WHISPER_COMPUTE_TYPE).
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str, device: str, compute_type: str | None = None):
+        super().__init__(model_name, device)
+        self.compute_type = compute_type or FASTER_WHISPER_COMPUTE_TYPE or ("float16" if device == "cuda" else "int8")
+
+    def load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("ASR_BACKEND=faster-whisper requires the faster-whisper package") from e
+
+        self.model = WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=FASTER_WHISPER_CPU_THREADS
+        )
+
+    def transcribe(self, audio: np.ndarray, task: str = "translate", language: str | None = None, **decoding_options) -> dict:
+        # faster-whisper has no "None = greedy", beam size 1 is greedy
+        if "beam_size" in decoding_options and decoding_options["beam_size"] is None:
+            decoding_options["beam_size"] = 1
+        if "best_of" in decoding_options and decoding_options["best_of"] is None:
+            decoding_options["best_of"] = 1
+        if "temperature" in decoding_options:
+            decoding_options["temperature"] = list(decoding_options["temperature"])
+
+        # Segments are a lazy generator, decoding happens while iterating
+        segments, info = self.model.transcribe(
+            audio,
+            task=task,
+            language=language,
+            **decoding_options
+        )
+        segments = [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments
+        ]
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "segments": segments
+        }
+
+    def detect_language(self, audio: np.ndarray) -> dict[str, float]:
+        # transcribe() runs language ID eagerly, decoding only starts once the segments are iterated
+        _, info = self.model.transcribe(audio)
+        if info.all_language_probs:
+            return dict(info.all_language_probs)
+        return {info.language: info.language_probability}
+
+    def describe(self) -> str:
+        return f"{self.name}:{self.model_name}:{self.compute_type}"
+
+
+def supported_languages(backend_name: str) -> set[str]:
+    """
+    Language codes a backend accepts (Whisper's tokenizer languages, e.g. "en", "fa")
+    """
+    if backend_name == FasterWhisperBackend.name:
+        from faster_whisper.tokenizer import _LANGUAGE_CODES
+        return set(_LANGUAGE_CODES)
+
+    # openai-whisper, the fake backend takes the same codes
+    from whisper.tokenizer import LANGUAGES
+    return set(LANGUAGES)
+
+
+ASR_BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(backend_name: str, model_name: str, device: str, **backend_options) -> ASRBackend:
+    """
+    Builds (but does not load) an ASR backend by name.
+
+    Args:
+        backend_name (str): One of ASR_BACKENDS ("openai-whisper", "faster-whisper"), or "fake".
+        model_name (str): Whisper model size/name, e.g. "tiny", "medium".
+        device (str): "cpu" or "cuda".
+        **backend_options: Backend specific options (quantize, compute_type).
+
+    Returns:
+        ASRBackend: The unloaded backend instance.
+    """
+    if backend_name == "fake":
+        # Deterministic stand-in for tests & load testing (see fake_backends.py), imported only when used
+        from tasks.fake_backends import FakeASRBackend
+        return FakeASRBackend(model_name, device, **backend_options)
+
+    if backend_name not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend_name}', expected one of {list(ASR_BACKENDS) + ['fake']}")
+
+    return ASR_BACKENDS[backend_name](model_name, device, **backend_options)
@@ -1,7 +1,18 @@
 import os
 import torch
+import time
 import asyncio
-from pyannote.audio import Pipeline
+import threading
+import functools
+from typing import Callable
+import numpy as np
+from pyannote.audio import Pipeline, Audio
+from pyannote.core import Segment
+from scipy.cluster.hierarchy import linkage, fcluster
+
+from tasks import diarize_onnx
+from utils import metrics, scheduler
+from utils.deadlines import RequestDeadline
 
 
 # --- Configure
@@ -16,20 +27,70 @@ if HUGGING_FACE_HUB_TOKEN is None:
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+# Execution backend for the segmentation & embedding models: "pytorch" or "onnx" (ONNX Runtime CPU, see diarize_onnx.py)
+# "fake" replaces the whole pipeline with a deterministic stand-in (see fake_backends.py)
+DIARIZATION_BACKEND = os.getenv("DIARIZATION_BACKEND", "pytorch").lower()
+
+# --- Windowed diarization (long recordings)
+# Files longer than the window are diarized window by window so peak memory stays bounded,
+# then local speakers are linked across windows by clustering their embedding centroids.
+# Set to 0 to always diarize the whole file in one call.
+DIARIZATION_WINDOW_SECONDS = float(os.getenv("DIARIZATION_WINDOW_SECONDS", "600"))
+# Extra time past the diarization deadline for the window in progress to finish before its work is given up
+DIARIZATION_DEADLINE_GRACE_SECONDS = float(os.getenv("DIARIZATION_DEADLINE_GRACE_SECONDS", "120"))
+metrics.describe("diarization_stopped_total", "counter", "Diarization passes stopped mid-file (deadline or cancelled request)")
+
+# Cosine distance under which two window speakers are considered the same person
+# (pyannote 3.1's own clustering threshold is ~0.70)
+DIARIZATION_LINK_THRESHOLD = float(os.getenv("DIARIZATION_LINK_THRESHOLD", "0.7"))
+
+# --- Tuning defaults (each can be overridden per request)
+def _optional_int_env(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+# Speaker count hints are passed to the pipeline call, batch sizes are pipeline attributes
+SPEAKER_COUNT_OPTIONS = ("num_speakers", "min_speakers", "max_speakers")
+BATCH_SIZE_OPTIONS = ("segmentation_batch_size", "embedding_batch_size")
+
+DIARIZATION_DEFAULTS = {
+    "num_speakers": _optional_int_env("DIARIZATION_NUM_SPEAKERS"),
+    "min_speakers": _optional_int_env("DIARIZATION_MIN_SPEAKERS"),
+    "max_speakers": _optional_int_env("DIARIZATION_MAX_SPEAKERS"),
+    "segmentation_batch_size": _optional_int_env("DIARIZATION_SEGMENTATION_BATCH_SIZE"),
+    "embedding_batch_size": _optional_int_env("DIARIZATION_EMBEDDING_BATCH_SIZE"),
+}
+
 # Model Loading (on FastAPI start)
 
 pyannote_pipeline_instance = None
 
-def load_pyannote_pipeline(from_local_cache_only: bool = False):
+# Batch sizes the pipeline shipped with, restored when a request doesn't set its own
+pipeline_default_batch_sizes = {}
+
+# The pipeline is shared mutable state (batch sizes are set per call), so calls are serialized.
+# pyannote already uses every core for a single file on CPU, so little concurrency is lost
+_pipeline_lock = threading.Lock()
+
+def load_pyannote_pipeline(from_local_cache_only: bool = False, backend: str = DIARIZATION_BACKEND):
     """
     Loads the Pyannote diarization pipeline into memory. Intended to be called once at startup.
     Requires HUGGING_FACE_HUB_TOKEN env var unless loading strictly from cache.
 
     Args:
         from_local_cache_only (bool): If True, strictly load from the local cache without checking the Hugging Face Hub online. Requires the model to be downloaded previously.
+        backend (str): "pytorch", "onnx" or "fake". Falls back to PyTorch if the ONNX export/session fails.
     """
     
     global pyannote_pipeline_instance
+    if pyannote_pipeline_instance is None and backend == "fake":
+        from tasks.fake_backends import FakeDiarizationPipeline
+        pyannote_pipeline_instance = FakeDiarizationPipeline()
+        for option in BATCH_SIZE_OPTIONS:
+            pipeline_default_batch_sizes[option] = getattr(pyannote_pipeline_instance, option)
+        print("Note: Using the fake diarization pipeline")
+        return
+    
     if pyannote_pipeline_instance is None: 
         try:
             pyannote_pipeline_instance = Pipeline.from_pretrained(
@@ -41,19 +102,372 @@ def load_pyannote_pipeline(from_local_cache_only: bool = False):
             
             if from_local_cache_only:
                 print("Note: Pyannote loaded strictly from local cache")
+            
+            for option in BATCH_SIZE_OPTIONS:
+                pipeline_default_batch_sizes[option] = getattr(pyannote_pipeline_instance, option)
+            
+            if backend == "onnx":
+                if DEVICE != "cpu":
+                    print(f"Warning: DIARIZATION_BACKEND=onnx only runs on CPU, staying on PyTorch ({DEVICE})")
+                else:
+                    try:
+                        diarize_onnx.apply_onnx_runtime(pyannote_pipeline_instance, PYANNOTE_PIPELINE_NAME)
+                    except Exception as e:
+                        # The swap is per sub-model, reload so a half applied swap never sticks around
+                        print(f"Warning: ONNX Runtime setup failed, reloading the PyTorch pipeline: {e}")
+                        pyannote_pipeline_instance = None
+                        load_pyannote_pipeline(from_local_cache_only, backend="pytorch")
+            elif backend != "pytorch":
+                print(f"Warning: Unknown DIARIZATION_BACKEND '{backend}', using PyTorch")
                 
         except Exception as e:
             print(f"Fatel Error: Failed to load Pyannote pipeline '{PYANNOTE_PIPELINE_NAME}': {e}")
             pyannote_pipeline_instance = None
             # In prod raise a specific exception to stop startup
             
-async def run(audio_file_path: str) -> list[dict] | None:
+def resolve_diarization_options(**overrides) -> dict:
+    """
+    Merges per-request overrides over the server defaults (DIARIZATION_DEFAULTS).
+
+    Args:
+        **overrides: Any of num_speakers, min_speakers, max_speakers,
+                     segmentation_batch_size, embedding_batch_size (None = use the default).
+
+    Returns:
+        dict: The resolved options, None values mean "let pyannote decide".
+
+    Raises:
+        ValueError: If a value is not a positive integer, min_speakers > max_speakers,
+                    or num_speakers is outside [min_speakers, max_speakers].
+    """
+    options = {
+        name: overrides[name] if overrides.get(name) is not None else default
+        for name, default in DIARIZATION_DEFAULTS.items()
+    }
+    
+    for name, value in options.items():
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be a positive integer, got {value}")
+    
+    if options["min_speakers"] and options["max_speakers"] and options["min_speakers"] > options["max_speakers"]:
+        raise ValueError("min_speakers cannot be greater than max_speakers")
+    
+    num_speakers = options["num_speakers"]
+    if num_speakers and (
+        (options["min_speakers"] and num_speakers < options["min_speakers"])
+        or (options["max_speakers"] and num_speakers > options["max_speakers"])
+    ):
+        raise ValueError("num_speakers must be between min_speakers and max_speakers")
+    
+    return options
+
+
+class DiarizationCancelled(Exception):
+    """ Raised inside the pipeline (from its progress hook) to stop a pass nobody waits for anymore """
+
+
+def cancellation_hook(cancel_event: threading.Event | None) -> Callable | None:
+    """
+    Pyannote progress hook (called between segmentation & embedding batches) that stops the pass once cancel_event is set
+    """
+    if cancel_event is None:
+        return None
+
+    def hook(step_name, step_artifact, file=None, total=None, completed=None):
+        if cancel_event.is_set():
+            raise DiarizationCancelled(f"Stopped during {step_name}")
+
+    return hook
+
+
+def call_pipeline(audio, options: dict, **pipeline_kwargs):
+    """
+    Runs the loaded pipeline once with the speaker count hints & batch sizes from options applied.
+    Blocking, meant to run in a thread pool.
+
+    Args:
+        audio: A file path or a {"waveform", "sample_rate"} dict.
+        options (dict): Resolved options from resolve_diarization_options.
+        **pipeline_kwargs: Extra pipeline call arguments (e.g. return_embeddings).
+
+    Returns:
+        The pipeline output (an Annotation, or (Annotation, embeddings) with return_embeddings=True).
+    """
+    speaker_kwargs = {
+        name: options[name]
+        for name in SPEAKER_COUNT_OPTIONS
+        if options.get(name) is not None
+    }
+    
+    with _pipeline_lock:
+        for option in BATCH_SIZE_OPTIONS:
+            batch_size = options.get(option) or pipeline_default_batch_sizes.get(option)
+            if batch_size and getattr(pyannote_pipeline_instance, option) != batch_size:
+                setattr(pyannote_pipeline_instance, option, batch_size)
+        
+        return pyannote_pipeline_instance(audio, **speaker_kwargs, **pipeline_kwargs)
+
+
+def merge_adjacent_turns(speaker_segments: list[dict], max_gap: float = 0.0) -> list[dict]:
+    """
+    Joins consecutive segments of the same speaker that touch (e.g. a turn cut at a window boundary)
+
+    Args:
+        speaker_segments (list[dict]): Segments sorted by start time.
+        max_gap (float): Largest gap in seconds still treated as the same turn.
+
+    Returns:
+        list[dict]: The merged segments.
+    """
+    merged = []
+    for segment in speaker_segments:
+        if merged and merged[-1]["speaker"] == segment["speaker"] \
+           and segment["start"] - merged[-1]["end"] <= max_gap:
+            merged[-1]["end"] = max(merged[-1]["end"], segment["end"])
+        else:
+            merged.append(dict(segment))
+    return merged
+
+
+def link_window_speakers(
+    window_centroids: list[np.ndarray | None],
+    threshold: float,
+    num_speakers: int | None = None,
+    min_speakers: int | None = None,
+    max_speakers: int | None = None
+) -> list[int]:
+    """
+    Clusters per-window speaker centroids into global speakers.
+    A speaker without a usable centroid (None, NaN/inf or all zeros, e.g. only very short turns)
+    can't be linked and becomes a global speaker of its own.
+
+    Args:
+        window_centroids (list[np.ndarray | None]): One embedding centroid per (window, local speaker).
+        threshold (float): Cosine distance threshold for agglomerative (average linkage) clustering.
+        num_speakers (int | None): Exact number of speakers, replaces the threshold when given.
+        min_speakers (int | None): Lower bound on the number of speakers.
+        max_speakers (int | None): Upper bound on the number of speakers.
+
+    Returns:
+        list[int]: Global speaker id (0 based) for each centroid, in input order.
+    """
+    linkable = [
+        index for index, centroid in enumerate(window_centroids)
+        if centroid is not None and np.all(np.isfinite(centroid)) and np.any(centroid)
+    ]
+    
+    cluster_by_index = {}
+    if len(linkable) == 1:
+        cluster_by_index[linkable[0]] = 0
+    elif linkable:
+        embeddings = np.vstack([window_centroids[index] for index in linkable])
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        
+        dendrogram = linkage(embeddings, method="average", metric="cosine")
+        
+        if num_speakers:
+            cluster_ids = fcluster(dendrogram, t=num_speakers, criterion="maxclust")
+        else:
+            cluster_ids = fcluster(dendrogram, t=threshold, criterion="distance")
+            cluster_count = len(set(cluster_ids))
+            if max_speakers and cluster_count > max_speakers:
+                cluster_ids = fcluster(dendrogram, t=max_speakers, criterion="maxclust")
+            elif min_speakers and cluster_count < min_speakers:
+                cluster_ids = fcluster(dendrogram, t=min_speakers, criterion="maxclust")
+        
+        cluster_by_index = dict(zip(linkable, cluster_ids.tolist()))
+    
+    if len(linkable) < len(window_centroids):
+        print(f"{len(window_centroids) - len(linkable)} window speakers have no usable embedding, kept as separate speakers")
+    
+    # fcluster ids are 1 based & arbitrary, renumber by first appearance so labels follow speaking order
+    renumbered = {}
+    return [
+        renumbered.setdefault(("linked", cluster_by_index[index]) if index in cluster_by_index else ("unlinked", index), len(renumbered))
+        for index in range(len(window_centroids))
+    ]
+
+
+def run_windowed(
+    audio_file_path: str,
+    duration: float,
+    window_seconds: float,
+    options: dict,
+    cancel_event: threading.Event | None = None,
+    deadline_at: float | None = None,
+    on_deadline: Callable[[float, float], None] | None = None
+) -> list[dict]:
+    """
+    Blocking windowed diarization, meant to run in a thread pool.
+    Each window is loaded, segmented and embedded on its own so only one window is in memory at a time.
+    Local speakers keep their pyannote centroid embedding and are linked across windows afterwards.
+
+    Args:
+        audio_file_path (str): The path to the audio file.
+        duration (float): Length of the audio in seconds.
+        window_seconds (float): Window length in seconds.
+        options (dict): Resolved options from resolve_diarization_options. Speaker count hints
+                        apply to the whole file, a single window only gets the upper bound.
+        cancel_event (threading.Event | None): Set when the request is cancelled, checked between windows.
+        deadline_at (float | None): time.monotonic() deadline, checked between windows. When it has passed
+                                    the windows done so far are linked and returned.
+        on_deadline (Callable[[float, float], None] | None): Called with the (start, end) range left undiarized.
+
+    Returns:
+        list[dict]: Speaker segments with global labels (SPEAKER_00, ...) and absolute times, sorted by start.
+    """
+    audio_loader = Audio(sample_rate=16000, mono="downmix")
+    
+    window_options = dict(options)
+    window_options.update(
+        num_speakers=None,
+        min_speakers=None,
+        max_speakers=options["num_speakers"] or options["max_speakers"]
+    )
+    
+    local_segments = [] # (centroid index, start, end)
+    window_centroids = []
+    
+    window_start = 0.0
+    windows_started = time.perf_counter()
+    while window_start < duration:
+        if cancel_event is not None and cancel_event.is_set():
+            # Nobody is waiting for the result anymore
+            print(f"Diarization cancelled at {window_start:.0f}s of {duration:.0f}s")
+            if window_start > 0:
+                # Remaining audio at the pace of the windows done so far
+                seconds_per_audio_second = (time.perf_counter() - windows_started) / window_start
+                metrics.increment("cancelled_compute_seconds_saved_total", (duration - window_start) * seconds_per_audio_second, resource="diarization")
+            return []
+        
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            print(f"Diarization deadline reached at {window_start:.0f}s of {duration:.0f}s")
+            if on_deadline is not None:
+                on_deadline(window_start, duration)
+            break
+        
+        window_end = min(window_start + window_seconds, duration)
+        print(f"Diarizing window {window_start:.0f}s - {window_end:.0f}s")
+        
+        waveform, sample_rate = audio_loader.crop(audio_file_path, Segment(window_start, window_end))
+        annotation, centroids = call_pipeline(
+            {"waveform": waveform, "sample_rate": sample_rate},
+            window_options,
+            return_embeddings=True,
+            hook=cancellation_hook(cancel_event)
+        )
+        
+        # Centroid rows follow annotation.labels() order, a missing or non-finite one is kept as None (not linked)
+        centroid_index_by_label = {}
+        for label_index, label in enumerate(annotation.labels()):
+            centroid_index_by_label[label] = len(window_centroids)
+            has_centroid = centroids is not None and label_index < len(centroids) and np.all(np.isfinite(centroids[label_index]))
+            window_centroids.append(centroids[label_index] if has_centroid else None)
+        
+        for segment, _, label in annotation.itertracks(yield_label=True):
+            if label in centroid_index_by_label:
+                local_segments.append((
+                    centroid_index_by_label[label],
+                    window_start + segment.start,
+                    window_start + segment.end
+                ))
+        
+        del waveform, annotation, centroids
+        window_start = window_end
+    
+    if not window_centroids:
+        return []
+    
+    global_ids = link_window_speakers(
+        window_centroids,
+        DIARIZATION_LINK_THRESHOLD,
+        num_speakers=options["num_speakers"],
+        min_speakers=options["min_speakers"],
+        max_speakers=options["max_speakers"]
+    )
+    print(f"Linked {len(window_centroids)} window speakers into {len(set(global_ids))} speakers")
+    
+    speaker_segments = sorted(
+        (
+            {
+                "speaker": f"SPEAKER_{global_ids[centroid_index]:02d}",
+                "start": round(start, 3),
+                "end": round(end, 3)
+            }
+            for centroid_index, start, end in local_segments
+        ),
+        key=lambda segment: segment["start"]
+    )
+    
+    return merge_adjacent_turns(speaker_segments)
+
+
+def diarize_file(
+    audio_file_path: str,
+    options: dict,
+    cancel_event: threading.Event | None = None,
+    deadline_at: float | None = None,
+    on_deadline: Callable[[float, float], None] | None = None
+) -> list[dict]:
+    """
+    Blocking diarization of a whole file, meant to run in a thread pool.
+    Files longer than DIARIZATION_WINDOW_SECONDS are diarized window by window (see run_windowed).
+
+    Args:
+        audio_file_path (str): The path to the audio file.
+        options (dict): Resolved options from resolve_diarization_options.
+        cancel_event (threading.Event | None): Set when the request is cancelled or out of time, the pass stops
+                                               at the next window or pipeline batch (raising DiarizationCancelled).
+        deadline_at / on_deadline: Time limit of windowed diarization, see run_windowed.
+
+    Returns:
+        list[dict]: Speaker segments with 'speaker', 'start', and 'end' keys (in seconds).
+
+    Raises:
+        DiarizationCancelled: If cancel_event was set during a pipeline call.
+    """
+    if DIARIZATION_WINDOW_SECONDS > 0:
+        duration = Audio().get_duration(audio_file_path)
+        if duration > DIARIZATION_WINDOW_SECONDS:
+            print(f"Using windowed diarization for {duration:.0f}s of audio")
+            return run_windowed(
+                audio_file_path,
+                duration,
+                DIARIZATION_WINDOW_SECONDS,
+                options,
+                cancel_event,
+                deadline_at,
+                on_deadline
+            )
+    
+    diarization_annotation = call_pipeline(audio_file_path, options, hook=cancellation_hook(cancel_event))
+    
+    # Convert Annotation segments to a list of dicts
+    
+    speaker_segments = []
+    
+    for segment, track, speaker in diarization_annotation.itertracks(yield_label=True):
+        speaker_segments.append({
+            "speaker": speaker,
+            "start": round(segment.start, 3),
+            "end": round(segment.end, 3)
+        })
+        
+    return speaker_segments
+
+
+async def run(audio_file_path: str, options: dict | None = None, deadline: RequestDeadline | None = None) -> list[dict] | None:
     """
     Runs speaker diarization on an audio file using the loaded Pyannote pipeline.
     Runs the blocking pipeline call in a thread pool.
 
     Args:
         audio_file_path (str): The path to the temporary audio file on the server.
+        options (dict | None): Resolved options from resolve_diarization_options
+                               (speaker count hints, batch sizes). None uses the server defaults.
+        deadline (RequestDeadline | None): Time budget of the request. Windowed diarization keeps the windows
+                                           done in time, a single pass that doesn't finish in time is stopped
+                                           and gives no speakers. Either way the undiarized range is recorded as uncovered.
 
     Returns:
         list[dict]: A list of dictionaries, where each dict represents a speaker segment
@@ -65,30 +479,49 @@ async def run(audio_file_path: str) -> list[dict] | None:
         print("Pyannote pipeline not loaded")
         return None
     
+    if options is None:
+        options = resolve_diarization_options()
+    
     try:
         # Pyannote pipeline is synchronous and blocking
         # Must run in a thread pool using run_in_executor
         
-        loop = asyncio.get_running_loop()
-        
-        diarization_annotation = await loop.run_in_executor(
-            None, 
-            pyannote_pipeline_instance,
-            audio_file_path
-        )
-        
-        # Convert Annotation segments to a list of dicts
+        # Queued through the fair scheduler (one work item per file)
+        cancel_event = threading.Event()
+        deadline_at = deadline.stage_expires_at("diarization") if deadline is not None else None
+        on_deadline = functools.partial(deadline.mark_uncovered, "diarization") if deadline is not None else None
+        # Windows check the deadline themselves, this only cuts off a single pass (or a window) running over
+        timeout = None if deadline_at is None else max(deadline_at - time.monotonic(), 0.0) + DIARIZATION_DEADLINE_GRACE_SECONDS
+        diarization_task = asyncio.ensure_future(scheduler.run(
+            "diarization",
+            diarize_file,
+            audio_file_path,
+            options,
+            cancel_event,
+            deadline_at,
+            on_deadline
+        ))
+        try:
+            done, _ = await asyncio.wait([diarization_task], timeout=timeout)
+        except asyncio.CancelledError:
+            # Client gone: the pass stops at the next window or batch, the worker is free for the next request
+            cancel_event.set()
+            diarization_task.cancel()
+            metrics.increment("diarization_stopped_total", reason="cancelled")
+            raise
         
-        speaker_segments = []
+        if not done:
+            # The event is set before the task is cancelled: the scheduler waits for the running pass to stop
+            print(f"Diarization out of time, stopping the pass for {audio_file_path}")
+            cancel_event.set()
+            diarization_task.cancel()
+            await asyncio.wait([diarization_task])
+            metrics.increment("diarization_stopped_total", reason="deadline")
+            duration = await asyncio.get_running_loop().run_in_executor(None, Audio().get_duration, audio_file_path)
+            deadline.mark_uncovered("diarization", 0.0, duration)
+            return []
         
-        for segment, track, speaker in diarization_annotation.itertracks(yield_label=True):
-            speaker_segments.append({
-                "speaker": speaker,
-                "start": round(segment.start, 3),
-                "end": round(segment.end, 3)
-            })
-            
-        return speaker_segments
+        return diarization_task.result()
     
     except Exception as e:
         print(f"An error occurred during diarization: {e}")
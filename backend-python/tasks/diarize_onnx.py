@@ -0,0 +1,197 @@
+import os
+import re
+import torch
+import numpy as np
+
+# --- ONNX Runtime execution for the pyannote sub-models
+# Exports the segmentation model and the speaker embedding network of a loaded pyannote
+# pipeline to ONNX once, caches the files locally, and swaps their forward passes for
+# ONNX Runtime CPU sessions. The rest of the Pipeline (chunking, aggregation, clustering)
+# is untouched, so the output format is exactly the same as the PyTorch path.
+#
+# Requires the optional onnxruntime package.
+
+PYANNOTE_ONNX_CACHE_DIR = os.getenv("PYANNOTE_ONNX_CACHE_DIR", os.path.expanduser("~/.cache/squeeko/onnx"))
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0")) # 0 lets ONNX Runtime decide
+ONNX_OPSET_VERSION = 17
+
+
+class _EmbeddingHead(torch.nn.Module):
+    """
+    The WeSpeaker ResNet without its fbank front end (fbank uses ops that don't export cleanly),
+    returning only the embedding
+    """
+
+    def __init__(self, resnet: torch.nn.Module):
+        super().__init__()
+        self.resnet = resnet
+
+    def forward(self, features: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        return self.resnet(features, weights=weights)[1]
+
+
+def _cache_path(pipeline_name: str, sub_model: str) -> str:
+    """
+    Cache file path for one exported sub-model.
+    The pyannote, torch & opset versions are part of the name, an upgrade exports again instead of reusing a stale file.
+    """
+    import pyannote.audio
+
+    versions = f"pyannote{pyannote.audio.__version__}-torch{torch.__version__}-opset{ONNX_OPSET_VERSION}"
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{pipeline_name}-{sub_model}-{versions}")
+    return os.path.join(PYANNOTE_ONNX_CACHE_DIR, f"{safe_name}.onnx")
+
+
+def _create_session(onnx_path: str):
+    """ Creates a CPU ONNX Runtime session for an exported model """
+    import onnxruntime
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_INTRA_OP_THREADS > 0:
+        session_options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+
+    return onnxruntime.InferenceSession(
+        onnx_path,
+        sess_options=session_options,
+        providers=["CPUExecutionProvider"]
+    )
+
+
+def _export(module: torch.nn.Module, example_inputs: tuple, onnx_path: str, input_names: list[str], output_names: list[str], dynamic_axes: dict):
+    """ Exports a module to ONNX, writing to a temp file first so a crash never leaves a half written cache entry """
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    temp_path = f"{onnx_path}.tmp"
+
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            example_inputs,
+            temp_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET_VERSION
+        )
+
+    os.replace(temp_path, onnx_path)
+    print(f"Exported ONNX model to {onnx_path}")
+
+
+def apply_segmentation(pipeline, pipeline_name: str):
+    """
+    Exports (if not cached) the segmentation model and routes its forward pass through ONNX Runtime
+
+    Returns:
+        str: Path of the ONNX file in use.
+    """
+    inference = pipeline._segmentation
+    model = inference.model
+    onnx_path = _cache_path(pipeline_name, "segmentation")
+
+    if not os.path.exists(onnx_path):
+        # Inference always feeds fixed length windows, only the batch axis varies
+        num_samples = int(inference.duration * model.hparams.sample_rate)
+        example_waveforms = torch.randn(1, 1, num_samples)
+        _export(
+            model,
+            (example_waveforms,),
+            onnx_path,
+            input_names=["waveforms"],
+            output_names=["scores"],
+            dynamic_axes={"waveforms": {0: "batch"}, "scores": {0: "batch"}}
+        )
+
+    session = _create_session(onnx_path)
+
+    def onnx_forward(waveforms: torch.Tensor) -> torch.Tensor:
+        scores = session.run(
+            None,
+            {"waveforms": waveforms.detach().cpu().numpy().astype(np.float32)}
+        )[0]
+        return torch.from_numpy(scores)
+
+    # Instance attribute shadows the class forward, nn.Module.__call__ picks it up
+    model.forward = onnx_forward
+    return onnx_path
+
+
+def apply_embedding(pipeline, pipeline_name: str) -> str | None:
+    """
+    Exports (if not cached) the speaker embedding ResNet and routes it through ONNX Runtime.
+    Only WeSpeaker based embeddings (pyannote 3.x default) are supported, others stay on PyTorch.
+
+    Returns:
+        str | None: Path of the ONNX file in use, None if the embedding model is not supported.
+    """
+    embedding_model = getattr(pipeline._embedding, "model_", None)
+    resnet = getattr(embedding_model, "resnet", None)
+    if resnet is None:
+        print("Warning: ONNX backend only supports WeSpeaker embeddings, embedding stays on PyTorch")
+        return None
+
+    onnx_path = _cache_path(pipeline_name, "embedding")
+
+    if not os.path.exists(onnx_path):
+        inference = pipeline._segmentation
+        num_samples = int(inference.duration * inference.model.hparams.sample_rate)
+        example_waveforms = torch.randn(1, 1, num_samples)
+
+        with torch.no_grad():
+            example_features = embedding_model.compute_fbank(example_waveforms)
+            # Masks come from the segmentation frames of the same window
+            num_mask_frames = inference.model(example_waveforms).shape[1]
+        example_weights = torch.ones(1, num_mask_frames)
+
+        _export(
+            _EmbeddingHead(resnet),
+            (example_features, example_weights),
+            onnx_path,
+            input_names=["features", "weights"],
+            output_names=["embeddings"],
+            dynamic_axes={
+                "features": {0: "batch", 1: "frames"},
+                "weights": {0: "batch", 1: "mask_frames"},
+                "embeddings": {0: "batch"}
+            }
+        )
+
+    session = _create_session(onnx_path)
+    torch_forward = resnet.forward
+
+    def onnx_forward(features: torch.Tensor, weights: torch.Tensor | None = None):
+        # The export always takes masks, unmasked calls keep using PyTorch
+        if weights is None:
+            return torch_forward(features)
+
+        embeddings = session.run(
+            None,
+            {
+                "features": features.detach().cpu().numpy().astype(np.float32),
+                "weights": weights.detach().cpu().numpy().astype(np.float32)
+            }
+        )[0]
+        # Same (loss placeholder, embedding) tuple the ResNet returns
+        return torch.tensor(0.0), torch.from_numpy(embeddings)
+
+    resnet.forward = onnx_forward
+    return onnx_path
+
+
+def apply_onnx_runtime(pipeline, pipeline_name: str):
+    """
+    Switches a loaded pyannote speaker diarization pipeline to ONNX Runtime for its
+    segmentation & embedding models (modified in place).
+
+    Args:
+        pipeline: A pyannote.audio SpeakerDiarization pipeline on the CPU.
+        pipeline_name (str): Pipeline name, used to key the exported file cache.
+
+    Returns:
+        The same pipeline.
+    """
+    segmentation_path = apply_segmentation(pipeline, pipeline_name)
+    embedding_path = apply_embedding(pipeline, pipeline_name)
+    print(f"Pyannote running on ONNX Runtime (segmentation={segmentation_path}, embedding={embedding_path})")
+    return pipeline
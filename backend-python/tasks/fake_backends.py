@@ -0,0 +1,402 @@
+import os
+import time
+import random
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from pyannote.audio import Audio
+from pyannote.core import Annotation, Segment
+from transformers import BatchEncoding
+
+from tasks import asr_backends
+
+# --- Fake model backends
+# Deterministic stand-ins for Whisper, the pyannote pipeline and the LLM, so the server plumbing
+# (model registry, scheduler, cancellation, deadlines, merge, summarization) can be exercised and load
+# tested without model weights, a GPU or a network. Selected with the backend switches:
+#   ASR_BACKEND=fake  DIARIZATION_BACKEND=fake  LLM_BACKEND=fake
+#
+# Every call takes a latency drawn from a configurable distribution and scaled by its input
+# (seconds of audio, generated tokens), part of it spent burning CPU, and can fail on purpose.
+# Outputs only depend on FAKE_MODEL_SEED and the input: the same audio always gives the same transcript.
+# Latency & failures also depend on the attempt, so a retried call can succeed.
+#
+# Per model, prefix FAKE_WHISPER / FAKE_DIARIZATION / FAKE_LLM:
+#   <prefix>_LATENCY               Mean seconds per unit (audio second, or generated token for the LLM)
+#   <prefix>_LATENCY_DISTRIBUTION  fixed, uniform, normal or lognormal
+#   <prefix>_LATENCY_SPREAD        uniform: +- share of the mean, normal: std dev / mean, lognormal: sigma
+#   <prefix>_CPU_BURN              Share of the latency spent computing instead of sleeping (0 - 1)
+#   <prefix>_FAILURE_RATE          Probability that a call raises FakeModelError
+#   <prefix>_LOAD_SECONDS          Time load() takes
+FAKE_MODEL_SEED = int(os.getenv("FAKE_MODEL_SEED", "0"))
+FAKE_LLM_PREFILL_LATENCY = float(os.getenv("FAKE_LLM_PREFILL_LATENCY", "0.0001")) # Seconds per prompt token
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+SAMPLE_RATE = 16000
+
+# The fake diarization tells speakers apart by pitch: band k is BASE_PITCH_HZ + k * PITCH_STEP_HZ (+- half a step).
+# benchmarks/synthetic_audio.py gives each synthetic speaker its own band
+BASE_PITCH_HZ = 100.0
+PITCH_STEP_HZ = 35.0
+MAX_PITCH_BANDS = 6
+
+# Material for fake transcripts & summaries
+FAKE_SENTENCES = [
+    "Let's start with the numbers from last week.",
+    "The release slipped because the migration took longer than planned.",
+    "I can take the follow up with the design team.",
+    "Do we have a date for the customer demo?",
+    "Support tickets went down after the last fix.",
+    "We should move the budget review to Thursday.",
+    "The new onboarding flow is ready for testing.",
+    "Can someone share the notes after the call?",
+    "I think we need one more week for the report.",
+    "The server costs are higher than expected this month.",
+    "Let's keep the scope small for the first version.",
+    "I'll send the updated plan by Friday.",
+]
+
+
+class FakeModelError(RuntimeError):
+    """ Failure injected by a fake model """
+
+
+class LatencyProfile:
+    """
+    How long a fake call takes and how often it fails
+    """
+
+    def __init__(
+        self,
+        seconds_per_unit: float = 0.0,
+        distribution: str = "fixed",
+        spread: float = 0.0,
+        cpu_burn: float = 0.0,
+        failure_rate: float = 0.0,
+        load_seconds: float = 0.0
+    ):
+        """
+        Raises:
+            ValueError: Unknown distribution.
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}', expected one of {list(LATENCY_DISTRIBUTIONS)}")
+
+        self.seconds_per_unit = seconds_per_unit
+        self.distribution = distribution
+        self.spread = spread
+        self.cpu_burn = min(max(cpu_burn, 0.0), 1.0)
+        self.failure_rate = failure_rate
+        self.load_seconds = load_seconds
+
+    @classmethod
+    def from_env(cls, prefix: str, default_seconds_per_unit: float) -> "LatencyProfile":
+        return cls(
+            seconds_per_unit=float(os.getenv(f"{prefix}_LATENCY", str(default_seconds_per_unit))),
+            distribution=os.getenv(f"{prefix}_LATENCY_DISTRIBUTION", "fixed").lower(),
+            spread=float(os.getenv(f"{prefix}_LATENCY_SPREAD", "0")),
+            cpu_burn=float(os.getenv(f"{prefix}_CPU_BURN", "0")),
+            failure_rate=float(os.getenv(f"{prefix}_FAILURE_RATE", "0")),
+            load_seconds=float(os.getenv(f"{prefix}_LOAD_SECONDS", "0"))
+        )
+
+    def sample(self, rng: random.Random, units: float) -> float:
+        """ Latency of one call processing `units` """
+        mean = self.seconds_per_unit * units
+        if mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(mean * rng.uniform(1 - self.spread, 1 + self.spread), 0.0)
+        if self.distribution == "normal":
+            return max(rng.gauss(mean, mean * self.spread), 0.0)
+        if self.distribution == "lognormal":
+            # mu chosen so the mean stays `mean` whatever the sigma (long tail to the right)
+            return mean * rng.lognormvariate(-self.spread ** 2 / 2, self.spread)
+        return mean
+
+
+def spend(seconds: float, cpu_burn: float = 0.0):
+    """
+    Takes `seconds`: the cpu_burn share multiplying matrices (numpy releases the GIL like torch does), the rest asleep
+    """
+    if seconds <= 0:
+        return
+    burn_until = time.perf_counter() + seconds * cpu_burn
+    if cpu_burn > 0:
+        matrix = np.full((128, 128), 1 / 128, dtype=np.float32)
+        while time.perf_counter() < burn_until:
+            matrix = matrix @ matrix # Stays 1/128 everywhere
+    time.sleep(seconds * (1 - cpu_burn))
+
+
+# Inputs whose attempt count is remembered (LRU): a retry soon after a failure is a new attempt,
+# an input not seen for a long time starts over at attempt 0
+ATTEMPTS_TRACKED = 4096
+
+
+class FakeModel:
+    """
+    Seeded randomness & failure injection shared by the fakes
+    """
+
+    def __init__(self, profile: LatencyProfile, seed: int = FAKE_MODEL_SEED):
+        self.profile = profile
+        self.seed = seed
+        self.calls = 0
+        self.failures = 0
+        self._attempts = OrderedDict() # input digest -> calls so far, the ATTEMPTS_TRACKED most recent inputs
+        self._lock = threading.Lock()
+
+    def begin(self, key: bytes, units: float) -> tuple[random.Random, float]:
+        """
+        Starts a call on an input.
+
+        Returns:
+            tuple[random.Random, float]: Generator for the output (same for every call on this input),
+                                         latency of this call in seconds.
+
+        Raises:
+            FakeModelError: If this attempt was picked to fail.
+        """
+        digest = zlib.crc32(key)
+        with self._lock:
+            attempt = self._attempts.pop(digest, 0)
+            self._attempts[digest] = attempt + 1
+            if len(self._attempts) > ATTEMPTS_TRACKED:
+                self._attempts.popitem(last=False)
+            self.calls += 1
+
+        call_rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        if call_rng.random() < self.profile.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise FakeModelError(f"Injected failure (input {digest:08x}, attempt {attempt})")
+
+        return random.Random(f"{self.seed}:{digest}"), self.profile.sample(call_rng, units)
+
+    def simulate(self, key: bytes, units: float) -> random.Random:
+        """ A whole call: waits out its latency (or fails), returns the generator for the output """
+        output_rng, seconds = self.begin(key, units)
+        spend(seconds, self.profile.cpu_burn)
+        return output_rng
+
+    def load(self):
+        spend(self.profile.load_seconds, self.profile.cpu_burn)
+
+
+# --- Whisper
+class FakeASRBackend(asr_backends.ASRBackend):
+    """
+    ASR backend giving voiced stretches of the audio sentences from FAKE_SENTENCES, in the common result schema
+    """
+
+    name = "fake"
+
+    def __init__(self, model_name: str, device: str = "cpu", profile: LatencyProfile | None = None, seed: int = FAKE_MODEL_SEED):
+        super().__init__(model_name, device)
+        self.fake = FakeModel(profile or LatencyProfile.from_env("FAKE_WHISPER", 0.02), seed)
+
+    def load(self):
+        self.fake.load()
+        self.model = self.name
+
+    def transcribe(self, audio: np.ndarray, task: str = "translate", language: str | None = None, **decoding_options) -> dict:
+        duration = len(audio) / SAMPLE_RATE
+        rng = self.fake.simulate(audio.tobytes(), duration)
+
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + rng.uniform(2.0, 8.0), duration)
+            window = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+            # Silence gets no text, like Whisper on pauses
+            if len(window) and float(np.sqrt(np.mean(window ** 2))) > 0.01:
+                segments.append({
+                    "start": round(start, 2),
+                    "end": round(end, 2),
+                    "text": " " + " ".join(rng.sample(FAKE_SENTENCES, rng.randint(1, 2)))
+                })
+            start = end
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": language or "en",
+            "segments": segments
+        }
+
+    def detect_language(self, audio: np.ndarray) -> dict[str, float]:
+        # A single decoder step, a fraction of a transcription
+        self.fake.simulate(b"language" + audio.tobytes(), len(audio) / SAMPLE_RATE * 0.1)
+        return {"en": 0.9, "fa": 0.1}
+
+
+# --- Diarization
+class FakeDiarizationPipeline:
+    """
+    Stands in for the pyannote pipeline (same call signature & outputs): half second frames with speech
+    are labelled by their dominant pitch band. Embeddings are one hot per band, so windowed diarization
+    links the same speaker across windows like it does with real centroids.
+    """
+
+    FRAME_SECONDS = 0.5
+    VOICED_RMS = 0.01
+
+    def __init__(self, profile: LatencyProfile | None = None, seed: int = FAKE_MODEL_SEED):
+        self.fake = FakeModel(profile or LatencyProfile.from_env("FAKE_DIARIZATION", 0.01), seed)
+        self.fake.load()
+        # Tuned per call by diarize.call_pipeline
+        self.segmentation_batch_size = 32
+        self.embedding_batch_size = 32
+
+    def __call__(self, audio, num_speakers=None, min_speakers=None, max_speakers=None, return_embeddings: bool = False, hook=None):
+        if isinstance(audio, dict):
+            waveform, sample_rate = audio["waveform"], audio["sample_rate"]
+        else:
+            waveform, sample_rate = Audio(sample_rate=SAMPLE_RATE, mono="downmix")(audio)
+        samples = np.asarray(waveform, dtype=np.float32).reshape(-1)
+        self.fake.simulate(samples.tobytes(), len(samples) / sample_rate)
+        if hook is not None:
+            # Like pyannote, after the (slow) segmentation step
+            hook("segmentation", None)
+
+        frame_length = int(self.FRAME_SECONDS * sample_rate)
+        frequencies = np.fft.rfftfreq(frame_length, 1 / sample_rate)
+        pitch_range = (frequencies >= BASE_PITCH_HZ - PITCH_STEP_HZ / 2) & (frequencies <= BASE_PITCH_HZ + MAX_PITCH_BANDS * PITCH_STEP_HZ)
+        window = np.hanning(frame_length)
+
+        annotation = Annotation()
+        current_band, turn_start = None, 0.0
+        for frame_start in range(0, len(samples) - frame_length + 1, frame_length):
+            frame = samples[frame_start:frame_start + frame_length]
+            band = None
+            if float(np.sqrt(np.mean(frame ** 2))) > self.VOICED_RMS:
+                spectrum = np.abs(np.fft.rfft(frame * window))
+                pitch = frequencies[pitch_range][np.argmax(spectrum[pitch_range])]
+                band = int(np.clip(round((pitch - BASE_PITCH_HZ) / PITCH_STEP_HZ), 0, MAX_PITCH_BANDS - 1))
+
+            if band != current_band:
+                if current_band is not None:
+                    annotation[Segment(turn_start, frame_start / sample_rate)] = f"SPEAKER_{current_band:02d}"
+                current_band, turn_start = band, frame_start / sample_rate
+        if current_band is not None:
+            annotation[Segment(turn_start, len(samples) / sample_rate)] = f"SPEAKER_{current_band:02d}"
+
+        if not return_embeddings:
+            return annotation
+        # Rows follow annotation.labels() order, like pyannote's centroids
+        bands = [int(label.split("_")[1]) for label in annotation.labels()]
+        return annotation, np.eye(MAX_PITCH_BANDS, dtype=np.float32)[bands]
+
+
+# --- LLM
+class FakeTokenizer:
+    """
+    Tokenizer with the interface summarize.py uses: every BYTES_PER_TOKEN bytes of UTF-8 are one token.
+    The id is computed from the bytes, nothing is stored per piece (memory stays flat under load),
+    and decode(encode(text)) == text
+    """
+
+    BYTES_PER_TOKEN = 4
+    # Ids of n byte pieces start after those of all shorter pieces, id 0 is the eos token
+    LENGTH_OFFSETS = [1 + sum(256 ** k for k in range(1, n)) for n in range(1, BYTES_PER_TOKEN + 1)]
+
+    pad_token = eos_token = "</s>"
+    pad_token_id = eos_token_id = 0
+    model_max_length = 32768
+
+    def encode(self, text: str) -> list[int]:
+        data = text.encode("utf-8")
+        return [
+            self.LENGTH_OFFSETS[len(piece) - 1] + int.from_bytes(piece, "big")
+            for piece in (data[i:i + self.BYTES_PER_TOKEN] for i in range(0, len(data), self.BYTES_PER_TOKEN))
+        ]
+
+    def _piece(self, token_id: int) -> bytes:
+        if token_id == self.eos_token_id:
+            return self.eos_token.encode("utf-8")
+        for length in range(self.BYTES_PER_TOKEN, 0, -1):
+            if token_id >= self.LENGTH_OFFSETS[length - 1]:
+                return (token_id - self.LENGTH_OFFSETS[length - 1]).to_bytes(length, "big")
+
+    def __call__(self, text: str, return_tensors: str | None = None, truncation: bool = False, max_length: int | None = None, **kwargs) -> BatchEncoding:
+        ids = self.encode(text)
+        if truncation and max_length:
+            ids = ids[:max_length]
+        if return_tensors is None:
+            return BatchEncoding({"input_ids": ids, "attention_mask": [1] * len(ids)})
+        return BatchEncoding({"input_ids": [ids], "attention_mask": [[1] * len(ids)]}, tensor_type=return_tensors)
+
+    def decode(self, ids, skip_special_tokens: bool = False) -> str:
+        ids = ids.tolist() if isinstance(ids, torch.Tensor) else ids
+        data = b"".join(
+            self._piece(token_id) for token_id in ids
+            if not (skip_special_tokens and token_id == self.eos_token_id)
+        )
+        # A character cut at the end of a partial sequence shows as U+FFFD, like a byte level BPE tokenizer
+        return data.decode("utf-8", errors="replace")
+
+    def apply_chat_template(self, messages: list[dict], tokenize: bool = False, add_generation_prompt: bool = True) -> str:
+        prompt = "".join(f"<|{message['role']}|>\n{message['content']}\n" for message in messages)
+        return prompt + ("<|assistant|>\n" if add_generation_prompt else "")
+
+
+def fake_summary_text(rng: random.Random, key_points: int = 4) -> str:
+    """
+    A structured summary in the format the prompts ask for ([MAIN TOPIC] ... [END])
+    """
+    points = "\n".join(f"- {sentence}" for sentence in rng.sample(FAKE_SENTENCES, min(key_points, len(FAKE_SENTENCES))))
+    tasks = "\n".join(f"- S{i + 1}: {rng.choice(FAKE_SENTENCES)}" for i in range(rng.randint(1, 3)))
+    return (
+        f"[MAIN TOPIC]\n{rng.choice(FAKE_SENTENCES)}\n\n"
+        f"[SUMMARY]\n{' '.join(rng.sample(FAKE_SENTENCES, 2))}\n\n"
+        f"[KEY POINTS]\n{points}\n\n"
+        f"[TASKS TO COMPLETE]\n{tasks}\n"
+        "[END]\n"
+    )
+
+
+class FakeLLM:
+    """
+    Causal LM with a generate() like transformers': one token at a time with the stopping criteria
+    checked after each (structured output end, cancellation). Prompts asking for the structured sections
+    get a fake_summary_text, others (chunk summaries, answers) a few sentences.
+    """
+
+    def __init__(
+        self,
+        tokenizer: FakeTokenizer,
+        profile: LatencyProfile | None = None,
+        prefill_seconds_per_token: float = FAKE_LLM_PREFILL_LATENCY,
+        seed: int = FAKE_MODEL_SEED
+    ):
+        self.tokenizer = tokenizer
+        self.fake = FakeModel(profile or LatencyProfile.from_env("FAKE_LLM", 0.002), seed)
+        self.fake.load()
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+
+    def eval(self):
+        return self
+
+    def generate(self, input_ids: torch.Tensor, attention_mask=None, max_new_tokens: int = 256, stopping_criteria=None, **kwargs) -> torch.Tensor:
+        prompt = self.tokenizer.decode(input_ids[0])
+        # The output length is only known once it is generated, the latency drawn is per token
+        rng, seconds_per_token = self.fake.begin(prompt.encode("utf-8"), 1)
+        spend(input_ids.shape[-1] * self.prefill_seconds_per_token, self.fake.profile.cpu_burn)
+
+        if "[MAIN TOPIC]" in prompt:
+            text = fake_summary_text(rng)
+        else:
+            text = " ".join(rng.sample(FAKE_SENTENCES, 3))
+        new_ids = (self.tokenizer.encode(text) + [self.tokenizer.eos_token_id])[:max_new_tokens]
+
+        output_ids = input_ids
+        for token_id in new_ids:
+            spend(seconds_per_token, self.fake.profile.cpu_burn)
+            output_ids = torch.cat([output_ids, torch.tensor([[token_id]], dtype=output_ids.dtype)], dim=-1)
+            if stopping_criteria is not None and bool(torch.as_tensor(stopping_criteria(output_ids, None)).all()):
+                break
+        return output_ids
@@ -0,0 +1,246 @@
+import os
+import gc
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+import torch
+
+from utils import metrics
+
+# --- Model registry
+# Models (several Whisper sizes, the LLM, ...) are registered with a loader and loaded on first use.
+# When the models held in memory exceed MODEL_RAM_BUDGET_MB, the least recently used idle ones are unloaded.
+# Models in use by a request are never unloaded; they are pinned between acquire() and release().
+MODEL_RAM_BUDGET_MB = float(os.getenv("MODEL_RAM_BUDGET_MB", "0")) # 0 = no budget, nothing is unloaded
+
+metrics.describe("model_loads_total", "counter", "Models loaded into memory")
+metrics.describe("model_load_failures_total", "counter", "Failed model loads")
+metrics.describe("model_evictions_total", "counter", "Models unloaded to stay within the RAM budget")
+metrics.describe("model_load_seconds", "gauge", "Duration of the last load of a model")
+metrics.describe("model_memory_mb", "gauge", "Memory held by a loaded model (0 when unloaded)")
+metrics.describe("model_registry_memory_mb", "gauge", "Memory held by all loaded models")
+metrics.describe("model_registry_budget_mb", "gauge", "Configured model RAM budget (0 = unlimited)")
+
+
+class ModelUnavailableError(RuntimeError):
+    """ A registered model could not be loaded """
+
+
+def current_rss_mb() -> float | None:
+    """
+    Resident memory of this process in MB (Linux), None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelEntry:
+    """
+    One registered model and its bookkeeping
+    """
+
+    def __init__(self, key: str, loader: Callable[[], Any], unloader: Callable[[Any], None] | None, size_estimate_mb: float):
+        self.key = key
+        self.loader = loader
+        self.unloader = unloader
+        self.size_estimate_mb = size_estimate_mb
+
+        self.model = None
+        self.size_mb = 0.0
+        self.in_use = 0               # Requests currently holding the model (pinned while > 0)
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loads registered models on demand and keeps their total memory under a budget (LRU unloading)
+    """
+
+    def __init__(self, ram_budget_mb: float):
+        self.ram_budget_mb = ram_budget_mb
+        self._entries = {}
+        self._lock = threading.RLock()
+        metrics.set_gauge("model_registry_budget_mb", ram_budget_mb)
+
+    def register(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        unloader: Callable[[Any], None] | None = None,
+        size_estimate_mb: float = 0.0
+    ):
+        """
+        Args:
+            key (str): Registry key, e.g. "whisper:tiny" or "llm".
+            loader (Callable[[], Any]): Blocking, returns the loaded model (raises on failure).
+            unloader (Callable[[Any], None] | None): Releases the model's resources (references are dropped either way).
+            size_estimate_mb (float): Memory the model is expected to take, used to make room before loading
+                                      and when the actual footprint can't be measured.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = ModelEntry(key, loader, unloader, size_estimate_mb)
+                metrics.set_gauge("model_memory_mb", 0.0, model=key)
+
+    def is_registered(self, key: str) -> bool:
+        return key in self._entries
+
+    def get_loaded(self, key: str) -> Any | None:
+        """ The model if it is currently loaded, None otherwise (doesn't load or pin it) """
+        entry = self._entries.get(key)
+        return entry.model if entry is not None else None
+
+    def loaded_mb(self) -> float:
+        return sum(entry.size_mb for entry in self._entries.values() if entry.model is not None)
+
+    def acquire(self, key: str) -> Any:
+        """
+        Returns the model, loading it first if needed, and pins it until release(key). Blocking.
+
+        Raises:
+            KeyError: Unknown key.
+            ModelUnavailableError: The loader failed.
+        """
+        with self._lock:
+            entry = self._entries[key]
+            entry.in_use += 1
+
+        try:
+            with entry.load_lock:
+                if entry.model is None:
+                    self._load(entry)
+                entry.last_used = time.monotonic()
+                return entry.model
+        except Exception:
+            self.release(key)
+            raise
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._entries[key]
+            entry.in_use = max(entry.in_use - 1, 0)
+            entry.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def use(self, key: str):
+        """
+        async with model_registry.use("whisper:tiny") as model: ...
+        Loading runs in the thread pool, the model stays pinned inside the block.
+        """
+        loop = asyncio.get_running_loop()
+        acquire_future = loop.run_in_executor(None, self.acquire, key)
+        try:
+            model = await asyncio.shield(acquire_future)
+        except asyncio.CancelledError:
+            # The load keeps going in its thread, unpin the model once it is done
+            acquire_future.add_done_callback(
+                lambda future: future.exception() is None and self.release(key)
+            )
+            raise
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def load(self, key: str) -> Any:
+        """ Loads a model without keeping it pinned (startup preloading) """
+        model = self.acquire(key)
+        self.release(key)
+        return model
+
+    def _load(self, entry: ModelEntry):
+        # Make room first so the new model doesn't push the process over the budget while loading
+        self._enforce_budget(extra_mb=entry.size_estimate_mb, exclude=entry.key)
+
+        print(f"Model registry: loading '{entry.key}'")
+        rss_before = current_rss_mb()
+        load_start = time.perf_counter()
+        try:
+            model = entry.loader()
+        except Exception as e:
+            metrics.increment("model_load_failures_total", model=entry.key)
+            raise ModelUnavailableError(f"Failed to load model '{entry.key}': {e}") from e
+        load_seconds = time.perf_counter() - load_start
+
+        rss_after = current_rss_mb()
+        measured_mb = rss_after - rss_before if rss_before is not None and rss_after is not None else 0.0
+        # Concurrent loads / allocator reuse make the delta noisy, the estimate is the floor
+        entry.size_mb = max(measured_mb, entry.size_estimate_mb)
+        entry.model = model
+
+        metrics.increment("model_loads_total", model=entry.key)
+        metrics.set_gauge("model_load_seconds", round(load_seconds, 3), model=entry.key)
+        metrics.set_gauge("model_memory_mb", round(entry.size_mb, 1), model=entry.key)
+        metrics.set_gauge("model_registry_memory_mb", round(self.loaded_mb(), 1))
+        print(f"Model registry: loaded '{entry.key}' in {load_seconds:.1f}s (~{entry.size_mb:.0f} MB)")
+
+        self._enforce_budget(exclude=entry.key)
+
+    def _enforce_budget(self, extra_mb: float = 0.0, exclude: str | None = None):
+        """
+        Unloads idle models, least recently used first, until the loaded models (+ extra_mb) fit the budget
+        """
+        if self.ram_budget_mb <= 0:
+            return
+
+        with self._lock:
+            while self.loaded_mb() + extra_mb > self.ram_budget_mb:
+                candidates = [
+                    entry for entry in self._entries.values()
+                    if entry.model is not None and entry.in_use == 0 and entry.key != exclude
+                ]
+                if not candidates:
+                    print(f"Warning: Model registry over budget ({self.loaded_mb() + extra_mb:.0f}/{self.ram_budget_mb:.0f} MB), every loaded model is in use")
+                    return
+                self.unload(min(candidates, key=lambda entry: entry.last_used).key, reason="budget")
+
+    def unload(self, key: str, reason: str = "manual"):
+        """
+        Unloads a model (if loaded and not in use)
+        """
+        with self._lock:
+            entry = self._entries[key]
+            if entry.model is None or entry.in_use > 0:
+                return
+
+            model, entry.model = entry.model, None
+            freed_mb, entry.size_mb = entry.size_mb, 0.0
+
+        if entry.unloader is not None:
+            try:
+                entry.unloader(model)
+            except Exception as e:
+                print(f"Warning: Unloader of '{key}' failed: {e}")
+        del model
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+        if reason == "budget":
+            metrics.increment("model_evictions_total", model=key)
+        metrics.set_gauge("model_memory_mb", 0.0, model=key)
+        metrics.set_gauge("model_registry_memory_mb", round(self.loaded_mb(), 1))
+        print(f"Model registry: unloaded '{key}' ({reason}, ~{freed_mb:.0f} MB)")
+
+    def describe(self) -> list[dict]:
+        """ State of every registered model (for logs / debugging) """
+        return [
+            {
+                "model": entry.key,
+                "loaded": entry.model is not None,
+                "memory_mb": round(entry.size_mb, 1),
+                "in_use": entry.in_use
+            }
+            for entry in self._entries.values()
+        ]
+
+
+model_registry = ModelRegistry(MODEL_RAM_BUDGET_MB)
@@ -0,0 +1,346 @@
+import os
+import re
+import math
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable
+
+import numpy as np
+
+from tasks import summarize
+from utils.segments import SegmentColumns
+
+# --- Retrieval over transcripts for follow-up questions
+# When /transcribe_and_diarize finishes, the merged segments are grouped into speaker turns and indexed:
+#   BM25 over the turn words (inverted index, a query only touches the postings of its own words)
+#   optional sentence embeddings of the turns in a normalized NumPy matrix (one matrix-vector product per query)
+# /ask retrieves the top-k turns and sends only those to the LLM, so a question costs the same
+# whether the meeting is 5 minutes or 5 hours long.
+#
+# Embeddings need the optional sentence-transformers package, set RETRIEVAL_EMBEDDING_MODEL to enable them.
+
+RETRIEVAL_EMBEDDING_MODEL = os.getenv("RETRIEVAL_EMBEDDING_MODEL", "") # e.g. "sentence-transformers/all-MiniLM-L6-v2", empty = BM25 only
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6")) # Turns sent to the LLM per question
+# Passage size bound (~250 tokens at the 4 characters per token estimate used for prompts): longer turns, and single
+# segments longer than this (a monologue), are split so no passage dominates BM25 or the embedding budget
+RETRIEVAL_TURN_MAX_CHARS = int(os.getenv("RETRIEVAL_TURN_MAX_CHARS", "1000"))
+RETRIEVAL_MAX_INDEXES = int(os.getenv("RETRIEVAL_MAX_INDEXES", "256")) # Transcripts kept indexed in memory (LRU)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant when combining BM25 & embedding rankings
+RRF_K = 60
+
+STOPWORDS = frozenset("""
+a an and are as at be but by do does did for from had has have he her his i if in into is it its
+me my no not of on or our she so than that the their them then there they this to was we were
+what when where which who why will with would you your
+""".split())
+
+embedding_model_instance = None
+
+# transcript_id -> TranscriptIndex
+retrieval_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+# transcript_id -> task building its index, concurrent requests for one transcript share the build
+_builds_in_flight = {}
+
+
+def load_embedding_model():
+    """
+    Loads the sentence embedding model if one is configured. Optional: without it retrieval is BM25 only.
+    """
+
+    global embedding_model_instance
+
+    if not RETRIEVAL_EMBEDDING_MODEL or embedding_model_instance is not None:
+        return
+
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("Warning: sentence-transformers not installed, retrieval uses BM25 only")
+        return
+
+    try:
+        print(f"Loading retrieval embedding model '{RETRIEVAL_EMBEDDING_MODEL}'")
+        embedding_model_instance = SentenceTransformer(RETRIEVAL_EMBEDDING_MODEL, device="cpu")
+        print("Retrieval embedding model loaded")
+    except Exception as e:
+        print(f"Warning: Failed to load retrieval embedding model, retrieval uses BM25 only: {e}")
+        embedding_model_instance = None
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """
+    L2 normalized float32 embeddings (rows), so cosine similarity is a dot product
+    """
+    return np.asarray(
+        embedding_model_instance.encode(texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False),
+        dtype=np.float32
+    )
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased words without stopwords
+    """
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """
+    Cuts a text into pieces of at most max_chars, at word boundaries when there is one
+    """
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def build_turns(merged_segments: SegmentColumns | list[dict], max_chars: int = RETRIEVAL_TURN_MAX_CHARS) -> list[dict]:
+    """
+    Groups consecutive segments of the same speaker into turns (the retrieval unit),
+    long turns are cut into passages of at most max_chars. A segment longer than that is split too,
+    its time range shared out by text length. Error markers are skipped.
+
+    Returns:
+        list[dict]: Turns with speaker, start, end & text.
+    """
+
+    turns = []
+    current = None
+
+    for speaker, start, end, text, error in SegmentColumns.coerce(merged_segments).rows():
+        text = text.strip()
+        if error is not None or not text:
+            continue
+
+        pieces = split_text(text, max_chars)
+        seconds_per_char = (end - start) / sum(len(piece) for piece in pieces)
+        piece_start = start
+        for piece_index, piece in enumerate(pieces):
+            piece_end = end if piece_index == len(pieces) - 1 else piece_start + len(piece) * seconds_per_char
+
+            if current is not None and current["speaker"] == speaker and len(current["text"]) + len(piece) < max_chars:
+                current["text"] += " " + piece
+                current["end"] = piece_end
+            else:
+                current = {
+                    "speaker": speaker,
+                    "start": piece_start,
+                    "end": piece_end,
+                    "text": piece
+                }
+                turns.append(current)
+            piece_start = piece_end
+
+    return turns
+
+
+class TranscriptIndex:
+    """
+    BM25 (+ optional embedding) index over the speaker turns of one transcript
+    """
+
+    def __init__(self, turns: list[dict], embeddings: np.ndarray | None = None):
+        self.turns = turns
+        self.embeddings = embeddings
+
+        # Inverted index: word -> (turn indices, term frequencies)
+        postings = {}
+        doc_lengths = np.zeros(len(turns), dtype=np.float32)
+        for turn_index, turn in enumerate(turns):
+            words = tokenize(turn["text"])
+            doc_lengths[turn_index] = len(words)
+            for word, frequency in Counter(words).items():
+                postings.setdefault(word, ([], []))
+                postings[word][0].append(turn_index)
+                postings[word][1].append(frequency)
+
+        average_length = float(doc_lengths.mean()) if len(turns) and doc_lengths.mean() > 0 else 1.0
+        # Per turn part of the BM25 denominator, precomputed once
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / average_length)
+
+        self.postings = {}
+        for word, (turn_indices, frequencies) in postings.items():
+            document_frequency = len(turn_indices)
+            idf = math.log(1 + (len(turns) - document_frequency + 0.5) / (document_frequency + 0.5))
+            self.postings[word] = (
+                np.asarray(turn_indices, dtype=np.int32),
+                np.asarray(frequencies, dtype=np.float32),
+                idf
+            )
+
+    def bm25_scores(self, question: str) -> np.ndarray:
+        scores = np.zeros(len(self.turns), dtype=np.float32)
+        for word in set(tokenize(question)):
+            if word not in self.postings:
+                continue
+            turn_indices, frequencies, idf = self.postings[word]
+            scores[turn_indices] += idf * frequencies * (BM25_K1 + 1) / (frequencies + self.length_norm[turn_indices])
+        return scores
+
+    def search(self, question: str, top_k: int) -> list[dict]:
+        """
+        Top-k turns for a question, in chronological order, each with its retrieval score
+
+        BM25 alone ranks by BM25 score, with embeddings both rankings are combined by reciprocal rank fusion
+        """
+
+        if not self.turns:
+            return []
+
+        top_k = min(top_k, len(self.turns))
+        bm25 = self.bm25_scores(question)
+
+        if self.embeddings is not None and embedding_model_instance is not None:
+            similarity = self.embeddings @ embed([question])[0]
+            scores = np.zeros(len(self.turns), dtype=np.float32)
+            for ranking_scores in (bm25, similarity):
+                ranks = np.empty(len(self.turns), dtype=np.float32)
+                ranks[np.argsort(-ranking_scores, kind="stable")] = np.arange(1, len(self.turns) + 1)
+                scores += 1.0 / (RRF_K + ranks)
+        else:
+            scores = bm25
+            # No word in common with any turn, nothing to retrieve
+            if not scores.any():
+                return []
+
+        # argpartition: O(turns) selection instead of a full sort
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[scores[best] > 0]
+
+        return [
+            {**self.turns[turn_index], "score": round(float(scores[turn_index]), 4)}
+            for turn_index in sorted(best.tolist())
+        ]
+
+
+def build_index(transcript_id: str, merged_segments: SegmentColumns | list[dict]) -> TranscriptIndex:
+    """
+    Builds (and keeps) the retrieval index of a transcript. Blocking, embeddings run on the CPU.
+    """
+
+    turns = build_turns(merged_segments)
+    embeddings = None
+    if embedding_model_instance is not None and turns:
+        try:
+            embeddings = embed([turn["text"] for turn in turns])
+        except Exception as e:
+            print(f"Warning: Failed to embed transcript '{transcript_id}', using BM25 only: {e}")
+
+    index = TranscriptIndex(turns, embeddings)
+
+    with _indexes_lock:
+        retrieval_indexes[transcript_id] = index
+        retrieval_indexes.move_to_end(transcript_id)
+        while len(retrieval_indexes) > RETRIEVAL_MAX_INDEXES:
+            retrieval_indexes.popitem(last=False)
+
+    print(f"Retrieval index built for '{transcript_id}': {len(turns)} turns, embeddings={'yes' if embeddings is not None else 'no'}")
+    return index
+
+
+def _build_from(transcript_id: str, load_segments: Callable[[], SegmentColumns | list[dict]]) -> TranscriptIndex:
+    return build_index(transcript_id, load_segments())
+
+
+def ensure_index(transcript_id: str, load_segments: Callable[[], SegmentColumns | list[dict]]) -> asyncio.Future:
+    """
+    Starts building a transcript's index in the thread pool (segments loaded there too) without waiting for it.
+    A build already running for the transcript is shared instead of started again.
+
+    Returns:
+        asyncio.Future: Resolves to the TranscriptIndex.
+    """
+    build = _builds_in_flight.get(transcript_id)
+    if build is None:
+        build = asyncio.get_running_loop().run_in_executor(None, _build_from, transcript_id, load_segments)
+        _builds_in_flight[transcript_id] = build
+
+        def on_done(future: asyncio.Future):
+            _builds_in_flight.pop(transcript_id, None)
+            if not future.cancelled() and future.exception() is not None:
+                print(f"Warning: Failed to index transcript '{transcript_id}': {future.exception()}")
+
+        build.add_done_callback(on_done)
+    return build
+
+
+def get_index(transcript_id: str) -> TranscriptIndex | None:
+    with _indexes_lock:
+        index = retrieval_indexes.get(transcript_id)
+        if index is not None:
+            retrieval_indexes.move_to_end(transcript_id)
+        return index
+
+
+def format_passages(passages: list[dict]) -> str:
+    """
+    Retrieved turns as transcript lines for the prompt
+    """
+    lines = []
+    for passage in passages:
+        minutes, seconds = divmod(int(passage["start"]), 60)
+        hours, minutes = divmod(minutes, 60)
+        timestamp = f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+        lines.append(f"[{timestamp}] {passage['speaker']}: {passage['text']}")
+    return "\n".join(lines)
+
+
+async def answer_question(
+    transcript_id: str,
+    load_segments: Callable[[], SegmentColumns],
+    question: str,
+    top_k: int = RETRIEVAL_TOP_K
+) -> dict:
+    """
+    Answers a question about a transcript from its top-k retrieved turns
+
+    Args:
+        transcript_id (str): Id of the stored transcript.
+        load_segments (Callable[[], SegmentColumns]): Loads its segments (blocking), only called to rebuild the index if it was evicted.
+        question (str): The user's question.
+        top_k (int): Turns sent to the LLM.
+
+    Returns:
+        dict: answer and the sources (retrieved turns), with an 'error' key on failure.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    index = get_index(transcript_id)
+    if index is None:
+        # Still being built after the transcript was stored, or evicted: wait for the (shared) build,
+        # a client that goes away doesn't stop it
+        index = await asyncio.shield(ensure_index(transcript_id, load_segments))
+
+    passages = await loop.run_in_executor(None, index.search, question, top_k)
+
+    if not passages:
+        return {
+            "answer": "The transcript doesn't seem to mention anything related to this question.",
+            "sources": []
+        }
+
+    content = f"Transcript excerpts:\n---\n{format_passages(passages)}\n---\n\nQuestion: {question.strip()}"
+    prompt = summarize.get_llm_prompt("question_answer", content)
+    answer = await summarize.generate_summary_async(prompt, summarize.token_budget("question_answer", content))
+
+    if answer.startswith("Error during LLM Summary") or answer.startswith("Error: LLM"):
+        return {"error": answer, "answer": "", "sources": passages}
+
+    return {
+        "answer": answer.strip(),
+        "sources": passages
+    }
@@ -4,10 +4,19 @@ import torch
 import time
 import json
 import re
+import resource
+import copy
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
 
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, StoppingCriteria, StoppingCriteriaList
+
+from utils.cache import TwoTierCache, make_cache_key
+from utils.segments import SegmentColumns
+from tasks.model_registry import model_registry
+from utils import metrics, scheduler
 
 # Getting token from env
 from dotenv import load_dotenv
@@ -17,13 +26,136 @@ HUGGING_FACE_HUB_TOKEN = os.getenv("HUGGING_FACE_HUB_TOKEN")
 # Select LLM Model
 LLM_MODEL_NAME = os.getenv("LLM_MODEL", "Mistral-7B-Instruct-v0.2")
 
+# "transformers", or "fake" for a deterministic stand-in without weights (see fake_backends.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "transformers").lower()
+
 # Detect device type
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+# --- CPU loading config
+# Weight-only quantization for CPU-only boxes: "none", "int8" or "int4" (needs optimum-quanto), opt-in
+# (changes the output quality, compare with benchmarks before switching a deployment over)
+LLM_CPU_QUANTIZATION = os.getenv("LLM_CPU_QUANTIZATION", "none").lower()
+# Compute dtype on CPU: "bfloat16" (recent Xeons/EPYCs) or "float32"
+LLM_CPU_DTYPE = os.getenv("LLM_CPU_DTYPE", "bfloat16").lower()
+# Runs a short generation after the first load of the process to report tokens per second
+LLM_STARTUP_BENCHMARK = os.getenv("LLM_STARTUP_BENCHMARK", "false").lower() == "true"
+
 # Load LLM on startup
 llm_model_instance = None
 llm_tokenizer_instance = None
 
+# Memory footprint (every load) & throughput (first load only) of the LLM
+llm_load_stats = {}
+_startup_benchmark_done = False
+
+# --- Generation settings
+# Part of every summary cache key, changing them invalidates cached summaries
+GENERATION_PARAMS = {
+    "do_sample": True,     # Use sampling (more creative) vs. greedy decoding (more deterministic)
+    "temperature": 0.7,    # Controls randomness (lower = more focused, higher = more creative) - use with do_sample=True
+    "top_p": 0.9,          # Nucleus sampling threshold - use with do_sample=True
+    "top_k": 50,           # Top-k sampling threshold - use with do_sample=True
+    # Add other parameters as needed (e.g., num_beams for beam search, no_repeat_ngram_size)
+}
+
+# Transcripts longer than this (characters) are summarized chunk by chunk then combined
+SINGLE_PASS_CHUNK_SIZE = 90000
+
+# Generation length per prompt type, sized from the length of the content being summarized:
+#   min + ratio * content tokens, capped at max (see token_budget)
+# Structured outputs usually end well before the budget (see StructuredOutputStoppingCriteria)
+TOKEN_BUDGETS = {
+    "single_full_summary_structured": {"min": 200, "ratio": 0.04, "max": 1000},
+    "chunk_summary": {"min": 80, "ratio": 0.01, "max": 400},
+    "final_structured_summary": {"min": 300, "ratio": 0.5, "max": 2000},
+    "rolling_structured_summary": {"min": 300, "ratio": 0.3, "max": 1000},
+    "question_answer": {"min": 300, "ratio": 0.0, "max": 300}, # Answer length doesn't grow with the excerpts
+}
+CHARS_PER_TOKEN = 4 # Rough estimate, avoids tokenizing the content twice
+
+# --- Transcript compaction
+# Consecutive same-speaker segments are merged into turns, speakers get short aliases (S1, S2, ...)
+# and a coarse timestamp is only emitted every TRANSCRIPT_TIMESTAMP_INTERVAL seconds.
+# Aliases in the summary are mapped back to the original speaker labels
+LLM_TRANSCRIPT_COMPACTION = os.getenv("LLM_TRANSCRIPT_COMPACTION", "true").lower() == "true"
+TRANSCRIPT_TIMESTAMP_INTERVAL = float(os.getenv("TRANSCRIPT_TIMESTAMP_INTERVAL", "60")) # Seconds between timestamps
+TRANSCRIPT_TURN_GAP = float(os.getenv("TRANSCRIPT_TURN_GAP", "5")) # Max silence (seconds) inside one merged turn
+
+# Prompt tokens before / after compaction, summed over all summarized transcripts
+compaction_stats = {"transcripts": 0, "original_tokens": 0, "compacted_tokens": 0}
+
+# --- Structured output markers
+# The structured prompts ask for these sections in this order, closed by [END]
+SECTION_MARKERS = {
+    "main_topic": "[MAIN TOPIC]",
+    "summary": "[SUMMARY]",
+    "key_points": "[KEY POINTS]",
+    "tasks_to_complete": "[TASKS TO COMPLETE]"
+}
+END_MARKER = "[END]"
+SECTION_MARKER_PATTERN = re.compile(r"\[(MAIN TOPIC|SUMMARY|KEY POINTS|TASKS TO COMPLETE|END)\]")
+SECTION_NAMES = {marker[1:-1]: key for key, marker in SECTION_MARKERS.items()}
+# A list item line: "- x", "* x", "• x", "1. x", "1) x"
+LIST_ITEM_PATTERN = re.compile(r"\n[ \t]*(?:[-\*•]|\d+[.)])[ \t]*")
+# A blank line followed by a line that is not a list item ends the (last) tasks section
+LIST_END_PATTERN = re.compile(r"\n[ \t]*\n[ \t]*(?![-\*•\s]|\d+[.)])")
+
+# --- Incremental (rolling) summarization
+# New transcript text is buffered until it fills a section, each full section is summarized once
+# and folded into a running summary, so an update costs O(new content) rather than O(meeting)
+ROLLING_SECTION_SIZE = int(os.getenv("ROLLING_SECTION_SIZE", "12000")) # Characters per summarized section
+ROLLING_MAX_STATES = int(os.getenv("ROLLING_MAX_STATES", "128")) # Transcripts kept in memory (LRU)
+
+# --- Shared prefix KV cache
+# Every prompt of a given type starts with the same chat template + instruction preamble.
+# Its past_key_values are computed once and reused, so prefill only runs over the new tokens
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "true").lower() == "true"
+PREFIX_CACHED_PROMPT_TYPES = (
+    "single_full_summary_structured",
+    "chunk_summary",
+    "final_structured_summary",
+    "rolling_structured_summary",
+    "question_answer",
+)
+# Stand-in content used to find where the fixed prefix of a prompt ends
+PREFIX_SENTINEL = "<<<SQUEEKO_PROMPT_CONTENT>>>"
+
+# prompt type -> {"input_ids", "past_key_values", "tokens", "prefill_seconds"}
+prompt_prefix_caches = {}
+prefix_cache_stats = {"hits": 0, "misses": 0, "prefill_seconds_saved": 0.0}
+
+# --- Assisted (speculative) decoding
+# A small draft model sharing the LLM's tokenizer proposes tokens, the LLM verifies them in one pass.
+# Decoding is greedy in this mode, so the output matches plain greedy decoding of the LLM.
+# Empty LLM_DRAFT_MODEL disables it
+LLM_DRAFT_MODEL_NAME = os.getenv("LLM_DRAFT_MODEL", "")
+LLM_DRAFT_NUM_TOKENS = int(os.getenv("LLM_DRAFT_NUM_TOKENS", "5")) # Tokens proposed per step (starting value, adapted by transformers)
+
+llm_draft_model_instance = None
+
+# Cumulative counters, see assisted_decoding_summary()
+assisted_decoding_stats = {
+    "calls": 0,
+    "generated_tokens": 0,
+    "proposed_tokens": 0,
+    "accepted_tokens": 0,
+    "seconds": 0.0
+}
+
+# Forward pass counters of the generate call running on the current thread
+_forward_counters = threading.local()
+
+# --- Summary cache
+# Keyed on the transcript content, model, prompt type & generation settings
+# Final summaries and per-chunk (map step) summaries share the cache, so a partly changed
+# transcript reuses the summaries of its unchanged chunks
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", ".cache/summaries") # Empty disables the disk tier
+SUMMARY_CACHE_TTL_HOURS = float(os.getenv("SUMMARY_CACHE_TTL_HOURS", "168")) # Summaries of user transcripts aren't kept longer
+
+summary_cache = TwoTierCache("summary", SUMMARY_CACHE_SIZE, SUMMARY_CACHE_DIR, ttl_seconds=SUMMARY_CACHE_TTL_HOURS * 3600)
+
 def load_llm_model():
     """ 
     Loads the LLM model & tokenizer into memory
@@ -32,6 +164,13 @@ def load_llm_model():
     
     global llm_model_instance, llm_tokenizer_instance
     
+    if LLM_BACKEND == "fake" and (llm_model_instance is None or llm_tokenizer_instance is None):
+        from tasks.fake_backends import FakeTokenizer, FakeLLM
+        llm_tokenizer_instance = FakeTokenizer()
+        llm_model_instance = FakeLLM(llm_tokenizer_instance)
+        print("Note: Using the fake LLM")
+        return
+    
     if llm_model_instance is None or llm_tokenizer_instance is None:
         print(f"Loading LLM model '{LLM_MODEL_NAME}' on device '{DEVICE}'")
 
@@ -70,7 +209,10 @@ def load_llm_model():
             }
             if bnb_config:
                 model_kwargs["quantization_config"] = bnb_config
+            elif DEVICE == "cpu":
+                model_kwargs.update(get_cpu_model_kwargs())
             
+            load_start = time.perf_counter()
             llm_model_instance = AutoModelForCausalLM.from_pretrained(
                 LLM_MODEL_NAME,
                 **model_kwargs
@@ -78,43 +220,409 @@ def load_llm_model():
                 
             llm_model_instance.eval()
             
+            llm_load_stats["load_seconds"] = round(time.perf_counter() - load_start, 2)
             print(f"LLM model '{LLM_MODEL_NAME}' loaded successfully")
             
+            report_llm_footprint()
+            
+            if LLM_DRAFT_MODEL_NAME:
+                load_draft_model(model_kwargs)
+            
+            # The draft model has no copy of the prefix cache, the two don't combine
+            if LLM_PREFIX_CACHE and llm_draft_model_instance is None:
+                build_prompt_prefix_caches()
+            
         except Exception as e:
             print(f"Fatal Error: Failed to load LLM '{LLM_MODEL_NAME}': {e}")
             
             llm_model_instance = None
             llm_tokenizer_instance = None
+
+
+# --- Model registry
+# The LLM is held by the model registry with the Whisper models, so it can be unloaded when
+# they need the memory and reloaded on the next summarization request
+LLM_MODEL_KEY = "llm"
+LLM_MEMORY_ESTIMATE_MB = float(os.getenv("LLM_MEMORY_ESTIMATE_MB", "8000")) # 7B int8 weights + runtime
+
+
+def load_llm_for_registry():
+    """ Registry loader: loads the LLM (and draft model / prefix caches), raises if it failed """
+    load_llm_model()
+    if llm_model_instance is None or llm_tokenizer_instance is None:
+        raise RuntimeError(f"LLM '{LLM_MODEL_NAME}' failed to load")
+    return llm_model_instance
+
+
+def unload_llm_model(model=None):
+    """
+    Registry unloader: drops the LLM, its draft model and the prefix KV caches.
+    The tokenizer is small and kept (prompt building & cache keys don't need the model).
+    """
+    global llm_model_instance, llm_draft_model_instance
+
+    llm_model_instance = None
+    llm_draft_model_instance = None
+    prompt_prefix_caches.clear()
+
+
+model_registry.register(
+    LLM_MODEL_KEY,
+    load_llm_for_registry,
+    unloader=unload_llm_model,
+    size_estimate_mb=LLM_MEMORY_ESTIMATE_MB
+)
+
+
+def load_draft_model(model_kwargs: dict):
+    """ 
+    Loads the small draft model used for assisted decoding, with the same loading options as the LLM.
+    The draft must share the LLM's vocabulary (its proposals are token ids), otherwise it is not used.
+    """
+    
+    global llm_draft_model_instance
+    
+    try:
+        print(f"Loading draft model '{LLM_DRAFT_MODEL_NAME}' for assisted decoding")
+        draft_tokenizer = AutoTokenizer.from_pretrained(
+            LLM_DRAFT_MODEL_NAME,
+            token=HUGGING_FACE_HUB_TOKEN if HUGGING_FACE_HUB_TOKEN else None
+        )
+        if draft_tokenizer.get_vocab() != llm_tokenizer_instance.get_vocab():
+            print(f"Warning: Draft model '{LLM_DRAFT_MODEL_NAME}' has a different tokenizer, assisted decoding disabled")
+            return
+        
+        llm_draft_model_instance = AutoModelForCausalLM.from_pretrained(
+            LLM_DRAFT_MODEL_NAME,
+            **model_kwargs
+        )
+        llm_draft_model_instance.eval()
+        llm_draft_model_instance.generation_config.num_assistant_tokens = LLM_DRAFT_NUM_TOKENS
+        
+        # Forward pass counting for the acceptance rate
+        llm_model_instance.register_forward_hook(count_forward_pass("target_forwards"))
+        llm_draft_model_instance.register_forward_hook(count_forward_pass("draft_forwards"))
+        
+        print(f"Draft model '{LLM_DRAFT_MODEL_NAME}' loaded, assisted decoding enabled")
+    except Exception as e:
+        print(f"Warning: Failed to load draft model '{LLM_DRAFT_MODEL_NAME}', assisted decoding disabled: {e}")
+        llm_draft_model_instance = None
+
+
+def count_forward_pass(counter_name: str):
+    """ 
+    Forward hook incrementing a counter of the generate call running on this thread (if it is counting)
+    """
+    
+    def hook(module, args, output):
+        counters = getattr(_forward_counters, "active", None)
+        if counters is not None:
+            counters[counter_name] = counters.get(counter_name, 0) + 1
+    return hook
+
+
+def generation_settings() -> dict:
+    """ 
+    The decoding settings actually in effect (part of the summary cache keys).
+    Assisted decoding always decodes greedily.
+    Summaries of the fake LLM are keyed apart, they never mix with real ones in the cache.
+    """
+    
+    if LLM_BACKEND == "fake":
+        return {**GENERATION_PARAMS, "backend": LLM_BACKEND}
+    if llm_draft_model_instance is not None:
+        return {"do_sample": False, "assistant_model": LLM_DRAFT_MODEL_NAME}
+    return GENERATION_PARAMS
+
+
+def generate_assisted(input_ids: torch.Tensor, **generation_params) -> torch.Tensor:
+    """ 
+    Blocking assisted generate call that records acceptance rate & throughput.
+    Every LLM forward pass verifies the draft's proposals and yields the accepted tokens plus one,
+    so accepted = generated - LLM passes, and every draft forward pass proposes one token.
+    """
+    
+    _forward_counters.active = {}
+    try:
+        start = time.perf_counter()
+        output_tokens = llm_model_instance.generate(
+            input_ids,
+            assistant_model=llm_draft_model_instance,
+            **generation_params
+        )
+        elapsed = time.perf_counter() - start
+        counters = _forward_counters.active
+    finally:
+        _forward_counters.active = None
+    
+    generated_tokens = output_tokens.shape[-1] - input_ids.shape[-1]
+    proposed_tokens = counters.get("draft_forwards", 0)
+    accepted_tokens = min(max(generated_tokens - counters.get("target_forwards", 0), 0), proposed_tokens)
+    
+    assisted_decoding_stats["calls"] += 1
+    assisted_decoding_stats["generated_tokens"] += generated_tokens
+    assisted_decoding_stats["proposed_tokens"] += proposed_tokens
+    assisted_decoding_stats["accepted_tokens"] += accepted_tokens
+    assisted_decoding_stats["seconds"] += elapsed
+    
+    acceptance_rate = accepted_tokens / proposed_tokens if proposed_tokens else 0.0
+    print(f"Assisted decoding: {generated_tokens} tokens, {generated_tokens / elapsed:.2f} tok/s, acceptance {acceptance_rate:.1%}")
+    
+    return output_tokens
+
+
+def assisted_decoding_summary() -> dict:
+    """ 
+    Overall acceptance rate & tokens per second of assisted decoding since startup
+    """
+    
+    stats = assisted_decoding_stats
+    return {
+        **stats,
+        "acceptance_rate": round(stats["accepted_tokens"] / stats["proposed_tokens"], 4) if stats["proposed_tokens"] else None,
+        "tokens_per_second": round(stats["generated_tokens"] / stats["seconds"], 2) if stats["seconds"] else None
+    }
+
+
+def cpu_supports_bf16() -> bool:
+    """ Checks for native bfloat16 support (AVX512-BF16 / AMX) through oneDNN """
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def get_cpu_model_kwargs() -> dict:
+    """ 
+    Builds the from_pretrained kwargs for the low memory CPU loading path:
+        Weight-only int8/int4 quantization (optimum-quanto), applied layer by layer while loading
+        bfloat16 compute where the CPU supports it
+        Streaming (low_cpu_mem_usage) load so the full precision checkpoint is never materialized at once
+    """
+    
+    compute_dtype = torch.float32
+    if LLM_CPU_DTYPE == "bfloat16":
+        if cpu_supports_bf16():
+            compute_dtype = torch.bfloat16
+        else:
+            print("Warning: bfloat16 not supported on this CPU, using float32 compute")
+    
+    cpu_kwargs = {
+        "device_map": "cpu",
+        "torch_dtype": compute_dtype,
+        "low_cpu_mem_usage": True
+    }
+    
+    if LLM_CPU_QUANTIZATION in ("int8", "int4"):
+        try:
+            from transformers import QuantoConfig
+            import optimum.quanto # noqa: F401 -- only checking it is installed
+
+            cpu_kwargs["quantization_config"] = QuantoConfig(weights=LLM_CPU_QUANTIZATION)
+        except ImportError as e:
+            print(f"Warning: {LLM_CPU_QUANTIZATION} CPU quantization needs optimum-quanto ({e}), loading unquantized")
+    elif LLM_CPU_QUANTIZATION != "none":
+        print(f"Warning: Unknown LLM_CPU_QUANTIZATION value '{LLM_CPU_QUANTIZATION}', loading unquantized")
+    
+    # What was actually applied (a requested quantization falls back to none without optimum-quanto)
+    quantization = LLM_CPU_QUANTIZATION if "quantization_config" in cpu_kwargs else "none"
+    llm_load_stats["cpu_quantization"] = quantization
+    print(f"CPU LLM load: quantization={quantization}, compute dtype={compute_dtype}")
+    return cpu_kwargs
+
+
+def report_llm_footprint():
+    """ 
+    Records & prints the loaded model's memory footprint, the process peak RSS,
+    and (optionally, once per process) the generation speed in tokens per second
+    """
+    
+    global _startup_benchmark_done
+    
+    if llm_model_instance is None or llm_tokenizer_instance is None:
+        return
+    
+    llm_load_stats["model_memory_mb"] = round(llm_model_instance.get_memory_footprint() / (1024 ** 2), 1)
+    # ru_maxrss is in KB on Linux
+    llm_load_stats["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    
+    # Registry reloads (after an eviction) don't benchmark again
+    if LLM_STARTUP_BENCHMARK and not _startup_benchmark_done:
+        _startup_benchmark_done = True
+        try:
+            inputs = llm_tokenizer_instance(
+                "Summarize: the meeting covered the budget.",
+                return_tensors="pt"
+            ).to(DEVICE)
+            
+            with torch.inference_mode():
+                start = time.perf_counter()
+                output_tokens = llm_model_instance.generate(
+                    **inputs,
+                    max_new_tokens=32,
+                    min_new_tokens=32,
+                    do_sample=False,
+                    pad_token_id=llm_tokenizer_instance.pad_token_id
+                )
+                elapsed = time.perf_counter() - start
+            
+            new_tokens = output_tokens.shape[-1] - inputs.input_ids.shape[-1]
+            llm_load_stats["tokens_per_second"] = round(new_tokens / elapsed, 2)
+        except Exception as e:
+            print(f"Warning: LLM startup benchmark failed: {e}")
+    
+    print(f"LLM footprint: {llm_load_stats}")
+
             
 # --- Helper Function
 # Format Transcript for LLM
-def format_transcript_for_llm(merged_segments: list[dict]) -> str:
+def format_transcript_for_llm(merged_segments: SegmentColumns | list[dict], include_header: bool = True, compactor: "TranscriptCompactor | None" = None) -> str:
     """ 
-    Formats the list of merged segments into a single text string for the LLM
-    Includes timestamps & speaker labels
+    Formats the merged segments (columns or segment dicts) into a single text string for the LLM
+    Includes timestamps & speaker labels, one line per segment, or compact turns when a compactor is given
+    
+    include_header=False formats just the lines, for appending to an existing transcript
     """
     
     if not merged_segments:
-        return "## Empty Transcript ##"
-    
-    formatted_text = "Meeting Transcript:\n\n"
-    for segment in merged_segments:
-        # Check segment has expected keys, use .get for safety
-        speaker = segment.get("speaker", "Unknown Speaker")
-        start_time = segment.get("start", 0.0)
-        end_time = segment.get("end", 0.0)
-        text = segment.get("text", "").strip()
-        
-        # Format timestamp (HH:MM:SS)
-        start_timestamp = time.strftime('%H:%M:%S' , time.gmtime(start_time))
-        end_timestamp = time.strftime('%H:%M:%S' , time.gmtime(end_time))
-
-        if "error" in segment:
-            formatted_text += f"[{start_timestamp} - {end_timestamp}] Error Processing: {text}\n"
-        else:
-            formatted_text += f"[{start_timestamp} - {end_timestamp}] {speaker}: {text}\n"
+        return "## Empty Transcript ##" if include_header else ""
+    
+    if compactor is not None:
+        lines = compactor.format_lines(merged_segments)
+    else:
+        lines = []
+        for speaker, start_time, end_time, text, error in SegmentColumns.coerce(merged_segments).rows():
+            text = text.strip()
+            
+            # Format timestamp (HH:MM:SS)
+            start_timestamp = time.strftime('%H:%M:%S' , time.gmtime(start_time))
+            end_timestamp = time.strftime('%H:%M:%S' , time.gmtime(end_time))
+            
+            if error is not None:
+                lines.append(f"[{start_timestamp} - {end_timestamp}] Error Processing: {text}")
+            else:
+                lines.append(f"[{start_timestamp} - {end_timestamp}] {speaker}: {text}")
+    
+    header = "Meeting Transcript:\n\n" if include_header else ""
+    return header + "\n".join(lines) + "\n"
+
+
+class TranscriptCompactor:
+    """ 
+    Token efficient transcript formatting:
+        [00:00] S1: merged turn text
+        S2: next turn
+        [01:02] S1: ...
+    The aliases & timestamp position carry over between calls, so a growing transcript
+    can be formatted piece by piece (rolling summaries)
+    """
+    
+    def __init__(self, timestamp_interval: float = TRANSCRIPT_TIMESTAMP_INTERVAL, turn_gap: float = TRANSCRIPT_TURN_GAP):
+        self.timestamp_interval = timestamp_interval
+        self.turn_gap = turn_gap
+        self.speaker_aliases = {}       # Original speaker label -> alias
+        self.last_timestamp = None      # Start time of the last emitted timestamp
+    
+    def alias(self, speaker: str) -> str:
+        if speaker not in self.speaker_aliases:
+            self.speaker_aliases[speaker] = f"S{len(self.speaker_aliases) + 1}"
+        return self.speaker_aliases[speaker]
+    
+    def format_timestamp(self, start_time: float) -> str:
+        """ 
+        "[mm:ss] " when a timestamp is due at this turn, "" otherwise
+        """
+        
+        if self.last_timestamp is not None and start_time < self.last_timestamp + self.timestamp_interval:
+            return ""
+        self.last_timestamp = start_time
+        
+        minutes, seconds = divmod(int(start_time), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"[{hours}:{minutes:02d}:{seconds:02d}] " if hours else f"[{minutes:02d}:{seconds:02d}] "
+    
+    def format_lines(self, merged_segments: SegmentColumns | list[dict]) -> list[str]:
+        """ 
+        Merges consecutive segments of the same speaker (gap <= turn_gap) into one line per turn
+        """
+        
+        lines = []
+        turn_speaker, turn_start, turn_end, turn_texts = None, 0.0, 0.0, []
+        
+        def flush():
+            if turn_texts:
+                lines.append(f"{self.format_timestamp(turn_start)}{self.alias(turn_speaker)}: {' '.join(turn_texts)}")
+        
+        for speaker, start_time, end_time, text, error in SegmentColumns.coerce(merged_segments).rows():
+            text = text.strip()
             
-    return formatted_text
+            if error is not None:
+                flush()
+                turn_speaker, turn_texts = None, []
+                lines.append(f"{self.format_timestamp(start_time)}Error Processing: {text}")
+                continue
+            
+            if not text:
+                continue
+            
+            if speaker == turn_speaker and start_time - turn_end <= self.turn_gap:
+                turn_texts.append(text)
+                turn_end = max(turn_end, end_time)
+            else:
+                flush()
+                turn_speaker, turn_start, turn_end, turn_texts = speaker, start_time, end_time, [text]
+        
+        flush()
+        return lines
+    
+    def expand_aliases(self, structured_summary: dict) -> dict:
+        """ 
+        Replaces the speaker aliases in a parsed summary with the original speaker labels
+        """
+        
+        if not self.speaker_aliases or not structured_summary:
+            return structured_summary
+        
+        labels = {alias: speaker for speaker, alias in self.speaker_aliases.items()}
+        alias_pattern = re.compile(r"\b(" + "|".join(sorted(labels, key=len, reverse=True)) + r")\b")
+        
+        def expand(value):
+            if isinstance(value, str):
+                return alias_pattern.sub(lambda match: labels[match.group(1)], value)
+            if isinstance(value, list):
+                return [expand(item) for item in value]
+            return value
+        
+        return {key: expand(value) if key in SECTION_MARKERS else value for key, value in structured_summary.items()}
+
+
+def compaction_settings() -> dict | None:
+    """ 
+    The compaction settings in effect (part of the summary cache keys)
+    """
+    
+    if not LLM_TRANSCRIPT_COMPACTION:
+        return None
+    return {"timestamp_interval": TRANSCRIPT_TIMESTAMP_INTERVAL, "turn_gap": TRANSCRIPT_TURN_GAP}
+
+
+def report_compaction(merged_segments: SegmentColumns, compacted_text: str):
+    """ 
+    Logs (and accumulates in compaction_stats) how many prompt tokens compaction saved on a transcript
+    """
+    
+    if llm_tokenizer_instance is None:
+        return
+    
+    original_tokens = len(llm_tokenizer_instance(format_transcript_for_llm(merged_segments)).input_ids)
+    compacted_tokens = len(llm_tokenizer_instance(compacted_text).input_ids)
+    
+    compaction_stats["transcripts"] += 1
+    compaction_stats["original_tokens"] += original_tokens
+    compaction_stats["compacted_tokens"] += compacted_tokens
+    
+    reduction = 1 - compacted_tokens / original_tokens if original_tokens else 0.0
+    print(f"Transcript compaction: {original_tokens} -> {compacted_tokens} tokens ({reduction:.1%} fewer)")
 
 # --- Helper Function
 # Chunk text with overlap
@@ -189,6 +697,7 @@ A brief summary of the entire conversation based on the section summaries, highl
 - A bulleted list of any action items, tasks, or next steps mentioned, extracted from the section summaries. For each task, if a person responsible was mentioned in the original section summary, include their name.
 
 Ensure you include all sections even if some are empty (e.g., no tasks mentioned in any summary).
+End the output with [END] on its own line after the last section.
         """
     
     elif prompt_type == "chunk_summary":
@@ -222,6 +731,35 @@ A brief summary of the entire conversation, highlighting the most important them
 - A bulleted list of any action items, tasks, or next steps mentioned during the meeting. For each task, if a person responsible is mentioned or implied, include their name.
 
 Ensure you include all sections even if some are empty (e.g., no tasks mentioned).
+End the output with [END] on its own line after the last section.
+        """
+    elif prompt_type == "rolling_structured_summary":
+        instruction = f"""
+Update the running structured summary of an ongoing meeting with the new material that follows it. Keep everything from the current summary that is still relevant, merge in the new information, and do not drop earlier tasks unless the new material says they are done.
+
+{content}
+
+Provide the updated output using the exact markers provided:
+[MAIN TOPIC]
+A concise, overarching topic of the whole meeting so far.
+
+[SUMMARY]
+A brief summary of the entire conversation so far, highlighting the most important themes and outcomes.
+
+[KEY POINTS]
+- A bulleted list of the main discussion points, decisions made, or significant information shared so far.
+
+[TASKS TO COMPLETE]
+- A bulleted list of all action items, tasks, or next steps mentioned so far. For each task, if a person responsible was mentioned, include their name.
+
+Ensure you include all sections even if some are empty (e.g., no tasks mentioned).
+End the output with [END] on its own line after the last section.
+        """
+    elif prompt_type == "question_answer":
+        instruction = f"""
+Answer the question about a meeting using only the transcript excerpts below. Excerpts are in chronological order and start with their time and speaker. Answer concisely, mention who said what when it matters, and say so if the excerpts don't contain the answer.
+
+{content}
         """
     else:
         raise ValueError(f"Unknown prompt type: {prompt_type}")
@@ -245,11 +783,183 @@ Ensure you include all sections even if some are empty (e.g., no tasks mentioned
     return prompt
 
 
+# --- Helper
+# Precompute the KV cache of each prompt type's fixed prefix
+def build_prompt_prefix_caches():
+    """ 
+    Runs prefill once over the fixed prefix (chat template + instructions up to the content)
+    of every prompt type and keeps the resulting past_key_values for reuse.
+    Also records how long that prefill took, which is the time saved on every later call.
+    """
+    
+    if llm_model_instance is None or llm_tokenizer_instance is None:
+        return
+    
+    for prompt_type in PREFIX_CACHED_PROMPT_TYPES:
+        try:
+            prefix_text = get_llm_prompt(prompt_type, PREFIX_SENTINEL).split(PREFIX_SENTINEL)[0]
+            prefix_ids = llm_tokenizer_instance(prefix_text, return_tensors="pt").input_ids.to(DEVICE)
+            
+            # Tokens right at the boundary can merge with the content, leave the last one to the prompt
+            prefix_ids = prefix_ids[:, :-1]
+            
+            with torch.no_grad():
+                start = time.perf_counter()
+                outputs = llm_model_instance(prefix_ids, use_cache=True)
+                prefill_seconds = time.perf_counter() - start
+            
+            prompt_prefix_caches[prompt_type] = {
+                "input_ids": prefix_ids,
+                "past_key_values": outputs.past_key_values,
+                "tokens": prefix_ids.shape[-1],
+                "prefill_seconds": prefill_seconds
+            }
+            print(f"Prefix cache '{prompt_type}': {prefix_ids.shape[-1]} tokens, {prefill_seconds:.3f}s prefill")
+        except Exception as e:
+            print(f"Warning: Failed to build prefix cache for '{prompt_type}': {e}")
+
+
+def find_prompt_prefix_cache(input_ids: torch.Tensor) -> dict | None:
+    """ 
+    Returns the longest cached prefix the tokenized prompt starts with, or None
+    """
+    
+    best_match = None
+    for prefix_cache in prompt_prefix_caches.values():
+        prefix_length = prefix_cache["tokens"]
+        # At least one new token must be left for generate to run a forward pass on
+        if prefix_length >= input_ids.shape[-1]:
+            continue
+        if best_match is not None and prefix_length <= best_match["tokens"]:
+            continue
+        if torch.equal(input_ids[0, :prefix_length], prefix_cache["input_ids"][0]):
+            best_match = prefix_cache
+    return best_match
+
+
+# --- Helper
+# Token budget per call
+def token_budget(prompt_type: str, content: str) -> int:
+    """ 
+    Max new tokens for a prompt type, scaled with the length of the content being summarized
+    """
+    
+    budget = TOKEN_BUDGETS[prompt_type]
+    content_tokens = len(content) / CHARS_PER_TOKEN
+    return int(min(budget["min"] + budget["ratio"] * content_tokens, budget["max"]))
+
+
+# --- Helper
+# Where the structured output is complete
+def find_structured_output_end(text: str) -> int | None:
+    """ 
+    Position where the structured output is complete and closed, None while it is not.
+    All four sections must have started, and then one of:
+        [END] marker
+        a section marker repeated (the model started over)
+        a blank line followed by a non list line after the tasks content (the model rambles on)
+    """
+    
+    seen_sections = set()
+    tasks_content_start = None
+    
+    for match in SECTION_MARKER_PATTERN.finditer(text):
+        name = match.group(1)
+        complete = len(seen_sections) == len(SECTION_MARKERS)
+        
+        if complete and (name == "END" or name in seen_sections):
+            return match.start()
+        if name == "END":
+            continue
+        
+        seen_sections.add(name)
+        if name == "TASKS TO COMPLETE":
+            tasks_content_start = match.end()
+    
+    if len(seen_sections) == len(SECTION_MARKERS) and tasks_content_start is not None:
+        # Skip the blank lines right after the marker, the section needs content first
+        tasks_text = text[tasks_content_start:]
+        content_start = tasks_content_start + len(tasks_text) - len(tasks_text.lstrip())
+        list_end = LIST_END_PATTERN.search(text, content_start)
+        # Wait for a few characters of the next line ("10." is still a list item)
+        if list_end is not None and len(text) - list_end.end() >= 4:
+            return list_end.start()
+    
+    return None
+
+
+class StructuredOutputStoppingCriteria(StoppingCriteria):
+    """ 
+    Stops generation once the structured output is complete (see find_structured_output_end)
+    Generated tokens are detokenized incrementally, only the new tokens are decoded per step
+    """
+    
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.text = ""
+        # Tokens before prefix_offset are in self.text, tokens from read_offset on are not decoded yet
+        # Decoding from prefix_offset keeps the leading space / multi token characters right
+        self.prefix_offset = prompt_length
+        self.read_offset = prompt_length
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        tokens = input_ids[0].tolist()
+        
+        prefix_text = self.tokenizer.decode(tokens[self.prefix_offset:self.read_offset], skip_special_tokens=True)
+        new_text = self.tokenizer.decode(tokens[self.prefix_offset:], skip_special_tokens=True)
+        
+        # Incomplete utf-8 sequence, wait for the next token
+        if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+            self.text += new_text[len(prefix_text):]
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(tokens)
+        
+        done = find_structured_output_end(self.text) is not None
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+
+class CancelledStoppingCriteria(StoppingCriteria):
+    """ 
+    Stops an in-flight generation once its request is cancelled (client disconnected).
+    The generate call runs in a worker thread that asyncio can't interrupt, so the cancelled
+    coroutine sets the event and generation ends at the next token.
+    """
+    
+    def __init__(self, cancel_event: threading.Event, prompt_length: int, max_new_tokens: int):
+        self.cancel_event = cancel_event
+        self.prompt_length = prompt_length
+        self.max_new_tokens = max_new_tokens
+        self.started = time.perf_counter()
+        self.reported = False
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        cancelled = self.cancel_event.is_set()
+        if cancelled and not self.reported:
+            # Remaining budget at the pace so far (an upper bound, generation may have ended earlier at EOS)
+            generated_tokens = max(input_ids.shape[-1] - self.prompt_length, 1)
+            seconds_per_token = (time.perf_counter() - self.started) / generated_tokens
+            metrics.increment(
+                "cancelled_compute_seconds_saved_total",
+                max(self.max_new_tokens - generated_tokens, 0) * seconds_per_token,
+                resource="llm"
+            )
+            print(f"LLM generation cancelled after {generated_tokens}/{self.max_new_tokens} tokens")
+            self.reported = True
+        return torch.full((input_ids.shape[0],), cancelled, dtype=torch.bool, device=input_ids.device)
+
+
 # --- Helper
 # Run LLM Inference Async
-async def generate_summary_async(prompt: str, max_new_tokens: int) -> str:
+async def generate_summary_async(prompt: str, max_new_tokens: int, structured: bool = False) -> str:
     """ 
-    Runs the LLM text generation call in a thread pool    
+    Runs the LLM text generation call in a thread pool
+    
+    Args:
+        prompt (str): Full chat formatted prompt.
+        max_new_tokens (int): Generation budget (see token_budget).
+        structured (bool): The prompt asks for the [MAIN TOPIC]... sections, stop as soon as they are complete
+                           and drop anything generated after them.
     """
     
     global llm_model_instance, llm_tokenizer_instance
@@ -258,19 +968,13 @@ async def generate_summary_async(prompt: str, max_new_tokens: int) -> str:
         print("ErrorL LLM Model or Tokenizer not loaded")
         return "Error: LLM Model or Tokenizer not loaded"
     
-    loop = asyncio.get_running_loop()
-    
     # Define Generation Params
+    # Assisted decoding is greedy (sampling params don't apply)
     generation_params = {
         "max_new_tokens": max_new_tokens, # Maximum number of tokens to generate (summary length)
-        "do_sample": True,     # Use sampling (more creative) vs. greedy decoding (more deterministic)
-        "temperature": 0.7,    # Controls randomness (lower = more focused, higher = more creative) - use with do_sample=True
-        "top_p": 0.9,          # Nucleus sampling threshold - use with do_sample=True
-        "top_k": 50,           # Top-k sampling threshold - use with do_sample=True
-        "attention_mask": None, # Handled by tokenizer/pipeline typically
+        **(GENERATION_PARAMS if llm_draft_model_instance is None else {"do_sample": False}),
         "pad_token_id": llm_tokenizer_instance.pad_token_id or llm_tokenizer_instance.eos_token_id, # Set padding token
         "eos_token_id": llm_tokenizer_instance.eos_token_id, # Set end of sequence token
-        # Add other parameters as needed (e.g., num_beams for beam search, no_repeat_ngram_size)
     }
     
     try: 
@@ -285,15 +989,41 @@ async def generate_summary_async(prompt: str, max_new_tokens: int) -> str:
             max_length=llm_tokenizer_instance.model_max_length
         ).to(DEVICE)
         
+        # Reuse the precomputed KV cache of the prompt's fixed prefix
+        # generate mutates the cache it is given, so every call gets its own copy
+        if LLM_PREFIX_CACHE and prompt_prefix_caches:
+            prefix_cache = find_prompt_prefix_cache(inputs.input_ids)
+            if prefix_cache is not None:
+                generation_params["past_key_values"] = copy.deepcopy(prefix_cache["past_key_values"])
+                prefix_cache_stats["hits"] += 1
+                prefix_cache_stats["prefill_seconds_saved"] += prefix_cache["prefill_seconds"]
+                print(f"Prefix cache hit: skipping prefill of {prefix_cache['tokens']} tokens (~{prefix_cache['prefill_seconds']:.3f}s)")
+            else:
+                prefix_cache_stats["misses"] += 1
+        
+        cancel_event = threading.Event()
+        stopping_criteria = [CancelledStoppingCriteria(cancel_event, inputs.input_ids.shape[-1], max_new_tokens)]
+        if structured:
+            stopping_criteria.append(StructuredOutputStoppingCriteria(llm_tokenizer_instance, inputs.input_ids.shape[-1]))
+        generation_params["stopping_criteria"] = StoppingCriteriaList(stopping_criteria)
+        
         # Run Sync model gen in thread pool
         # llm_model_instance.generate -- is blocking call
-        output_tokens = await loop.run_in_executor(
-            None,
-            llm_model_instance.generate,
-            inputs.input_ids,
-            attention_mask=inputs.attention_mask,
-            **generation_params
-        )
+        # Queued through the fair scheduler, each generate call (map chunk, reduce step, ...) is one
+        # work item sized by its token budget
+        try:
+            output_tokens = await scheduler.run(
+                "llm",
+                llm_model_instance.generate if llm_draft_model_instance is None else generate_assisted,
+                inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                cost=max_new_tokens / 100,
+                **generation_params
+            )
+        except asyncio.CancelledError:
+            # Request cancelled: a queued call is dropped by the scheduler, a running one stops at the next token
+            cancel_event.set()
+            raise
         
         print("...End LLM Summary")
         
@@ -304,7 +1034,13 @@ async def generate_summary_async(prompt: str, max_new_tokens: int) -> str:
             skip_special_tokens=True
         )
         
-        print("LLM Output Ready")
+        generated_tokens = output_tokens.shape[-1] - inputs.input_ids.shape[-1]
+        if structured:
+            output_end = find_structured_output_end(generated_text)
+            if output_end is not None:
+                generated_text = generated_text[:output_end]
+        
+        print(f"LLM Output Ready ({generated_tokens}/{max_new_tokens} tokens)")
         return generated_text
     
     except Exception as e:
@@ -313,9 +1049,19 @@ async def generate_summary_async(prompt: str, max_new_tokens: int) -> str:
     
 # --- Helper
 # Parse the LLM output
+def split_list_items(block: str) -> list[str]:
+    """ 
+    Splits a bulleted / numbered block into its items
+    """
+    
+    return [item.strip() for item in LIST_ITEM_PATTERN.split("\n" + block) if item.strip()]
+
+
 def parse_llm_output(llm_output_text: str) -> dict:
     """ 
-    Parse the LLM text based on the expected struct
+    Parse the LLM text based on the expected struct, in a single pass over the section markers.
+    Each section runs up to the next marker, the first occurrence of a section wins and
+    anything after the complete output (see find_structured_output_end) is ignored.
     """
     
     print("Starting LLM output parse...")
@@ -326,78 +1072,41 @@ def parse_llm_output(llm_output_text: str) -> dict:
         "tasks_to_complete": []
     }
     
-    markers = {
-        "main_topic": "[MAIN TOPIC]",
-        "summary": "[SUMMARY]",
-        "key_points": "[KEY POINTS]",
-        "tasks_to_complete": "[TASKS TO COMPLETE]"
-    }
+    output_end = find_structured_output_end(llm_output_text)
+    if output_end is not None:
+        llm_output_text = llm_output_text[:output_end]
+    
+    markers = list(SECTION_MARKER_PATTERN.finditer(llm_output_text))
+    seen_sections = set()
+    
+    for i, match in enumerate(markers):
+        key = SECTION_NAMES.get(match.group(1))
+        if key is None or key in seen_sections:
+            continue
+        seen_sections.add(key)
+        
+        content_end = markers[i + 1].start() if i + 1 < len(markers) else len(llm_output_text)
+        content = llm_output_text[match.end():content_end].strip()
+        
+        if key in ("key_points", "tasks_to_complete"):
+            parsed_data[key] = split_list_items(content)
+        else:
+            parsed_data[key] = content
     
-    # Use find and slicing to extract content between markers
-    text_after_main_topic = ""
-    main_topic_start_marker_pos = llm_output_text.find("[MAIN TOPIC]")
-
-    if main_topic_start_marker_pos != -1:
-        main_topic_content_start = main_topic_start_marker_pos + len("[MAIN TOPIC]")
-
-        summary_start_marker_pos = llm_output_text.find("[SUMMARY]", main_topic_content_start)
-        main_topic_content_end = summary_start_marker_pos if summary_start_marker_pos != -1 else len(llm_output_text)
-        parsed_data["main_topic"] = llm_output_text[main_topic_content_start:main_topic_content_end].strip()
-        text_after_main_topic = llm_output_text[main_topic_content_end:] # Remaining text after main topic content
-
-
-    text_after_summary = ""
-    summary_start_marker_pos = text_after_main_topic.find("[SUMMARY]") if text_after_main_topic else llm_output_text.find("[SUMMARY]")
-    if summary_start_marker_pos != -1:
-         summary_start_abs_pos = (llm_output_text.find("[MAIN TOPIC]") + len("[MAIN TOPIC]") if llm_output_text.find("[MAIN TOPIC]") != -1 else 0) + summary_start_marker_pos if text_after_main_topic else summary_start_marker_pos
-         summary_content_start = summary_start_abs_pos + len("[SUMMARY]")
-
-         key_points_start_marker_pos = llm_output_text.find("[KEY POINTS]", summary_content_start)
-         summary_content_end = key_points_start_marker_pos if key_points_start_marker_pos != -1 else len(llm_output_text)
-         parsed_data["summary"] = llm_output_text[summary_content_start:summary_content_end].strip()
-         text_after_summary = llm_output_text[summary_content_end:]
-
-
-    key_points_start_marker_pos = text_after_summary.find("[KEY POINTS]") if text_after_summary else llm_output_text.find("[KEY POINTS]")
-    if key_points_start_marker_pos != -1:
-        key_points_start_abs_pos = (llm_output_text.find("[MAIN TOPIC]") + len("[MAIN TOPIC]") if llm_output_text.find("[MAIN TOPIC]") != -1 else 0) + (text_after_main_topic.find("[SUMMARY]") + len("[SUMMARY]") if text_after_main_topic.find("[SUMMARY]") != -1 else 0) + key_points_start_marker_pos if text_after_summary else key_points_start_marker_pos
-        key_points_content_start = key_points_start_abs_pos + len("[KEY POINTS]")
-
-        tasks_start_marker_pos = llm_output_text.find("[TASKS TO COMPLETE]", key_points_content_start)
-        key_points_content_end = tasks_start_marker_pos if tasks_start_marker_pos != -1 else len(llm_output_text)
-        key_points_block = llm_output_text[key_points_content_start:key_points_content_end].strip()
-
-        # This regex splits the block by lines starting with '-' or '*' followed by whitespace
-        key_point_items_with_markers = re.split(r'\n\s*[-\*]\s*', '\n' + key_points_block)
-        # Clean up items: remove potential leading/trailing whitespace and empty items
-        parsed_data["key_points"] = [item.strip() for item in key_point_items_with_markers if item.strip()]
-
-    # Find start of tasks section (from the end of key points or where tasks marker was found)
-    # Need a reliable way to find the start position if previous markers were missing.
-    # Let's search from the beginning of the text for the marker.
-    tasks_start_marker_pos = llm_output_text.find("[TASKS TO COMPLETE]")
-    if tasks_start_marker_pos != -1:
-         tasks_content_start = tasks_start_marker_pos + len("[TASKS TO COMPLETE]")
-         tasks_block = llm_output_text[tasks_content_start:].strip() 
-         
-         # Split block into list items (look for lines starting with '-' or '*' followed by space/text)
-         tasks_items_with_markers = re.split(r'\n\s*[-\*]\s*', '\n' + tasks_block)
-         parsed_data["tasks_to_complete"] = [item.strip() for item in tasks_items_with_markers if item.strip()]
-         
-
     print("LLM output parsing complete.")
     return parsed_data
 
 # --- Main Summarization Pipeline
-async def run(merged_segments: list[dict]) -> dict | None:
+async def run(merged_segments: SegmentColumns | list[dict]) -> dict | None:
     """ 
     Runs the summarization pipeline: 
         Formats Transcript
+        Checks the summary cache
         Prompts LLM
         Parses Output
         
     Args:
-        merged_segments (list[dict]): The list of merged transcription and diarization segments.
+        merged_segments (SegmentColumns | list[dict]): The merged transcription and diarization segments.
 
     Returns:
         dict | None: A dictionary containing the structured summary (main_topic, summary, key_points, tasks_to_complete), or None on failure.
@@ -419,10 +1128,56 @@ async def run(merged_segments: list[dict]) -> dict | None:
             "tasks_to_complete": []
         }
         
+    merged_segments = SegmentColumns.coerce(merged_segments)
+    
     # Step 1: Format Transcript
-    transcript_text = format_transcript_for_llm(merged_segments)
+    compactor = TranscriptCompactor() if LLM_TRANSCRIPT_COMPACTION else None
+    transcript_text = format_transcript_for_llm(merged_segments, compactor=compactor)
+    
+    prompt_type = "single_full_summary_structured" if len(transcript_text) <= SINGLE_PASS_CHUNK_SIZE else "final_structured_summary"
     
-    SINGLE_PASS_CHUNK_SIZE = 90000
+    # Same transcript + same model/prompt/generation settings -> same summary
+    cache_key = make_cache_key(
+        "structured_summary",
+        merged_segments.fingerprint(),
+        LLM_MODEL_NAME,
+        prompt_type,
+        generation_settings(),
+        TOKEN_BUDGETS,
+        compaction_settings()
+    )
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        print("Summary cache hit")
+        return cached_summary
+    
+    if compactor is not None:
+        # Formats the uncompacted transcript & tokenizes both, keep it off the event loop (and off cache hits)
+        await asyncio.get_running_loop().run_in_executor(None, report_compaction, merged_segments, transcript_text)
+    
+    structured_summary = await summarize_transcript_text(transcript_text)
+    if compactor is not None:
+        structured_summary = compactor.expand_aliases(structured_summary)
+    
+    # Never cache failures
+    if structured_summary and "error" not in structured_summary:
+        summary_cache.set(cache_key, structured_summary)
+    
+    return structured_summary
+
+
+async def summarize_transcript_text(transcript_text: str) -> dict:
+    """ 
+    Summarizes a formatted transcript, in a single pass when it fits,
+    otherwise chunk by chunk (map) followed by a combining pass (reduce).
+    Chunk summaries are cached individually.
+    
+    Args:
+        transcript_text (str): Output of format_transcript_for_llm.
+
+    Returns:
+        dict: The structured summary, with an 'error' key on failure.
+    """
     
     if len(transcript_text) <= SINGLE_PASS_CHUNK_SIZE:
     
@@ -430,7 +1185,11 @@ async def run(merged_segments: list[dict]) -> dict | None:
         llm_prompt = get_llm_prompt("single_full_summary_structured", transcript_text)
         
         # Step 3: Run LLM Async
-        llm_generated_text = await generate_summary_async(llm_prompt, 500)
+        llm_generated_text = await generate_summary_async(
+            llm_prompt,
+            token_budget("single_full_summary_structured", transcript_text),
+            structured=True
+        )
         
         if llm_generated_text.startswith("Error during LLM Summary"):
             print(f"LLM Generation Failed: {llm_generated_text}")
@@ -471,13 +1230,27 @@ async def run(merged_segments: list[dict]) -> dict | None:
         # Step 2: Summarize each chunk
         for i, chunk_text in enumerate(text_chunks):
             
-            chunk_prompt = get_llm_prompt("chunk_summary", chunk_text)
-            
-            chunk_summary_text = await generate_summary_async(chunk_prompt, 200)
+            chunk_cache_key = make_cache_key(
+                "chunk_summary",
+                chunk_text,
+                LLM_MODEL_NAME,
+                generation_settings(),
+                TOKEN_BUDGETS["chunk_summary"]
+            )
+            chunk_summary_text = summary_cache.get(chunk_cache_key)
             
-            if chunk_summary_text.startswith("Error during") or not chunk_summary_text.strip():
-                print("Error or empty summary...Skipping")
-                continue
+            if chunk_summary_text is None:
+                chunk_prompt = get_llm_prompt("chunk_summary", chunk_text)
+                
+                chunk_summary_text = await generate_summary_async(chunk_prompt, token_budget("chunk_summary", chunk_text))
+                
+                if chunk_summary_text.startswith("Error during") or not chunk_summary_text.strip():
+                    print("Error or empty summary...Skipping")
+                    continue
+                
+                summary_cache.set(chunk_cache_key, chunk_summary_text)
+            else:
+                print(f"Chunk {i+1} summary cache hit")
             
             chunk_summaries_list.append(f"Summary of Section {i+1}:\n{chunk_summary_text.strip()}")
             
@@ -500,7 +1273,11 @@ async def run(merged_segments: list[dict]) -> dict | None:
         final_summary_prompt = get_llm_prompt("final_structured_summary", combined_chunk_summaries_text)
         
         
-        llm_generated_text_final = await generate_summary_async(final_summary_prompt, 2000)
+        llm_generated_text_final = await generate_summary_async(
+            final_summary_prompt,
+            token_budget("final_structured_summary", combined_chunk_summaries_text),
+            structured=True
+        )
         
         if llm_generated_text_final.startswith("Error during"):
             print(f"LLM Generation Failed: {llm_generated_text_final}")
@@ -527,3 +1304,193 @@ async def run(merged_segments: list[dict]) -> dict | None:
                 "tasks_to_complete": [],
                 "raw_llm_output": llm_generated_text_final
             }
+
+
+
+# --- Incremental Summarization Pipeline
+class RollingSummaryState:
+    """ 
+    Summarization state for one growing transcript
+    """
+    
+    def __init__(self):
+        self.segment_count = 0            # Segments consumed so far
+        self.pending_text = ""            # Formatted transcript not yet summarized as a full section
+        self.section_summaries = []       # One summary per completed section
+        self.folded_summary_text = ""     # Running structured summary (raw LLM text) over completed sections
+        self.structured_summary = None    # Last published summary (completed sections + pending text)
+        self.compactor = TranscriptCompactor() if LLM_TRANSCRIPT_COMPACTION else None # Keeps speaker aliases stable across updates
+        self.lock = asyncio.Lock()        # Updates to one transcript are applied in order
+
+
+rolling_summary_states = OrderedDict() # (owner, transcript_id) -> RollingSummaryState
+
+
+def rolling_summary_taken(transcript_id: str, owner: str | None) -> bool:
+    """ 
+    True if another user already has a rolling summary under this transcript id
+    """
+    
+    return any(key_id == transcript_id and key_owner != owner for key_owner, key_id in rolling_summary_states)
+
+
+def get_rolling_summary_state(transcript_id: str, owner: str | None = None, reset: bool = False) -> RollingSummaryState:
+    """ 
+    Returns (creating if needed) the owner's rolling state for a transcript, evicting the least recently used ones
+    """
+    
+    key = (owner, transcript_id)
+    if reset or key not in rolling_summary_states:
+        rolling_summary_states[key] = RollingSummaryState()
+    rolling_summary_states.move_to_end(key)
+    
+    while len(rolling_summary_states) > ROLLING_MAX_STATES:
+        rolling_summary_states.popitem(last=False)
+    
+    return rolling_summary_states[key]
+
+
+def split_complete_sections(text: str, section_size: int) -> tuple[list[str], str]:
+    """ 
+    Cuts full sections (ending on a line break) off the front of the text
+
+    Returns:
+        tuple[list[str], str]: The full sections, and the remaining text shorter than a section.
+    """
+    
+    sections = []
+    while len(text) >= section_size:
+        cut = text.rfind("\n", 0, section_size) + 1 or section_size
+        sections.append(text[:cut])
+        text = text[cut:]
+    return sections, text
+
+
+async def reduce_rolling_summary(previous_summary_text: str, new_material_label: str, new_material: str) -> str:
+    """ 
+    Runs the cheap reduce step: current summary + new material -> updated structured summary text
+    Only the (bounded) previous summary and the new material are sent to the LLM
+    """
+    
+    content_parts = []
+    if previous_summary_text:
+        content_parts.append(f"Current summary:\n---\n{previous_summary_text.strip()}\n---")
+    content_parts.append(f"{new_material_label}:\n---\n{new_material.strip()}\n---")
+    
+    content = "\n\n".join(content_parts)
+    prompt = get_llm_prompt("rolling_structured_summary", content)
+    return await generate_summary_async(prompt, token_budget("rolling_structured_summary", content), structured=True)
+
+
+async def run_incremental(transcript_id: str, new_segments: list[dict], reset: bool = False, owner: str | None = None) -> dict:
+    """ 
+    Updates the summary of a growing transcript with newly appended segments:
+        Formats only the new segments and appends them to the pending text
+        Summarizes each newly completed section once (map, cached like run())
+        Folds the new section summaries into the running summary (reduce)
+        Publishes running summary + still pending text
+    
+    Args:
+        transcript_id (str): Client side id of the transcript (meeting).
+        new_segments (list[dict]): Merged segments appended since the last call.
+        reset (bool): Drop any existing state for this transcript first.
+        owner (str | None): User the state belongs to (check rolling_summary_taken() first).
+
+    Returns:
+        dict: The structured summary of everything received so far, with an 'error' key on failure.
+    """
+    
+    if llm_model_instance is None or llm_tokenizer_instance is None:
+        print("Error: LLM Model or Tokenizer not loaded")
+        return {"error": "Summarization model not loaded"}
+    
+    state = get_rolling_summary_state(transcript_id, owner=owner, reset=reset)
+    
+    async with state.lock:
+        if not new_segments and state.structured_summary is not None:
+            return state.structured_summary
+        
+        # The state is only updated once every step succeeded, a failed call can be retried with the same segments
+        # Step 1: Format only the new segments
+        # Formatting moves the compactor on (new aliases, last timestamp): work on a copy until then
+        compactor = copy.deepcopy(state.compactor)
+        pending_text = state.pending_text + format_transcript_for_llm(new_segments, include_header=False, compactor=compactor)
+        sections, pending_text = split_complete_sections(pending_text, ROLLING_SECTION_SIZE)
+        
+        # Step 2: Summarize each newly completed section
+        new_section_summaries = []
+        for section_text in sections:
+            section_number = len(state.section_summaries) + len(new_section_summaries) + 1
+            
+            section_cache_key = make_cache_key(
+                "chunk_summary",
+                section_text,
+                LLM_MODEL_NAME,
+                generation_settings(),
+                TOKEN_BUDGETS["chunk_summary"]
+            )
+            section_summary = summary_cache.get(section_cache_key)
+            
+            if section_summary is None:
+                section_summary = await generate_summary_async(
+                    get_llm_prompt("chunk_summary", section_text),
+                    token_budget("chunk_summary", section_text)
+                )
+                if section_summary.startswith("Error during"):
+                    print(f"Rolling summary: section {section_number} failed")
+                    return {
+                        "error": section_summary,
+                        "main_topic": "Summarization Failed",
+                        "summary": section_summary,
+                        "key_points": [],
+                        "tasks_to_complete": []
+                    }
+                summary_cache.set(section_cache_key, section_summary)
+            
+            new_section_summaries.append(f"Summary of Section {section_number}:\n{section_summary.strip()}")
+        
+        # Step 3: Fold the new section summaries into the running summary
+        folded_summary_text = state.folded_summary_text
+        if new_section_summaries:
+            folded_summary_text = await reduce_rolling_summary(
+                folded_summary_text,
+                "Summaries of the new sections",
+                "\n\n".join(new_section_summaries)
+            )
+            if folded_summary_text.startswith("Error during"):
+                return {
+                    "error": folded_summary_text,
+                    "main_topic": "Summarization Failed",
+                    "summary": folded_summary_text,
+                    "key_points": [],
+                    "tasks_to_complete": []
+                }
+        
+        # Step 4: Publish, the pending tail (< one section) is folded in without being committed
+        if pending_text.strip():
+            published_text = await reduce_rolling_summary(
+                folded_summary_text,
+                "Most recent part of the transcript",
+                pending_text
+            )
+            if published_text.startswith("Error during"):
+                return {
+                    "error": published_text,
+                    "main_topic": "Summarization Failed",
+                    "summary": published_text,
+                    "key_points": [],
+                    "tasks_to_complete": []
+                }
+        else:
+            published_text = folded_summary_text
+        
+        state.segment_count += len(new_segments)
+        state.pending_text = pending_text
+        state.folded_summary_text = folded_summary_text
+        state.section_summaries.extend(new_section_summaries)
+        state.compactor = compactor
+        state.structured_summary = parse_llm_output(published_text)
+        if state.compactor is not None:
+            state.structured_summary = state.compactor.expand_aliases(state.structured_summary)
+        print(f"Rolling summary updated for '{transcript_id}': {state.segment_count} segments, {len(state.section_summaries)} sections")
+        return state.structured_summary
@@ -1,10 +1,12 @@
 import asyncio
 import numpy as np
 import torch
-import whisper
 import pydub
 import os
 import time
+import functools
+import hashlib
+import subprocess
 from pydub import AudioSegment
 
 # Just for testing rn?
@@ -15,6 +17,11 @@ from audio_preprocessing import (
     convert_audio,
     trim_silence
 )
+from tasks import asr_backends
+from tasks.model_registry import model_registry, ModelUnavailableError
+from utils import metrics, scheduler
+from utils.cache import TwoTierCache, make_cache_key
+from utils.deadlines import RequestDeadline, DeadlineExceeded, DEADLINE_ERROR
 
 # Audio files for testing
 enAudio = "./audio/test_en.mp3"
@@ -26,35 +33,168 @@ WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "tiny") # Use medium for prod
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
-USE_FP16 = DEVICE == "cuda"
+# Opt-in int8 dynamic quantization of the Linear layers (openai-whisper backend, CPU only)
+# Set WHISPER_QUANTIZE=int8 on CPU-only boxes, see benchmarks/asr_benchmark.py for the accuracy/speed trade off
+WHISPER_QUANTIZE = os.getenv("WHISPER_QUANTIZE", "none").lower()
+
+# ASR engine: "openai-whisper" or "faster-whisper" (CTranslate2, int8 on CPU)
+ASR_BACKEND = os.getenv("ASR_BACKEND", "openai-whisper").lower()
+
+# Language is detected once per file from the first few chunks with speech in them
+LANGUAGE_DETECTION_CHUNKS = int(os.getenv("LANGUAGE_DETECTION_CHUNKS", "3"))
+LANGUAGE_DETECTION_MIN_DBFS = float(os.getenv("LANGUAGE_DETECTION_MIN_DBFS", "-45")) # Quieter chunks are treated as silence
+
+# Decoding profile per subscription tier (see asr_backends.DECODING_PROFILES), overridable per request
+TIER_DECODING_PROFILES = {
+    "free": os.getenv("DECODING_PROFILE_FREE", "fast"),
+    "paid": os.getenv("DECODING_PROFILE_PAID", "balanced"),
+}
+DEFAULT_DECODING_PROFILE = os.getenv("DECODING_PROFILE_DEFAULT", "balanced")
+
+# --- Chunk checkpoints
+# Every successfully transcribed chunk is written to disk as soon as it finishes, keyed by the audio
+# file's hash, the chunk index and everything that affects the result (backend, model, decoding, language).
+# A job that is retried or restarted after a crash/redeploy only transcribes the chunks that are missing
+# or failed (failed chunks are never checkpointed). Empty CHUNK_CHECKPOINT_DIR disables it.
+# A job's checkpoints are deleted once all its chunks are transcribed, the ones of jobs that are never
+# retried expire after CHUNK_CHECKPOINT_TTL_HOURS.
+CHUNK_CHECKPOINT_DIR = os.getenv("CHUNK_CHECKPOINT_DIR", ".cache/chunks")
+CHUNK_CHECKPOINT_TTL_HOURS = float(os.getenv("CHUNK_CHECKPOINT_TTL_HOURS", "24"))
+
+# Disk only (0 entries in memory): a chunk is read back at most once per retry
+chunk_checkpoints = TwoTierCache("chunk checkpoint", 0, CHUNK_CHECKPOINT_DIR, ttl_seconds=CHUNK_CHECKPOINT_TTL_HOURS * 3600)
+
+metrics.describe("transcription_chunks_resumed_total", "counter", "Chunks taken from a checkpoint instead of transcribed again")
+
+# --- Whisper models
+# Several Whisper sizes can be served side by side (e.g. tiny for the free tier, medium for paid),
+# each is registered in the model registry and loaded on first use. WHISPER_MODEL is the default
+# and the one preloaded at startup.
+WHISPER_MODELS = list(dict.fromkeys(
+    [WHISPER_MODEL_NAME] + [name.strip() for name in os.getenv("WHISPER_MODELS", "").split(",") if name.strip()]
+))
+
+# Whisper model per subscription tier, overridable per request (whisper_model form field)
+TIER_WHISPER_MODELS = {
+    "free": os.getenv("WHISPER_MODEL_FREE", WHISPER_MODEL_NAME),
+    "paid": os.getenv("WHISPER_MODEL_PAID", WHISPER_MODEL_NAME),
+}
+for tier_model in TIER_WHISPER_MODELS.values():
+    if tier_model not in WHISPER_MODELS:
+        WHISPER_MODELS.append(tier_model)
+
+# Rough resident size per model (MB, fp32 weights + runtime), used by the registry to make room before a load
+WHISPER_MODEL_SIZE_ESTIMATES_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 1000,
+    "medium": 3000,
+    "large": 6000,
+}
+
+
+def whisper_key(model_name: str) -> str:
+    """ Registry key of a Whisper model """
+    return f"whisper:{model_name}"
+
+
+def create_whisper_backend(model_name: str) -> asr_backends.ASRBackend:
+    """ Builds and loads the configured ASR backend for one Whisper model (blocking) """
+    backend_options = {}
+    if ASR_BACKEND == asr_backends.OpenAIWhisperBackend.name:
+        backend_options["quantize"] = WHISPER_QUANTIZE
+
+    backend = asr_backends.create_backend(ASR_BACKEND, model_name, DEVICE, **backend_options)
+    backend.load()
+    print(f"ASR backend loaded: {backend.describe()}")
+    return backend
+
+
+for whisper_model_name in WHISPER_MODELS:
+    size_estimate = WHISPER_MODEL_SIZE_ESTIMATES_MB.get(whisper_model_name.split(".")[0].split("-")[0], 1000)
+    if WHISPER_QUANTIZE == "int8":
+        size_estimate //= 3
+    model_registry.register(
+        whisper_key(whisper_model_name),
+        functools.partial(create_whisper_backend, whisper_model_name),
+        size_estimate_mb=size_estimate
+    )
 
-# Load model on start
-whisper_model_instance = None
 
 def load_whisper_model():
-    """ Loads Whisper model into memory. Intended to be called once at startup """
-    global whisper_model_instance
-    if whisper_model_instance is None:
-        try:
-            whisper_model_instance = whisper.load_model(WHISPER_MODEL_NAME, device=DEVICE)
-        except Exception as e:
-            print(f"Error loading Whisper model '{WHISPER_MODEL_NAME}' on device '{DEVICE}': {e}")
-            whisper_model_instance = None
-            
+    """ Preloads the default Whisper model. Intended to be called once at startup, the other sizes load on demand """
+    try:
+        model_registry.load(whisper_key(WHISPER_MODEL_NAME))
+    except ModelUnavailableError as e:
+        print(f"Error loading {ASR_BACKEND} model '{WHISPER_MODEL_NAME}' on device '{DEVICE}': {e}")
+
+
+def resolve_whisper_model(requested_model: str | None, tier: str | None) -> str:
+    """
+    Picks the Whisper model for a request: the explicitly requested one,
+    else the tier's model, else the default.
+
+    Raises:
+        ValueError: If the model is not one of the served WHISPER_MODELS.
+    """
+    model_name = requested_model or TIER_WHISPER_MODELS.get(tier) or WHISPER_MODEL_NAME
+
+    if model_name not in WHISPER_MODELS:
+        raise ValueError(f"Unknown Whisper model '{model_name}', expected one of {WHISPER_MODELS}")
 
-def prepare_audio(audio_url: str) -> list[AudioSegment] | None:
+    return model_name
+
+
+def resolve_language(requested_language: str | None) -> str | None:
+    """
+    Normalizes the language hint of a request, None when the language should be detected.
+
+    Raises:
+        ValueError: If the ASR backend doesn't know the language code.
+    """
+    if not requested_language or not requested_language.strip():
+        return None
+
+    language = requested_language.strip().lower()
+    if language not in asr_backends.supported_languages(ASR_BACKEND):
+        raise ValueError(f"Unknown language '{requested_language}', expected a language code such as 'en' or 'fa'")
+
+    return language
+
+
+def resolve_decoding_profile(requested_profile: str | None, tier: str | None) -> str:
+    """
+    Picks the decoding profile for a request: the explicitly requested one,
+    else the tier's profile, else the server default.
+
+    Raises:
+        ValueError: If the requested (or configured) profile does not exist.
+    """
+    profile_name = requested_profile or TIER_DECODING_PROFILES.get(tier) or DEFAULT_DECODING_PROFILE
+    
+    if profile_name not in asr_backends.DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{profile_name}', expected one of {list(asr_backends.DECODING_PROFILES)}")
+    
+    return profile_name
+
+
+def prepare_audio(audio_url: str, timeout: float | None = None) -> list[AudioSegment] | None:
     """
     Handles the full audio preprocessing pipeline: convert, trim, chunk.
 
     Args:
         audio_url (str): The file path or URL of the input audio file.
+        timeout (float | None): Time limit of the conversion in seconds (None = no limit).
 
     Returns:
         list[AudioSegment]: A list of 30-second AudioSegment chunks,
                             or None if processing fails.
+
+    Raises:
+        subprocess.TimeoutExpired: If the conversion took longer than timeout.
     """
     try:
-        audio_wav = convert_audio.to_wav(audio_url)
+        audio_wav = convert_audio.to_wav(audio_url, timeout=timeout)
         
         if audio_wav is None:
             return None
@@ -72,78 +212,231 @@ def prepare_audio(audio_url: str) -> list[AudioSegment] | None:
         
         return chunks
     
+    except subprocess.TimeoutExpired:
+        raise
     except Exception as e:
         print(f"An error occurred during audio prep: {e}")
         return None
             
 
-async def transcribe_chunk_async(audio_chunk: AudioSegment, chunk_index: int) -> dict | None:
+def chunk_to_float32(audio_chunk: AudioSegment) -> np.ndarray:
+    """
+    Converts an AudioSegment chunk to a format Whisper can accept (float32 numpy array in [-1, 1])
+    """
+    audio_data_int = np.array(audio_chunk.get_array_of_samples())
+    
+    if audio_chunk.sample_width == 2: # 16-bit audio
+        return audio_data_int.astype(np.float32) / 32768.0
+    elif audio_chunk.sample_width ==4: # 32-bit audio
+        return audio_data_int.astype(np.float32) / 2147483648.0
+    else: 
+        return audio_data_int.astype(np.float32) / 32768.0
+
+
+def hash_audio_file(audio_url: str) -> str:
+    """ 
+    sha256 of the uploaded file (blocking, reads it in 1 MB blocks)
     """
-    Asynchronously transcribes a single audio chunk using the loaded Whisper model.
+    digest = hashlib.sha256()
+    with open(audio_url, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_checkpoint_key(audio_hash: str, chunk_index: int, model_name: str, decoding_profile: str, language: str | None) -> str:
+    """ 
+    Checkpoint key of one chunk's transcription, any setting that changes the result is part of it
+    """
+    return make_cache_key(
+        "transcription_chunk",
+        audio_hash,
+        chunk_index,
+        ASR_BACKEND,
+        model_name,
+        WHISPER_QUANTIZE,
+        decoding_profile,
+        asr_backends.DECODING_PROFILES[decoding_profile],
+        language
+    )
+
+
+def language_checkpoint_key(audio_hash: str, model_name: str) -> str:
+    """ 
+    Checkpoint key of the language detected for a file, so a resumed job uses the same one
+    """
+    return make_cache_key("detected_language", audio_hash, ASR_BACKEND, model_name, LANGUAGE_DETECTION_CHUNKS)
+
+
+def delete_checkpoints(audio_hash: str, chunk_count: int, model_name: str, decoding_profile: str, language: str | None):
+    """ 
+    Deletes the chunk & language checkpoints of a finished job
+    """
+    for i in range(chunk_count):
+        chunk_checkpoints.delete(chunk_checkpoint_key(audio_hash, i, model_name, decoding_profile, language))
+    chunk_checkpoints.delete(language_checkpoint_key(audio_hash, model_name))
+
+
+async def detect_language_async(backend: asr_backends.ASRBackend, audio_chunks: list[AudioSegment]) -> str | None:
+    """
+    Detects the spoken language once for the whole file.
+    Runs language ID on the first few speech-bearing chunks (silent chunks are skipped)
+    and picks the language with the highest summed probability.
+
+    Args:
+        backend (asr_backends.ASRBackend): The loaded ASR backend.
+        audio_chunks (list[AudioSegment]): The prepared 30 second chunks of the file.
+
+    Returns:
+        str | None: The detected language code, or None if no chunk had speech or detection failed
+                    (each chunk then falls back to Whisper's own per-chunk detection).
+    """
+    speech_chunks = [
+        chunk for chunk in audio_chunks
+        if chunk.dBFS > LANGUAGE_DETECTION_MIN_DBFS
+    ][:LANGUAGE_DETECTION_CHUNKS]
+    
+    if not speech_chunks:
+        print("Language detection: no speech-bearing chunks found")
+        return None
+    
+    try:
+        # Language ID is a single decoder step, much cheaper than transcribing a chunk
+        chunk_probabilities = await asyncio.gather(*[
+            scheduler.run("whisper", backend.detect_language, chunk_to_float32(chunk), cost=0.1)
+            for chunk in speech_chunks
+        ])
+    except Exception as e:
+        print(f"Language detection failed, falling back to per-chunk detection: {e}")
+        return None
+    
+    language_scores = {}
+    for probabilities in chunk_probabilities:
+        for language, probability in probabilities.items():
+            language_scores[language] = language_scores.get(language, 0.0) + probability
+    
+    if not language_scores:
+        return None
+    
+    detected_language = max(language_scores, key=language_scores.get)
+    print(f"Detected language '{detected_language}' from {len(speech_chunks)} chunk(s)")
+    return detected_language
+            
+
+async def transcribe_chunk_async(
+    backend: asr_backends.ASRBackend,
+    audio_chunk: AudioSegment,
+    chunk_index: int,
+    language: str | None = None,
+    decoding_profile: str = DEFAULT_DECODING_PROFILE,
+    checkpoint_key: str | None = None
+) -> dict | None:
+    """
+    Asynchronously transcribes a single audio chunk using the loaded ASR backend.
     Runs the blocking transcribe call in a thread pool to avoid blocking the event loop.
 
     Args:
+        backend (asr_backends.ASRBackend): The loaded ASR backend.
         audio_chunk (AudioSegment): The AudioSegment chunk to transcribe (expected mono, 16kHz, 16-bit).
         chunk_index (int): The index of the chunk (for logging/debugging).
+        language (str | None): Source language for the chunk. None makes Whisper detect it for this chunk.
+        decoding_profile (str): Name of the asr_backends.DECODING_PROFILES entry to decode with.
+        checkpoint_key (str | None): When given, a checkpointed result is returned instead of transcribing,
+                                     and a successful result is checkpointed.
 
     Returns:
-        dict: The full result dictionary from model.transcribe, or None on critical error.
+        dict: The result dictionary from the ASR backend (text, language, segments), or None on critical error.
               Includes an 'error' key if transcription failed for this chunk.
     """
-    global whisper_model_instance
-    if whisper_model_instance is None:
-        return {"error": f"STT Model not loaded for chunk {chunk_index}"}
+    loop = asyncio.get_running_loop()
+    
+    # Transcribed before this job was interrupted / retried
+    if checkpoint_key is not None:
+        checkpointed_result = await loop.run_in_executor(None, chunk_checkpoints.get, checkpoint_key)
+        if checkpointed_result is not None:
+            metrics.increment("transcription_chunks_resumed_total")
+            return checkpointed_result
     
     # Convert AudioSegment to a format Whisper can accept (Numpy Array)
     try:
-        audio_data_int = np.array(audio_chunk.get_array_of_samples())
-        
-        if audio_chunk.sample_width == 2: # 16-bit audio
-            audio_data_float32 = audio_data_int.astype(np.float32) / 32768.0
-        elif audio_chunk.sample_width ==4: # 32-bit audio
-            audio_data_float32 = audio_data_int.astype(np.float32) / 2147483648.0
-        else: 
-            audio_data_float32 = audio_data_int.astype(np.float32) / 32768.0
-        
+        audio_data_float32 = chunk_to_float32(audio_chunk)
     except Exception as e:
-            return {"error": f"Audio prep error for chunk {chunk_index}"}
+        print(f"Audio prep failed for chunk {chunk_index}: {e}")
+        return {"error": f"Audio prep error for chunk {chunk_index}"}
         
         
     # Run the sync model.transcrive call in a thread pool
     # Crucial for non blocking asyncio event loop
+    # Queued through the fair scheduler: one chunk is one work item, so other requests
+    # can run between the chunks of a long file
     
-    loop = asyncio.get_running_loop()
     transcription_result = None
     try:
-        transcription_result = await loop.run_in_executor(
-            None, # Use the default thread pool provided by asyncio
-            whisper_model_instance.transcribe, # The blocking method to call
+        transcription_result = await scheduler.run(
+            "whisper",
+            backend.transcribe, # The blocking method to call
             audio_data_float32,
             task="translate",
-            fp16=USE_FP16,
+            language=language,
+            **asr_backends.DECODING_PROFILES[decoding_profile]
         )
     except Exception as e:
         transcription_result = {"text": f"[[Transcription Error for chunk {chunk_index}: {e}]]", "segments": [], "language": "error", "error": str(e)}
 
+    # Persist right away, a crash later in the job doesn't lose this chunk (failures are retried instead)
+    if checkpoint_key is not None and isinstance(transcription_result, dict) and "error" not in transcription_result:
+        await loop.run_in_executor(None, chunk_checkpoints.set, checkpoint_key, transcription_result)
+
     return transcription_result
 
 
-async def run_transcription_pipeline(audio_url: str) -> list[dict] | None:
+async def run_transcription_pipeline(
+    audio_url: str,
+    language: str | None = None,
+    decoding_profile: str = DEFAULT_DECODING_PROFILE,
+    model_name: str = WHISPER_MODEL_NAME,
+    deadline: RequestDeadline | None = None
+) -> list[dict] | None:
     """
-    Full asynchronous pipeline: prepare audio, transcribe chunks concurrently.
+    Full asynchronous pipeline: prepare audio, detect the language once, transcribe chunks concurrently.
 
     Args:
         audio_url (str): The file path or URL of the input audio file.
+        language (str | None): Optional language hint from the caller. When None the language is
+                               detected once from the first speech-bearing chunks and used for every chunk.
+        decoding_profile (str): Name of the decoding profile used for every chunk (see resolve_decoding_profile).
+        model_name (str): Whisper model to transcribe with (see resolve_whisper_model), loaded on demand.
+        deadline (RequestDeadline | None): Time budget of the request. Chunks not transcribed when the
+                                           transcription stage runs out become error markers and their
+                                           time ranges are recorded as uncovered.
+
+    Chunks are checkpointed as they finish (see CHUNK_CHECKPOINT_DIR), running the same file again
+    with the same settings only transcribes the chunks that are missing or failed.
+    The checkpoints are deleted once every chunk succeeded.
 
     Returns:
         list[dict]: A list of transcription result dictionaries for each chunk,
                     including error information if any chunk failed.
                     Returns None if audio preparation failed entirely.
                     Returns an empty list if audio preparation resulted in no chunks.
+
+    Raises:
+        ModelUnavailableError: If the Whisper model could not be loaded.
+        DeadlineExceeded: If the conversion did not finish within its budget (nothing to return yet).
     """
     
+    if deadline is None:
+        deadline = RequestDeadline(0, {})
+    
     # Run prepare_audio and get chunks
-    audio_chunks = prepare_audio(audio_url)
+    # FFmpeg & chunking are blocking, keep them off the event loop
+    try:
+        audio_chunks = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(prepare_audio, audio_url, timeout=deadline.stage_timeout("conversion"))
+        )
+    except subprocess.TimeoutExpired:
+        raise DeadlineExceeded("conversion")
     
     if audio_chunks is None:
         # Pipeline failure
@@ -153,14 +446,77 @@ async def run_transcription_pipeline(audio_url: str) -> list[dict] | None:
         # No audio to transcribe
         return []
     
-    # Create and run transcriptions concurrently
-    
-    transcription_tasks = [
-        transcribe_chunk_async(chunk, i) for i, chunk in enumerate(audio_chunks)
-    ]
+    transcription_expires_at = deadline.stage_expires_at("transcription")
     
-    # Run tasks concurrently using asyncio.gather
-    results = await asyncio.gather(*transcription_tasks, return_exceptions=True)
+    loop = asyncio.get_running_loop()
+    audio_hash = await loop.run_in_executor(None, hash_audio_file, audio_url) if CHUNK_CHECKPOINT_DIR else None
     
+    # The model stays pinned in the registry (not unloaded) until every chunk is done
+    async with model_registry.use(whisper_key(model_name)) as backend:
+        # Detect language once per file (saves a decoder pass per chunk & keeps it from flipping between chunks)
+        # A resumed job reuses the language of the first run, so its checkpointed chunks still match
+        if language is None:
+            language_key = language_checkpoint_key(audio_hash, model_name) if audio_hash else None
+            checkpointed_language = await loop.run_in_executor(None, chunk_checkpoints.get, language_key) if language_key else None
+            if checkpointed_language is not None:
+                language = checkpointed_language["language"]
+            else:
+                language = await detect_language_async(backend, audio_chunks)
+                if language_key and language is not None:
+                    await loop.run_in_executor(None, chunk_checkpoints.set, language_key, {"language": language})
+
+        # Create and run transcriptions concurrently
+
+        transcription_tasks = [
+            asyncio.ensure_future(transcribe_chunk_async(
+                backend,
+                chunk,
+                i,
+                language,
+                decoding_profile,
+                checkpoint_key=chunk_checkpoint_key(audio_hash, i, model_name, decoding_profile, language) if audio_hash else None
+            ))
+            for i, chunk in enumerate(audio_chunks)
+        ]
+
+        # Run tasks concurrently, until they're all done or the transcription stage runs out of time
+        timeout = None if transcription_expires_at is None else max(transcription_expires_at - time.monotonic(), 0.0)
+        try:
+            _, pending = await asyncio.wait(transcription_tasks, timeout=timeout)
+        except asyncio.CancelledError:
+            for task in transcription_tasks:
+                task.cancel()
+            await asyncio.wait(transcription_tasks)
+            raise
+        
+        # Chunks still queued or running at the deadline are dropped, queued ones right away,
+        # running ones finish first: the model must stay pinned until nothing uses it any more
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    # Same shape as asyncio.gather(..., return_exceptions=True)
+    # Dropped chunks are marked like failed chunks
+    results = []
+    chunk_start = 0.0
+    for i, (chunk, task) in enumerate(zip(audio_chunks, transcription_tasks)):
+        chunk_end = chunk_start + len(chunk) / 1000.0
+        if task in pending:
+            deadline.mark_uncovered("transcription", chunk_start, chunk_end)
+            results.append({
+                "text": f"[[Chunk {i} not transcribed: deadline exceeded]]",
+                "segments": [],
+                "language": "error",
+                "error": DEADLINE_ERROR
+            })
+        else:
+            results.append(task.exception() or task.result())
+        chunk_start = chunk_end
+
+    # Nothing left to resume, don't keep the transcripts around
+    if audio_hash and not any(isinstance(result, BaseException) or "error" in result for result in results):
+        await loop.run_in_executor(None, delete_checkpoints, audio_hash, len(audio_chunks), model_name, decoding_profile, language)
+
     # Return list
-    return results
\ No newline at end of file
+    return results
@@ -206,6 +206,45 @@ async def test_summarize_audio(async_client: httpx.AsyncClient):
     assert isinstance(summary_data["tasks_to_complete"], list)
 
 
+# Test /summarize by reference to the transcript stored by /transcribe_and_diarize
+@pytest.mark.asyncio
+async def test_summarize_by_transcript_id(async_client: httpx.AsyncClient):
+    """Tests that /summarize accepts the transcript_id returned by /transcribe_and_diarize."""
+
+    audio_file_to_test = Path(enTestFile)
+
+    try:
+        with open_audio_file(audio_file_to_test) as f:
+            files = {"audio_file": (audio_file_to_test.name, f, "audio/mp3")}
+
+            response = await async_client.post(
+                "/transcribe_and_diarize",
+                files=files,
+                headers={"Authorization": TEST_TOKEN}
+            )
+    except FileNotFoundError as e:
+        pytest.skip(f"Skipping test: {e}")
+        return
+
+    assert response.status_code == 200
+    transcript_id = response.json()["transcript_id"]
+
+    response = await async_client.post(
+        "/summarize",
+        json={"transcript_id": transcript_id},
+        headers={"Authorization": TEST_TOKEN}
+    )
+    assert response.status_code == 200
+    assert "main_topic" in response.json()["summary"]
+
+    response_unknown = await async_client.post(
+        "/summarize",
+        json={"transcript_id": "does-not-exist"},
+        headers={"Authorization": TEST_TOKEN}
+    )
+    assert response_unknown.status_code == 404
+
+
 # Test authentication failure
 @pytest.mark.asyncio
 async def test_auth_failure(async_client: httpx.AsyncClient):
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import time
+
+from pydub import AudioSegment
+
+from tasks import transcribe
+from utils.cache import TwoTierCache
+
+# Chunk checkpoints: finished chunks aren't transcribed again, failed ones are
+
+
+class CountingBackend:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    def transcribe(self, audio, task="translate", language=None, **decoding_options):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("decoder crashed")
+        return {"text": "hello", "language": language or "en", "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}]}
+
+
+def test_checkpointed_chunk_is_not_transcribed_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcribe, "chunk_checkpoints", TwoTierCache("test", 0, str(tmp_path)))
+    chunk = AudioSegment.silent(duration=1000, frame_rate=16000)
+    key = transcribe.chunk_checkpoint_key("audio-hash", 0, "tiny", "fast", "en")
+
+    failing = CountingBackend(fail=True)
+    result = asyncio.run(transcribe.transcribe_chunk_async(failing, chunk, 0, "en", "fast", checkpoint_key=key))
+    assert "error" in result
+
+    backend = CountingBackend()
+    for _ in range(2):
+        result = asyncio.run(transcribe.transcribe_chunk_async(backend, chunk, 0, "en", "fast", checkpoint_key=key))
+        assert result["text"] == "hello"
+    assert backend.calls == 1
+
+    # Another model / decoding profile doesn't reuse the checkpoint
+    assert transcribe.chunk_checkpoint_key("audio-hash", 0, "medium", "fast", "en") != key
+    assert transcribe.chunk_checkpoint_key("audio-hash", 0, "tiny", "accurate", "en") != key
+
+
+def test_checkpoints_expire_and_can_be_deleted(tmp_path):
+    checkpoints = TwoTierCache("test", 0, str(tmp_path), ttl_seconds=60)
+    checkpoints.set("old", {"text": "hello"})
+    checkpoints.set("new", {"text": "hello"})
+
+    old_path = checkpoints._disk_path("old")
+    os.utime(old_path, (time.time() - 120, time.time() - 120))
+    assert checkpoints.get("old") is None
+    assert not os.path.exists(old_path)
+
+    assert checkpoints.get("new") == {"text": "hello"}
+    checkpoints.delete("new")
+    assert checkpoints.get("new") is None
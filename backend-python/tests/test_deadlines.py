@@ -0,0 +1,34 @@
+import time
+
+from utils.deadlines import RequestDeadline
+
+# Request & stage deadlines: budgets and the record of uncovered ranges
+
+
+def test_stage_budget_capped_by_request():
+    deadline = RequestDeadline(10, {"transcription": 60, "diarization": 2})
+    assert 9 < deadline.stage_timeout("transcription") <= 10
+    assert 1 < deadline.stage_timeout("diarization") <= 2
+    assert RequestDeadline(0, {}).stage_timeout("transcription") is None
+
+    expired = RequestDeadline(0.01, {})
+    time.sleep(0.02)
+    assert expired.stage_timeout("conversion") == 0.0
+
+
+def test_uncovered_ranges_are_merged_per_stage():
+    deadline = RequestDeadline(0, {})
+    assert not deadline.partial
+
+    deadline.mark_uncovered("transcription", 90, 120)
+    deadline.mark_uncovered("transcription", 60, 90)
+    deadline.mark_uncovered("transcription", 150, 180)
+    deadline.mark_uncovered("diarization", 100, 180)
+    deadline.mark_uncovered("diarization", 180, 180)  # Empty, ignored
+
+    assert deadline.partial
+    assert deadline.uncovered_ranges() == [
+        {"stage": "transcription", "start": 60, "end": 120},
+        {"stage": "diarization", "start": 100, "end": 180},
+        {"stage": "transcription", "start": 150, "end": 180},
+    ]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from tasks import diarize
+
+# Diarization helpers that don't need the pyannote weights: linking window speakers, options
+
+
+def test_window_speakers_are_linked_across_windows():
+    alice, bob = np.eye(4, dtype=np.float32)[:2]
+    # Window 1: alice, bob / window 2: bob, alice (local labels are arbitrary per window)
+    centroids = [alice, bob, bob + 0.01, alice + 0.01]
+
+    assert diarize.link_window_speakers(centroids, threshold=0.7) == [0, 1, 1, 0]
+    assert diarize.link_window_speakers(centroids, threshold=0.7, num_speakers=1) == [0, 0, 0, 0]
+
+
+def test_speaker_without_usable_embedding_keeps_its_own_label():
+    alice, bob = np.eye(4, dtype=np.float32)[:2]
+    nan = np.full(4, np.nan, dtype=np.float32)
+    centroids = [alice, nan, bob, None, alice + 0.01]
+
+    assert diarize.link_window_speakers(centroids, threshold=0.7) == [0, 1, 2, 3, 0]
+    assert diarize.link_window_speakers([nan], threshold=0.7) == [0]
+
+
+class RecordingPipeline:
+    """ Stands in for the pyannote pipeline, records how it was called """
+
+    def __init__(self):
+        self.segmentation_batch_size = 32
+        self.embedding_batch_size = 32
+        self.calls = []
+
+    def __call__(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        return "annotation"
+
+
+@pytest.fixture
+def no_env_defaults(monkeypatch):
+    monkeypatch.setattr(diarize, "DIARIZATION_DEFAULTS", dict.fromkeys(diarize.DIARIZATION_DEFAULTS))
+
+
+def test_options_fall_back_to_defaults(no_env_defaults, monkeypatch):
+    assert diarize.resolve_diarization_options() == dict.fromkeys(diarize.DIARIZATION_DEFAULTS)
+
+    monkeypatch.setitem(diarize.DIARIZATION_DEFAULTS, "max_speakers", 6)
+    assert diarize.resolve_diarization_options()["max_speakers"] == 6
+    assert diarize.resolve_diarization_options(max_speakers=3)["max_speakers"] == 3
+
+
+@pytest.mark.parametrize("overrides", [
+    {"num_speakers": 0},
+    {"max_speakers": -1},
+    {"embedding_batch_size": 0},
+    {"min_speakers": 4, "max_speakers": 2},
+    {"num_speakers": 5, "max_speakers": 3},
+    {"num_speakers": 1, "min_speakers": 2},
+], ids=str)
+def test_invalid_options_are_rejected(no_env_defaults, overrides):
+    with pytest.raises(ValueError):
+        diarize.resolve_diarization_options(**overrides)
+
+
+def test_options_map_to_pipeline_call(no_env_defaults, monkeypatch):
+    pipeline = RecordingPipeline()
+    monkeypatch.setattr(diarize, "pyannote_pipeline_instance", pipeline)
+    monkeypatch.setattr(diarize, "pipeline_default_batch_sizes", {"segmentation_batch_size": 32, "embedding_batch_size": 32})
+
+    options = diarize.resolve_diarization_options(num_speakers=2, min_speakers=1, embedding_batch_size=8)
+    diarize.call_pipeline("audio.wav", options)
+    # Speaker hints are call arguments, batch sizes pipeline attributes
+    assert pipeline.calls == [{"num_speakers": 2, "min_speakers": 1}]
+    assert pipeline.embedding_batch_size == 8 and pipeline.segmentation_batch_size == 32
+
+    # The next request without its own batch size gets the pipeline's default back
+    diarize.call_pipeline("audio.wav", diarize.resolve_diarization_options())
+    assert pipeline.calls[-1] == {}
+    assert pipeline.embedding_batch_size == 32
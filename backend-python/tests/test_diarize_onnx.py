@@ -0,0 +1,71 @@
+import time
+import pytest
+from pathlib import Path
+
+from huggingface_hub import try_to_load_from_cache
+from pyannote.audio import Pipeline
+from pyannote.core import Annotation, Segment
+from pyannote.metrics.diarization import DiarizationErrorRate
+
+from tasks import diarize, diarize_onnx
+
+# Compares the ONNX Runtime diarization path against the PyTorch one on the test fixtures
+# Needs the pyannote weights (HUGGING_FACE_HUB_TOKEN) and onnxruntime
+
+pytest.importorskip("onnxruntime")
+
+# The pyannote weights are gated: without a token they must already be in the local Hugging Face cache
+pytestmark = pytest.mark.skipif(
+    not diarize.HUGGING_FACE_HUB_TOKEN and not isinstance(try_to_load_from_cache(diarize.PYANNOTE_PIPELINE_NAME, "config.yaml"), str),
+    reason="needs HUGGING_FACE_HUB_TOKEN or the pyannote weights in the local cache"
+)
+
+BASE_DIR = Path(__file__).parent
+
+TEST_FILES = [
+    BASE_DIR / "audio" / "test_en.mp3",
+    BASE_DIR / "audio" / "test_fa.mp3",
+]
+
+# Max diarization error rate of the ONNX output, using the PyTorch output as the reference
+MAX_DER = 0.02
+
+
+def load_pipeline():
+    return Pipeline.from_pretrained(
+        diarize.PYANNOTE_PIPELINE_NAME,
+        use_auth_token=diarize.HUGGING_FACE_HUB_TOKEN
+    )
+
+
+@pytest.fixture(scope="module")
+def pipelines():
+    torch_pipeline = load_pipeline()
+    onnx_pipeline = diarize_onnx.apply_onnx_runtime(load_pipeline(), diarize.PYANNOTE_PIPELINE_NAME)
+    return torch_pipeline, onnx_pipeline
+
+
+def to_annotation(diarization) -> Annotation:
+    """ Copies the output into a plain Annotation so both paths are scored the same way """
+    annotation = Annotation()
+    for segment, track, speaker in diarization.itertracks(yield_label=True):
+        annotation[Segment(segment.start, segment.end), track] = speaker
+    return annotation
+
+
+@pytest.mark.parametrize("audio_path", TEST_FILES, ids=lambda path: path.name)
+def test_onnx_matches_pytorch(pipelines, audio_path):
+    torch_pipeline, onnx_pipeline = pipelines
+
+    start = time.perf_counter()
+    reference = to_annotation(torch_pipeline(str(audio_path)))
+    torch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hypothesis = to_annotation(onnx_pipeline(str(audio_path)))
+    onnx_seconds = time.perf_counter() - start
+
+    der = DiarizationErrorRate()(reference, hypothesis)
+    print(f"{audio_path.name}: DER={der:.4f} pytorch={torch_seconds:.2f}s onnx={onnx_seconds:.2f}s")
+
+    assert der <= MAX_DER
@@ -0,0 +1,122 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from tasks import diarize, summarize
+from tasks.fake_backends import (
+    SAMPLE_RATE,
+    LatencyProfile,
+    FakeModelError,
+    FakeASRBackend,
+    FakeDiarizationPipeline,
+    FakeTokenizer,
+    FakeLLM
+)
+
+# Fake backends: deterministic outputs & injected failures, drop-in for the real model objects
+
+
+def tone(pitch_hz: float, seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * pitch_hz * t)).astype(np.float32)
+
+
+def test_fake_asr_is_deterministic():
+    audio = tone(120, 20)
+    first = FakeASRBackend("tiny", profile=LatencyProfile()).transcribe(audio, language="en")
+    second = FakeASRBackend("tiny", profile=LatencyProfile()).transcribe(audio, language="en")
+
+    assert first == second
+    assert first["segments"] and first["segments"][-1]["end"] <= 20
+    # Silence gets no text
+    silence = np.zeros(SAMPLE_RATE * 5, dtype=np.float32)
+    assert FakeASRBackend("tiny", profile=LatencyProfile()).transcribe(silence)["segments"] == []
+
+
+def test_failure_injection_is_reproducible_and_retryable():
+    chunks = [tone(100 + i, 1) for i in range(40)]
+
+    def failed_chunks(backend: FakeASRBackend) -> list[int]:
+        failed = []
+        for i, chunk in enumerate(chunks):
+            try:
+                backend.transcribe(chunk)
+            except FakeModelError:
+                failed.append(i)
+        return failed
+
+    backend = FakeASRBackend("tiny", profile=LatencyProfile(failure_rate=0.5))
+    failed = failed_chunks(backend)
+    assert 0 < len(failed) < len(chunks)
+    assert failed_chunks(FakeASRBackend("tiny", profile=LatencyProfile(failure_rate=0.5))) == failed
+
+    # Every retry is a new attempt, a failed chunk goes through eventually
+    for i in failed:
+        for _ in range(30):
+            try:
+                backend.transcribe(chunks[i])
+                break
+            except FakeModelError:
+                continue
+        else:
+            pytest.fail(f"chunk {i} never succeeded")
+
+
+def test_fake_diarization_labels_speakers_by_pitch(monkeypatch):
+    monkeypatch.setattr(diarize, "pyannote_pipeline_instance", FakeDiarizationPipeline(profile=LatencyProfile()))
+    waveform = np.concatenate([tone(100, 3), np.zeros(SAMPLE_RATE, dtype=np.float32), tone(170, 3)])[None, :]
+
+    annotation, centroids = diarize.call_pipeline(
+        {"waveform": waveform, "sample_rate": SAMPLE_RATE},
+        diarize.resolve_diarization_options(),
+        return_embeddings=True
+    )
+
+    turns = [(segment.start, segment.end, label) for segment, _, label in annotation.itertracks(yield_label=True)]
+    assert turns == [(0.0, 3.0, "SPEAKER_00"), (4.0, 7.0, "SPEAKER_02")]
+    assert len(centroids) == 2
+
+
+def test_fake_llm_runs_the_structured_summary_path(monkeypatch):
+    tokenizer = FakeTokenizer()
+    monkeypatch.setattr(summarize, "llm_tokenizer_instance", tokenizer)
+    monkeypatch.setattr(summarize, "llm_model_instance", FakeLLM(tokenizer, profile=LatencyProfile()))
+    transcript = "Meeting Transcript:\n\n[00:00] S1: Let's start with the numbers from last week.\n"
+
+    summary = asyncio.run(summarize.summarize_transcript_text(transcript))
+    assert "error" not in summary
+    assert summary["main_topic"] and summary["key_points"] and summary["tasks_to_complete"]
+    assert asyncio.run(summarize.summarize_transcript_text(transcript)) == summary
+
+    monkeypatch.setattr(summarize, "llm_model_instance", FakeLLM(tokenizer, profile=LatencyProfile(failure_rate=1.0)))
+    assert "error" in asyncio.run(summarize.summarize_transcript_text(transcript))
+
+
+def test_failed_rolling_update_can_be_retried(monkeypatch):
+    tokenizer = FakeTokenizer()
+    monkeypatch.setattr(summarize, "llm_tokenizer_instance", tokenizer)
+    monkeypatch.setattr(summarize, "llm_model_instance", FakeLLM(tokenizer, profile=LatencyProfile(failure_rate=1.0)))
+    monkeypatch.setattr(summarize, "LLM_TRANSCRIPT_COMPACTION", True)
+    segments = [{"speaker": "SPEAKER_00", "start": 0.0, "end": 4.0, "text": "Let's start with the numbers."}]
+
+    assert "error" in asyncio.run(summarize.run_incremental("retry-meeting", segments, reset=True))
+    state = summarize.get_rolling_summary_state("retry-meeting")
+    assert state.segment_count == 0 and state.pending_text == ""
+    # Aliases & timestamp position didn't move either
+    assert state.compactor.speaker_aliases == {} and state.compactor.last_timestamp is None
+
+    monkeypatch.setattr(summarize, "llm_model_instance", FakeLLM(tokenizer, profile=LatencyProfile()))
+    assert "error" not in asyncio.run(summarize.run_incremental("retry-meeting", segments))
+    assert state.segment_count == 1 and state.pending_text.count("numbers") == 1
+    assert state.pending_text.startswith("[00:00] S1: ")
+    assert state.compactor.speaker_aliases == {"SPEAKER_00": "S1"}
+
+
+def test_fake_tokenizer_round_trips_without_a_vocabulary():
+    tokenizer = FakeTokenizer()
+    text = "Budget review moved to Thursday, ça marche ✓"
+
+    assert tokenizer.decode(tokenizer.encode(text)) == text
+    assert tokenizer.encode(text) == FakeTokenizer().encode(text)
+    assert not vars(tokenizer) # Nothing kept per piece
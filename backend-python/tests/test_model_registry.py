@@ -0,0 +1,62 @@
+import pytest
+
+from tasks.model_registry import ModelRegistry, ModelUnavailableError
+from utils import metrics
+
+# Model registry: on demand loading, LRU unloading under the RAM budget, pinned models stay loaded
+
+
+def make_registry(budget_mb: float, unloaded: list) -> ModelRegistry:
+    registry = ModelRegistry(budget_mb)
+    for key in ("whisper:tiny", "whisper:medium", "llm"):
+        registry.register(key, lambda key=key: f"model {key}", unloader=lambda model: unloaded.append(model), size_estimate_mb=400)
+    return registry
+
+
+def test_loads_on_demand():
+    registry = make_registry(0, [])
+    assert registry.get_loaded("llm") is None
+    assert registry.load("llm") == "model llm"
+    assert registry.get_loaded("llm") == "model llm"
+
+
+def test_unloads_least_recently_used():
+    unloaded = []
+    registry = make_registry(1000, unloaded)
+    evictions_before = sum(series["value"] for series in metrics.snapshot()["counters"].get("model_evictions_total", []))
+
+    registry.load("whisper:tiny")
+    registry.load("whisper:medium")
+    registry.load("whisper:tiny")  # tiny is now the most recently used
+    registry.load("llm")
+
+    assert unloaded == ["model whisper:medium"]
+    assert registry.get_loaded("whisper:tiny") is not None
+    assert registry.get_loaded("whisper:medium") is None
+    evictions_after = sum(series["value"] for series in metrics.snapshot()["counters"]["model_evictions_total"])
+    assert evictions_after == evictions_before + 1
+
+
+def test_models_in_use_are_not_unloaded():
+    unloaded = []
+    registry = make_registry(500, unloaded)
+
+    registry.acquire("whisper:tiny")
+    registry.load("llm")  # Over budget, but the only other model is pinned
+    assert unloaded == []
+
+    registry.release("whisper:tiny")
+    registry.load("whisper:medium")
+    assert "model whisper:tiny" in unloaded
+
+
+def test_failed_load():
+    registry = ModelRegistry(0)
+
+    def broken_loader():
+        raise OSError("weights not found")
+
+    registry.register("broken", broken_loader)
+    with pytest.raises(ModelUnavailableError):
+        registry.acquire("broken")
+    assert registry.describe() == [{"model": "broken", "loaded": False, "memory_mb": 0.0, "in_use": 0}]
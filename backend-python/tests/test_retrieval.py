@@ -0,0 +1,47 @@
+from tasks.retrieval import TranscriptIndex, build_turns
+
+# BM25 retrieval over speaker turns (no embedding model needed)
+
+SEGMENTS = [
+    {"speaker": "SPEAKER_00", "start": 0.0, "end": 3.0, "text": "We need to ship the release on Friday."},
+    {"speaker": "SPEAKER_00", "start": 3.5, "end": 6.0, "text": "The budget is tight this quarter."},
+    {"speaker": "SPEAKER_01", "start": 7.0, "end": 10.0, "text": "I will review the mobile app tomorrow."},
+    {"speaker": "Error", "start": 10.0, "end": 40.0, "text": "[[Processing Error]]", "error": "failed"},
+    {"speaker": "SPEAKER_02", "start": 41.0, "end": 43.0, "text": "Should we order lunch?"},
+]
+
+
+def test_build_turns_merges_speakers_and_skips_errors():
+    turns = build_turns(SEGMENTS)
+
+    assert [turn["speaker"] for turn in turns] == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+    assert turns[0]["start"] == 0.0 and turns[0]["end"] == 6.0
+    assert turns[0]["text"] == "We need to ship the release on Friday. The budget is tight this quarter."
+
+
+def test_build_turns_splits_long_turns():
+    turns = build_turns(SEGMENTS[:2], max_chars=50)
+    assert len(turns) == 2
+
+
+def test_search_returns_matching_turns_in_order():
+    index = TranscriptIndex(build_turns(SEGMENTS))
+
+    results = index.search("who will review the mobile app", top_k=1)
+    assert [result["speaker"] for result in results] == ["SPEAKER_01"]
+
+    results = index.search("lunch and the release", top_k=5)
+    assert [result["speaker"] for result in results] == ["SPEAKER_00", "SPEAKER_02"]
+
+    assert index.search("kubernetes", top_k=3) == []
+
+
+def test_build_turns_splits_a_long_segment():
+    monologue = " ".join(f"word{i}" for i in range(100))
+    turns = build_turns([{"speaker": "SPEAKER_00", "start": 0.0, "end": 60.0, "text": monologue}], max_chars=100)
+
+    assert len(turns) > 1
+    assert all(len(turn["text"]) <= 100 for turn in turns)
+    assert " ".join(turn["text"] for turn in turns) == monologue
+    assert turns[0]["start"] == 0.0 and turns[-1]["end"] == 60.0
+    assert all(earlier["end"] == later["start"] for earlier, later in zip(turns, turns[1:]))
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from utils import scheduler
+
+# Fair scheduler: short jobs of other users run between the chunks of a long one, paid before free
+
+
+def test_short_jobs_overtake_long_job():
+    order = []
+
+    def work(name: str):
+        time.sleep(0.005)
+        order.append(name)
+
+    async def job(user: str, tier: str, chunks: int, delay: float):
+        await asyncio.sleep(delay)
+        scheduler.set_request_context(user, tier)
+        await asyncio.gather(*[fair.run(work, f"{user}:{i}") for i in range(chunks)])
+
+    async def main():
+        await asyncio.gather(
+            job("long", "free", 30, 0.0),
+            job("short-free", "free", 2, 0.02),
+            job("short-paid", "paid", 2, 0.02)
+        )
+
+    fair = scheduler.FairScheduler("test", workers=1)
+    asyncio.run(main())
+
+    assert len(order) == 34
+    # Both short jobs finish long before the long job's last chunk, the paid one first
+    last_paid = max(i for i, name in enumerate(order) if name.startswith("short-paid"))
+    last_free = max(i for i, name in enumerate(order) if name.startswith("short-free"))
+    assert last_paid < last_free < 15
+
+
+def test_cancelled_items_are_skipped():
+    ran = []
+
+    async def main():
+        fair = scheduler.FairScheduler("test", workers=1)
+        blocking = asyncio.ensure_future(fair.run(time.sleep, 0.05))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(fair.run(ran.append, "queued"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await blocking
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert ran == []
+
+
+def test_cancelled_running_item_finishes_first():
+    finished = []
+
+    def slow():
+        time.sleep(0.05)
+        finished.append(True)
+
+    async def main():
+        fair = scheduler.FairScheduler("test", workers=1)
+        running = asyncio.ensure_future(fair.run(slow))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        await asyncio.wait([running])
+        return running.cancelled()
+
+    assert asyncio.run(main())
+    assert finished == [True]
@@ -0,0 +1,35 @@
+import numpy as np
+
+from utils.segments import SegmentColumns
+
+# Columnar segment storage
+
+SEGMENTS = [
+    {"speaker": "SPEAKER_01", "start": 5.0, "end": 9.0, "text": "Second"},
+    {"speaker": "Error", "start": 30.0, "end": 60.0, "text": "[[Processing Error]]", "error": "failed"},
+    {"speaker": "SPEAKER_00", "start": 0.0, "end": 4.0, "text": "First"},
+]
+
+
+def test_round_trip():
+    columns = SegmentColumns.from_dicts(SEGMENTS)
+
+    assert len(columns) == 3
+    assert columns.to_dicts() == SEGMENTS
+    assert columns.start.dtype == np.float64
+    assert columns.speaker_ids.dtype == np.int32
+
+
+def test_sorted_by_start():
+    columns = SegmentColumns.from_dicts(SEGMENTS).sorted_by_start()
+
+    assert [segment["text"] for segment in columns] == ["First", "Second", "[[Processing Error]]"]
+    assert columns.to_columns()["errors"] == {"2": "failed"}
+
+
+def test_fingerprint_ignores_speaker_id_order():
+    columns = SegmentColumns.from_dicts(SEGMENTS)
+    reordered = SegmentColumns.from_dicts(SEGMENTS[::-1]).take(np.array([2, 1, 0]))
+
+    assert columns.fingerprint() == reordered.fingerprint()
+    assert columns.fingerprint() != SegmentColumns.from_dicts(SEGMENTS[:2]).fingerprint()
@@ -0,0 +1,64 @@
+from tasks.summarize import find_structured_output_end, parse_llm_output, get_rolling_summary_state, rolling_summary_taken
+
+# Parsing & early stopping of the structured LLM output ([MAIN TOPIC] ... [TASKS TO COMPLETE])
+
+COMPLETE_OUTPUT = """[MAIN TOPIC]
+Release planning
+
+[SUMMARY]
+The team reviewed the release plan.
+
+[KEY POINTS]
+- Backend is ready
+* Mobile app needs review
+
+[TASKS TO COMPLETE]
+- Sam: finish the review by Friday
+2. Alex: publish the release notes
+"""
+
+
+def test_parse_all_sections():
+    parsed = parse_llm_output(COMPLETE_OUTPUT)
+
+    assert parsed["main_topic"] == "Release planning"
+    assert parsed["summary"] == "The team reviewed the release plan."
+    assert parsed["key_points"] == ["Backend is ready", "Mobile app needs review"]
+    assert parsed["tasks_to_complete"] == ["Sam: finish the review by Friday", "Alex: publish the release notes"]
+
+
+def test_parse_ignores_text_after_the_output():
+    rambling = COMPLETE_OUTPUT + "[END]\nLet me know if you need anything else.\n[SUMMARY]\nRepeated"
+    assert parse_llm_output(rambling) == parse_llm_output(COMPLETE_OUTPUT)
+
+    unterminated = COMPLETE_OUTPUT + "\nLet me know if you need anything else."
+    assert parse_llm_output(unterminated) == parse_llm_output(COMPLETE_OUTPUT)
+
+
+def test_parse_missing_sections():
+    parsed = parse_llm_output("[SUMMARY]\nShort call.\n\n[TASKS TO COMPLETE]\n- None")
+
+    assert parsed["main_topic"] == ""
+    assert parsed["summary"] == "Short call."
+    assert parsed["key_points"] == []
+    assert parsed["tasks_to_complete"] == ["None"]
+
+
+def test_output_end():
+    # Still open: the tasks list may continue
+    assert find_structured_output_end(COMPLETE_OUTPUT) is None
+    assert find_structured_output_end(COMPLETE_OUTPUT + "- Another task") is None
+    # Not all sections yet, [END] doesn't close anything
+    assert find_structured_output_end("[MAIN TOPIC]\nx\n[END]") is None
+
+    assert find_structured_output_end(COMPLETE_OUTPUT + "[END]") == len(COMPLETE_OUTPUT)
+    assert find_structured_output_end(COMPLETE_OUTPUT + "[MAIN TOPIC]") == len(COMPLETE_OUTPUT)
+    assert find_structured_output_end(COMPLETE_OUTPUT + "\nI hope this helps") is not None
+
+
+def test_rolling_summary_states_are_per_owner():
+    state = get_rolling_summary_state("owned-meeting", owner="alice", reset=True)
+
+    assert get_rolling_summary_state("owned-meeting", owner="alice") is state
+    assert rolling_summary_taken("owned-meeting", owner="bob")
+    assert not rolling_summary_taken("owned-meeting", owner="alice")
@@ -0,0 +1,59 @@
+from tasks.summarize import TranscriptCompactor
+
+# Compact transcript formatting for the LLM: merged turns, sparse timestamps, speaker aliases
+
+
+def segment(speaker: str, start: float, end: float, text: str) -> dict:
+    return {"speaker": speaker, "start": start, "end": end, "text": text}
+
+
+def test_consecutive_segments_of_a_speaker_are_merged():
+    compactor = TranscriptCompactor(timestamp_interval=60, turn_gap=5)
+    lines = compactor.format_lines([
+        segment("SPEAKER_00", 0, 4, "Hello everyone."),
+        segment("SPEAKER_00", 5, 8, "Let's start."),
+        segment("SPEAKER_01", 9, 12, "Sounds good."),
+        # Same speaker after a long pause starts a new turn
+        segment("SPEAKER_01", 30, 33, "One more thing."),
+    ])
+
+    assert lines == [
+        "[00:00] S1: Hello everyone. Let's start.",
+        "S2: Sounds good.",
+        "S2: One more thing.",
+    ]
+
+
+def test_timestamps_every_interval_and_across_calls():
+    compactor = TranscriptCompactor(timestamp_interval=60, turn_gap=0)
+    first = compactor.format_lines([
+        segment("SPEAKER_00", 0, 10, "First."),
+        segment("SPEAKER_01", 30, 40, "Second."),
+        segment("SPEAKER_00", 65, 70, "Third."),
+    ])
+    assert first == ["[00:00] S1: First.", "S2: Second.", "[01:05] S1: Third."]
+
+    # Aliases & timestamp position carry over (rolling summaries)
+    second = compactor.format_lines([
+        segment("SPEAKER_01", 100, 110, "Fourth."),
+        segment("SPEAKER_02", 3700, 3710, "Fifth."),
+    ])
+    assert second == ["S2: Fourth.", "[1:01:40] S3: Fifth."]
+
+
+def test_aliases_are_expanded_in_the_summary():
+    compactor = TranscriptCompactor()
+    compactor.format_lines([segment("Alice", 0, 1, "Hi."), segment("Bob", 2, 3, "Hello.")])
+
+    summary = compactor.expand_aliases({
+        "main_topic": "S1 and S2 planning",
+        "key_points": ["S2 owns the release", "Budget (S12 is not an alias)"],
+        "tasks_to_complete": ["S1: send the notes"],
+        "raw_llm_output": "S1",
+    })
+
+    assert summary["main_topic"] == "Alice and Bob planning"
+    assert summary["key_points"] == ["Bob owns the release", "Budget (S12 is not an alias)"]
+    assert summary["tasks_to_complete"] == ["Alice: send the notes"]
+    # Only the summary sections are rewritten
+    assert summary["raw_llm_output"] == "S1"
@@ -0,0 +1,55 @@
+from utils.segments import SegmentColumnsBuilder
+from utils.transcript_store import TranscriptStore
+
+# SQLite transcript store: access control, time range / speaker queries, pagination
+
+
+def make_store(tmp_path) -> TranscriptStore:
+    return TranscriptStore(str(tmp_path / "transcripts.sqlite3"), max_transcripts=10, ttl_seconds=3600)
+
+
+def make_segments(count: int):
+    builder = SegmentColumnsBuilder()
+    for i in range(count):
+        builder.append(f"SPEAKER_0{i % 2}", i * 10.0, i * 10.0 + 8.0, f"segment {i}")
+    return builder.build()
+
+
+def test_save_and_access(tmp_path):
+    store = make_store(tmp_path)
+    transcript_id = store.save(make_segments(5), owner="alice", language="en")
+
+    transcript = store.get(transcript_id, owner="alice")
+    assert transcript["segment_count"] == 5
+    assert transcript["language"] == "en"
+    assert store.get(transcript_id, owner="bob") is None
+    assert store.get("unknown", owner="alice") is None
+
+    assert store.load_segments(transcript_id).to_dicts() == make_segments(5).to_dicts()
+
+
+def test_time_range_and_speaker(tmp_path):
+    store = make_store(tmp_path)
+    transcript = store.get(store.save(make_segments(100), owner="alice"), owner="alice")
+
+    # [95, 125) overlaps segments 9 (90-98), 10, 11 and 12 (120-128)
+    segments, next_cursor = store.query_segments(transcript, time_from=95, time_to=125)
+    assert [segment["text"] for segment in segments] == ["segment 9", "segment 10", "segment 11", "segment 12"]
+    assert next_cursor is None
+
+    segments, _ = store.query_segments(transcript, time_from=95, time_to=125, speaker="SPEAKER_01")
+    assert [segment["text"] for segment in segments] == ["segment 9", "segment 11"]
+
+
+def test_pagination(tmp_path):
+    store = make_store(tmp_path)
+    transcript = store.get(store.save(make_segments(25), owner="alice"), owner="alice")
+
+    texts, cursor = [], None
+    while True:
+        page, cursor = store.query_segments(transcript, limit=10, cursor=cursor)
+        texts += [segment["text"] for segment in page]
+        if cursor is None:
+            break
+
+    assert texts == [f"segment {i}" for i in range(25)]
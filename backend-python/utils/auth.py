@@ -2,6 +2,13 @@ import os
 
 TEST_TOKEN = "BEARER test_123"
 
+# Subscription tiers
+FREE_TIER = "free"
+PAID_TIER = "paid"
+
+# Tier the test token is treated as
+TEST_TOKEN_TIER = os.getenv("TEST_TOKEN_TIER", PAID_TIER)
+
 async def verify_token(auth_header: str | None) -> bool:
     """ 
     Verifies the auth token from the header
@@ -22,3 +29,29 @@ async def verify_token(auth_header: str | None) -> bool:
     
     print("WARNING: Invalid auth token")
     return False
+
+
+async def get_user_tier(auth_header: str | None) -> str:
+    """ 
+    Returns the subscription tier for an (already verified) auth header
+    Unknown users fall back to the free tier
+    """
+    
+    if auth_header == TEST_TOKEN:
+        return TEST_TOKEN_TIER
+    
+    # Real tier lookup not implemented yet
+    return FREE_TIER
+
+
+async def get_user_id(auth_header: str | None) -> str | None:
+    """ 
+    Returns the id of the user behind an (already verified) auth header
+    Used to scope server side data (stored transcripts) to its owner
+    """
+    
+    if auth_header == TEST_TOKEN:
+        return "test-user"
+    
+    # Real user lookup not implemented yet
+    return None
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Canonical hash of any JSON-serializable parts (dict key order and whitespace don't matter)
+    """
+
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TwoTierCache:
+    """
+    A small two tier cache for JSON-serializable values:
+        Memory: LRU bounded by entry count
+        Disk: one JSON file per key (optional), survives restarts, promoted to memory on hit
+    With a TTL, entries older than it are misses in both tiers and expired files are swept from the disk
+    (on start, then at most every PRUNE_INTERVAL_SECONDS, in a background thread).
+    """
+
+    PRUNE_INTERVAL_SECONDS = 3600
+
+    def __init__(self, name: str, max_entries: int, cache_dir: str | None = None, ttl_seconds: float = 0):
+        """
+        Args:
+            name (str): Name used in logs.
+            max_entries (int): Max entries held in memory (0 disables the memory tier).
+            cache_dir (str | None): Directory for the disk tier, None or "" disables it.
+            ttl_seconds (float): Age after which an entry expires, 0 keeps entries until evicted (memory) or forever (disk).
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict() # key -> (stored at, value)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._schedule_prune()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        # Two char fan out keeps directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, value: Any, stored_at: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Any | None:
+        """
+        Returns the cached value or None on a miss
+        """
+
+        with self._lock:
+            if key in self._memory:
+                stored_at, value = self._memory[key]
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                stored_at = os.path.getmtime(path)
+                if self._expired(stored_at):
+                    os.remove(path)
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                    self._remember(key, value, stored_at)
+                    self.hits += 1
+                    return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: {self.name} cache entry {key} unreadable: {e}")
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        """
+        Stores a value in memory and (if enabled) on disk
+        """
+
+        self._remember(key, value, time.time())
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so readers never see a partial file
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(value, f, ensure_ascii=False)
+                os.replace(temp_path, path)
+            except Exception as e:
+                print(f"Warning: Failed to write {self.name} cache entry {key}: {e}")
+            self._schedule_prune()
+
+    def delete(self, key: str):
+        """
+        Removes an entry from both tiers (no-op if it isn't cached)
+        """
+
+        with self._lock:
+            self._memory.pop(key, None)
+
+        if self.cache_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: Failed to delete {self.name} cache entry {key}: {e}")
+
+    def _schedule_prune(self):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            now = time.time()
+            if now - self._last_prune < min(self.ttl_seconds, self.PRUNE_INTERVAL_SECONDS):
+                return
+            self._last_prune = now
+        threading.Thread(target=self.prune, name=f"{self.name} cache prune", daemon=True).start()
+
+    def prune(self) -> int:
+        """
+        Deletes the expired files of the disk tier
+
+        Returns:
+            int: Number of entries removed.
+        """
+
+        if not self.cache_dir or self.ttl_seconds <= 0:
+            return 0
+
+        removed = 0
+        for directory, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                try:
+                    # Leftover .tmp files of interrupted writes go too
+                    if self._expired(os.path.getmtime(path)):
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"Warning: Failed to prune {self.name} cache file {path}: {e}")
+
+        if removed:
+            print(f"Pruned {removed} expired {self.name} cache entries")
+        return removed
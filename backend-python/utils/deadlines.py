@@ -0,0 +1,90 @@
+import os
+import time
+
+# --- Request & stage deadlines
+# Every pipeline request gets a time budget, and each stage (conversion, transcription, diarization,
+# summarization) its own budget starting when the stage starts, capped by what is left of the request's.
+# A stage that runs out stops scheduling work and keeps what is done: chunks not transcribed in time
+# become error markers (like failed chunks) and their time ranges are reported as uncovered,
+# the response is flagged partial.
+#
+# 0 disables a limit. Every limit is off by default: a long recording runs to completion unless
+# the deployment opts in (e.g. REQUEST_DEADLINE_SECONDS=3600, TRANSCRIPTION_DEADLINE_SECONDS=2700)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "0"))
+STAGE_DEADLINE_SECONDS = {
+    "conversion": float(os.getenv("CONVERSION_DEADLINE_SECONDS", "0")),
+    "transcription": float(os.getenv("TRANSCRIPTION_DEADLINE_SECONDS", "0")),
+    "diarization": float(os.getenv("DIARIZATION_DEADLINE_SECONDS", "0")),
+    "summarization": float(os.getenv("SUMMARIZATION_DEADLINE_SECONDS", "0")),
+}
+
+DEADLINE_ERROR = "Deadline exceeded"
+
+
+class DeadlineExceeded(Exception):
+    """ A stage ran out of time before producing anything usable """
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage.capitalize()} did not finish within its time budget")
+        self.stage = stage
+
+
+class RequestDeadline:
+    """
+    Time budget of one request, and the record of what was cut short
+    """
+
+    def __init__(self, total_seconds: float = REQUEST_DEADLINE_SECONDS, stage_seconds: dict[str, float] | None = None):
+        """
+        Args:
+            total_seconds (float): Budget of the whole request (0 = unlimited).
+            stage_seconds (dict[str, float] | None): Budget per stage (0 = only the request budget applies),
+                                                     defaults to STAGE_DEADLINE_SECONDS.
+        """
+        self.started = time.monotonic()
+        self.expires_at = self.started + total_seconds if total_seconds > 0 else None
+        self.stage_seconds = STAGE_DEADLINE_SECONDS if stage_seconds is None else stage_seconds
+        self.uncovered = [] # {"stage", "start", "end"} in seconds of audio
+
+    def stage_expires_at(self, stage: str) -> float | None:
+        """
+        time.monotonic() value at which a stage starting now must stop, None when unlimited
+        """
+        limits = []
+        if self.expires_at is not None:
+            limits.append(self.expires_at)
+        if self.stage_seconds.get(stage, 0) > 0:
+            limits.append(time.monotonic() + self.stage_seconds[stage])
+        return min(limits) if limits else None
+
+    def stage_timeout(self, stage: str) -> float | None:
+        """
+        Seconds a stage starting now may run (asyncio timeout), None when unlimited
+        """
+        expires_at = self.stage_expires_at(stage)
+        return None if expires_at is None else max(expires_at - time.monotonic(), 0.0)
+
+    def mark_uncovered(self, stage: str, start: float, end: float):
+        """
+        Records a time range of the audio a stage didn't get to
+        """
+        if end > start:
+            self.uncovered.append({"stage": stage, "start": round(start, 3), "end": round(end, 3)})
+            print(f"Deadline: {stage} skipped {start:.0f}s - {end:.0f}s")
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.uncovered)
+
+    def uncovered_ranges(self) -> list[dict]:
+        """
+        Uncovered ranges per stage, adjacent / overlapping ranges of a stage merged, in time order
+        """
+        merged = []
+        for uncovered in sorted(self.uncovered, key=lambda item: (item["stage"], item["start"])):
+            previous = merged[-1] if merged else None
+            if previous is not None and previous["stage"] == uncovered["stage"] and uncovered["start"] <= previous["end"]:
+                previous["end"] = max(previous["end"], uncovered["end"])
+            else:
+                merged.append(dict(uncovered))
+        return sorted(merged, key=lambda item: (item["start"], item["stage"]))
@@ -0,0 +1,82 @@
+import threading
+
+# --- In process metrics
+# Counters & gauges with labels, rendered in the Prometheus text format by GET /metrics.
+# Counters only go up (events: model loads, evictions, ...), gauges hold the current value (memory in use, ...)
+
+_counters = {}
+_gauges = {}
+_descriptions = {}
+_lock = threading.Lock()
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+
+def describe(name: str, metric_type: str, help_text: str):
+    """
+    Registers the type ("counter" or "gauge") and help text shown for a metric
+    """
+    _descriptions[name] = (metric_type, help_text)
+
+
+def increment(name: str, value: float = 1.0, **labels):
+    """
+    Adds to a counter
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """
+    Sets a gauge to its current value
+    """
+    with _lock:
+        _gauges[_key(name, labels)] = float(value)
+
+
+def snapshot() -> dict:
+    """
+    All current values: {"counters": {name: [{"labels": {...}, "value": v}]}, "gauges": {...}}
+    """
+    result = {"counters": {}, "gauges": {}}
+    with _lock:
+        for kind, values in (("counters", _counters), ("gauges", _gauges)):
+            for (name, labels), value in values.items():
+                result[kind].setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return result
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    formatted = []
+    for label, value in labels:
+        escaped_value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        formatted.append(f'{label}="{escaped_value}"')
+    return "{" + ",".join(formatted) + "}"
+
+
+def render_prometheus() -> str:
+    """
+    Prometheus text exposition format
+    """
+    lines = []
+    with _lock:
+        series = {}
+        for (name, labels), value in list(_counters.items()) + list(_gauges.items()):
+            series.setdefault(name, []).append((labels, value))
+        counter_names = {name for name, _ in _counters}
+
+    for name in sorted(series):
+        metric_type, help_text = _descriptions.get(name, ("counter" if name in counter_names else "gauge", ""))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(series[name]):
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
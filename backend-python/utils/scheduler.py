@@ -0,0 +1,202 @@
+import os
+import heapq
+import time
+import asyncio
+import functools
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from utils import metrics
+
+# --- Inference scheduler
+# Whisper chunks, diarization and LLM generate calls don't go straight to the default thread pool:
+# each resource has its own small pool, and work waiting for a worker is queued per user and
+# served by weighted fair queuing (start-time fair queuing) with a weight per subscription tier.
+#
+# Every queued item is one unit of work (a 30s Whisper chunk, one LLM call, ...), so a long job
+# only holds a worker for one item at a time: between its chunks, items of other users with an
+# earlier virtual finish time go first. A free user's 4 hour upload no longer delays everyone else,
+# and paid requests get TIER_WEIGHTS["paid"] times the share of a free one when both are queued.
+#
+# The user & tier of the request are read from a context variable (set_request_context), so the
+# pipeline code doesn't thread them through every call.
+
+TIER_WEIGHTS = {
+    "free": float(os.getenv("SCHEDULER_WEIGHT_FREE", "1")),
+    "paid": float(os.getenv("SCHEDULER_WEIGHT_PAID", "4")),
+}
+DEFAULT_TIER = "free"
+
+# Workers per resource: concurrent items actually running (each one already uses several torch threads)
+RESOURCE_WORKERS = {
+    "whisper": int(os.getenv("SCHEDULER_WHISPER_WORKERS", "2")),
+    "diarization": int(os.getenv("SCHEDULER_DIARIZATION_WORKERS", "1")),
+    "llm": int(os.getenv("SCHEDULER_LLM_WORKERS", "1")),
+}
+
+metrics.describe("scheduler_items_total", "counter", "Work items run by the inference scheduler")
+metrics.describe("scheduler_wait_seconds_total", "counter", "Time work items spent queued for a worker")
+metrics.describe("scheduler_run_seconds_total", "counter", "Time work items spent running")
+metrics.describe("scheduler_queued_items", "gauge", "Work items waiting for a worker")
+metrics.describe("scheduler_cancelled_items_total", "counter", "Queued work items dropped because their request was cancelled")
+metrics.describe("cancelled_compute_seconds_saved_total", "counter", "Estimated inference seconds not spent on cancelled requests")
+
+# (user id, tier) of the request being served
+_request_context = contextvars.ContextVar("scheduler_request_context", default=(None, DEFAULT_TIER))
+
+
+def set_request_context(user_id: str | None, tier: str | None):
+    """
+    Tags the work of the current request (and the tasks it starts) with its user & tier.
+    Call at the start of a route handler.
+    """
+    _request_context.set((user_id, tier or DEFAULT_TIER))
+
+
+def get_request_context() -> tuple[str | None, str]:
+    return _request_context.get()
+
+
+class WorkItem:
+    """ One queued call """
+
+    __slots__ = ("fn", "future", "tier", "cost", "start_tag", "finish_tag", "queued_at", "run_seconds", "context", "run_future")
+
+    def __init__(self, fn: Callable[[], Any], future: asyncio.Future, tier: str, cost: float, start_tag: float, finish_tag: float):
+        self.fn = fn
+        self.future = future
+        self.tier = tier
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.queued_at = time.perf_counter()
+        self.run_seconds = 0.0
+        self.context = contextvars.copy_context()
+        self.run_future = None # Set once a worker picked the item up
+
+
+class FairScheduler:
+    """
+    Weighted fair queuing in front of one resource's thread pool.
+    All state is touched from the event loop thread only (submissions and completion callbacks).
+    """
+
+    def __init__(self, resource: str, workers: int, tier_weights: dict[str, float] = TIER_WEIGHTS):
+        self.resource = resource
+        self.workers = max(1, workers)
+        self.tier_weights = tier_weights
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"sched-{resource}")
+
+        self._queue = []                # heap of (finish tag, sequence, WorkItem)
+        self._sequence = itertools.count()
+        self._flow_finish_tags = {}     # (tier, user) -> finish tag of the flow's last queued item
+        self._virtual_time = 0.0
+        self._running = 0
+        self._seconds_per_cost = None   # Moving average of run time per cost unit (estimates saved compute)
+
+    async def run(self, fn: Callable, *args, cost: float = 1.0, **kwargs) -> Any:
+        """
+        Queues fn(*args, **kwargs) for this resource and waits for its result.
+
+        Args:
+            fn (Callable): Blocking call.
+            cost (float): Relative size of the item (1 = a 30s Whisper chunk), larger items
+                          advance their flow's virtual time further.
+
+        Cancelling the awaiting task before the item started drops it from the queue.
+        An item already running can't be interrupted: the cancellation only goes through once it finished,
+        so the caller doesn't release (and the registry doesn't unload) a model that is still in use.
+        """
+        loop = asyncio.get_running_loop()
+        user_id, tier = get_request_context()
+        weight = self.tier_weights.get(tier, self.tier_weights[DEFAULT_TIER])
+
+        # Start-time fair queuing: a flow that was idle restarts at the current virtual time,
+        # so it can't bank credit while away, then every item advances it by cost / weight
+        flow = (tier, user_id)
+        start_tag = max(self._virtual_time, self._flow_finish_tags.get(flow, 0.0))
+        finish_tag = start_tag + cost / weight
+        self._flow_finish_tags[flow] = finish_tag
+
+        item = WorkItem(functools.partial(fn, *args, **kwargs), loop.create_future(), tier, cost, start_tag, finish_tag)
+        heapq.heappush(self._queue, (finish_tag, next(self._sequence), item))
+        self._dispatch()
+
+        try:
+            return await item.future
+        except asyncio.CancelledError:
+            if item.run_future is not None and not item.run_future.done():
+                await asyncio.wait([item.run_future])
+            raise
+
+    def _dispatch(self):
+        while self._running < self.workers and self._queue:
+            _, _, item = heapq.heappop(self._queue)
+            if item.future.done():
+                # Cancelled while queued (client gone), the work never runs
+                metrics.increment("scheduler_cancelled_items_total", resource=self.resource, tier=item.tier)
+                if self._seconds_per_cost is not None:
+                    metrics.increment("cancelled_compute_seconds_saved_total", item.cost * self._seconds_per_cost, resource=self.resource)
+                continue
+
+            self._virtual_time = max(self._virtual_time, item.start_tag)
+            self._running += 1
+            wait_seconds = time.perf_counter() - item.queued_at
+            metrics.increment("scheduler_wait_seconds_total", wait_seconds, resource=self.resource, tier=item.tier)
+            metrics.increment("scheduler_items_total", resource=self.resource, tier=item.tier)
+
+            item.run_future = asyncio.get_running_loop().run_in_executor(self.executor, self._timed_call, item)
+            item.run_future.add_done_callback(functools.partial(self._on_done, item))
+
+        if not self._queue:
+            # Nothing waiting: the flows' tags are behind the virtual time anyway, drop them
+            self._flow_finish_tags = {
+                flow: tag for flow, tag in self._flow_finish_tags.items() if tag > self._virtual_time
+            }
+        metrics.set_gauge("scheduler_queued_items", len(self._queue), resource=self.resource)
+
+    def _timed_call(self, item: WorkItem) -> Any:
+        run_start = time.perf_counter()
+        try:
+            # Runs in the request's context (contextvars aren't carried into executor threads)
+            return item.context.run(item.fn)
+        finally:
+            item.run_seconds = time.perf_counter() - run_start
+            metrics.increment("scheduler_run_seconds_total", item.run_seconds, resource=self.resource, tier=item.tier)
+
+    def _on_done(self, item: WorkItem, run_future: asyncio.Future):
+        self._running -= 1
+        if item.cost > 0:
+            seconds_per_cost = item.run_seconds / item.cost
+            self._seconds_per_cost = seconds_per_cost if self._seconds_per_cost is None \
+                else 0.9 * self._seconds_per_cost + 0.1 * seconds_per_cost
+        if item.future.done():
+            # Cancelled while running, nobody reads the outcome (retrieve it so a failure isn't reported as unhandled)
+            if not run_future.cancelled():
+                run_future.exception()
+        else:
+            if run_future.cancelled():
+                item.future.cancel()
+            elif run_future.exception() is not None:
+                item.future.set_exception(run_future.exception())
+            else:
+                item.future.set_result(run_future.result())
+        self._dispatch()
+
+    def queued(self) -> int:
+        return len(self._queue)
+
+
+schedulers = {
+    resource: FairScheduler(resource, workers)
+    for resource, workers in RESOURCE_WORKERS.items()
+}
+
+
+async def run(resource: str, fn: Callable, *args, cost: float = 1.0, **kwargs) -> Any:
+    """
+    Runs a blocking inference call on `resource` ("whisper", "diarization", "llm") through its fair scheduler
+    """
+    return await schedulers[resource].run(fn, *args, cost=cost, **kwargs)
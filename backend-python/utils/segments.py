@@ -0,0 +1,165 @@
+import hashlib
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+# --- Columnar segment storage
+# Multi hour transcripts have tens of thousands of segments. As a list of dicts every segment
+# carries its own dict, key strings and boxed floats; as columns it is three NumPy arrays,
+# a list of speaker labels and the text strings.
+
+
+class SegmentColumns:
+    """
+    Merged transcription/diarization segments stored by column:
+        start, end (float64 seconds), speaker_ids (int32, index into speakers), texts, errors (None = ok)
+
+    Iterating yields one segment dict per row (built on the fly) so code written for
+    lists of segment dicts keeps working. rows() is the cheaper tuple based iteration.
+    """
+
+    __slots__ = ("start", "end", "speaker_ids", "speakers", "texts", "errors")
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        speaker_ids: np.ndarray,
+        speakers: list[str],
+        texts: list[str],
+        errors: list[str | None]
+    ):
+        self.start = start
+        self.end = end
+        self.speaker_ids = speaker_ids
+        self.speakers = speakers
+        self.texts = texts
+        self.errors = errors
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[dict]) -> "SegmentColumns":
+        """
+        Builds columns from segment dicts (speaker, start, end, text, optional error)
+        """
+        builder = SegmentColumnsBuilder()
+        for segment in segments:
+            builder.append(
+                segment.get("speaker", "Unknown"),
+                segment.get("start", 0.0),
+                segment.get("end", 0.0),
+                segment.get("text", ""),
+                segment.get("error")
+            )
+        return builder.build()
+
+    @classmethod
+    def coerce(cls, segments: "SegmentColumns | Iterable[dict]") -> "SegmentColumns":
+        """
+        Returns columns as is, converts segment dicts
+        """
+        return segments if isinstance(segments, SegmentColumns) else cls.from_dicts(segments)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def rows(self) -> Iterator[tuple[str, float, float, str, str | None]]:
+        """
+        (speaker, start, end, text, error) per segment
+        """
+        speakers = self.speakers
+        return zip(
+            (speakers[speaker_id] for speaker_id in self.speaker_ids.tolist()),
+            self.start.tolist(),
+            self.end.tolist(),
+            self.texts,
+            self.errors
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        for speaker, start, end, text, error in self.rows():
+            segment = {"speaker": speaker, "start": start, "end": end, "text": text}
+            if error is not None:
+                segment["error"] = error
+            yield segment
+
+    def to_dicts(self) -> list[dict]:
+        return list(self)
+
+    def take(self, indices: np.ndarray) -> "SegmentColumns":
+        """
+        New columns with the rows at `indices` (in that order)
+        """
+        index_list = indices.tolist()
+        return SegmentColumns(
+            self.start[indices],
+            self.end[indices],
+            self.speaker_ids[indices],
+            self.speakers,
+            [self.texts[i] for i in index_list],
+            [self.errors[i] for i in index_list]
+        )
+
+    def sorted_by_start(self) -> "SegmentColumns":
+        """
+        Rows sorted by start time (stable, equal starts keep their order)
+        """
+        return self.take(np.argsort(self.start, kind="stable"))
+
+    def to_columns(self) -> dict[str, Any]:
+        """
+        Columnar response payload, speaker ids index into "speakers", "errors" only lists failed rows
+        """
+        return {
+            "start": self.start,
+            "end": self.end,
+            "speaker": self.speaker_ids,
+            "speakers": self.speakers,
+            "text": self.texts,
+            "errors": {str(i): error for i, error in enumerate(self.errors) if error is not None}
+        }
+
+    def fingerprint(self) -> str:
+        """
+        Content hash (cache keys), equal segments give equal fingerprints however they were built
+        """
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(self.start).tobytes())
+        digest.update(np.ascontiguousarray(self.end).tobytes())
+        for speaker, _, _, text, error in self.rows():
+            digest.update(f"{speaker}\x1f{text}\x1f{error or ''}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
+
+class SegmentColumnsBuilder:
+    """
+    Appends segments row by row into plain lists, then builds the arrays once
+    """
+
+    def __init__(self):
+        self._start = []
+        self._end = []
+        self._speaker_ids = []
+        self._speaker_index = {}
+        self._texts = []
+        self._errors = []
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def append(self, speaker: str, start: float, end: float, text: str, error: str | None = None):
+        speaker_id = self._speaker_index.setdefault(speaker, len(self._speaker_index))
+        self._speaker_ids.append(speaker_id)
+        self._start.append(start)
+        self._end.append(end)
+        self._texts.append(text)
+        self._errors.append(error)
+
+    def build(self) -> SegmentColumns:
+        return SegmentColumns(
+            np.asarray(self._start, dtype=np.float64),
+            np.asarray(self._end, dtype=np.float64),
+            np.asarray(self._speaker_ids, dtype=np.int32),
+            list(self._speaker_index),
+            self._texts,
+            self._errors
+        )
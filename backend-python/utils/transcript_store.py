@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from utils.segments import SegmentColumns, SegmentColumnsBuilder
+
+# --- Server side transcript store
+# /transcribe_and_diarize keeps the merged segments here under a transcript id, so /summarize and /ask
+# can reference them instead of the client uploading them again, and clients can page through
+# time ranges / speakers of long recordings (GET /transcripts/{id}/segments) instead of downloading everything.
+#
+# Embedded SQLite: one row per segment, indexed on (transcript_id, start) and (transcript_id, speaker, start),
+# so range queries only touch the rows they return whatever the transcript size.
+TRANSCRIPT_DB_PATH = os.getenv("TRANSCRIPT_DB_PATH", ".cache/transcripts.sqlite3")
+TRANSCRIPT_STORE_MAX = int(os.getenv("TRANSCRIPT_STORE_MAX", "1000")) # Transcripts kept (oldest dropped first)
+TRANSCRIPT_STORE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_STORE_TTL_SECONDS", str(24 * 3600))) # Expiry after creation
+SEGMENT_PAGE_MAX = 1000 # Max segments per page
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    transcript_id TEXT PRIMARY KEY,
+    owner TEXT,
+    created REAL NOT NULL,
+    segment_count INTEGER NOT NULL,
+    max_segment_seconds REAL NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_created ON transcripts (created);
+
+CREATE TABLE IF NOT EXISTS segments (
+    transcript_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    speaker TEXT NOT NULL,
+    text TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (transcript_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_segments_start ON segments (transcript_id, start);
+CREATE INDEX IF NOT EXISTS idx_segments_speaker ON segments (transcript_id, speaker, start);
+"""
+
+
+class TranscriptStore:
+    """
+    SQLite transcript store, bounded by count and age (TTL).
+    Every transcript belongs to the user that created it, other users can't read it.
+    One connection per thread, WAL mode so readers don't block the writer.
+    """
+
+    def __init__(self, db_path: str, max_transcripts: int, ttl_seconds: int):
+        """
+        Args:
+            db_path (str): SQLite file (":memory:" is not shared between threads, use a file).
+            max_transcripts (int): Max transcripts held.
+            ttl_seconds (int): Seconds after which a transcript expires.
+        """
+        self.db_path = db_path
+        self.max_transcripts = max_transcripts
+        self.ttl_seconds = ttl_seconds
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _evict(self, connection: sqlite3.Connection):
+        """ Deletes expired transcripts and the oldest ones over the count limit (inside the caller's transaction) """
+        expired_ids = [row[0] for row in connection.execute(
+            "SELECT transcript_id FROM transcripts WHERE created < ?",
+            (time.time() - self.ttl_seconds,)
+        )]
+        expired_ids += [row[0] for row in connection.execute(
+            "SELECT transcript_id FROM transcripts WHERE created >= ? ORDER BY created DESC LIMIT -1 OFFSET ?",
+            (time.time() - self.ttl_seconds, self.max_transcripts)
+        )]
+        for transcript_id in expired_ids:
+            connection.execute("DELETE FROM segments WHERE transcript_id = ?", (transcript_id,))
+            connection.execute("DELETE FROM transcripts WHERE transcript_id = ?", (transcript_id,))
+
+    def save(self, segments: SegmentColumns, owner: str | None, **metadata) -> str:
+        """
+        Stores merged segments (one transaction, bulk insert), returns the new transcript id
+
+        Args:
+            segments (SegmentColumns): Merged transcription/diarization segments.
+            owner (str | None): User id of the creator.
+            **metadata: Extra JSON-serializable fields kept with the transcript (e.g. language).
+        """
+        transcript_id = uuid.uuid4().hex
+        durations = segments.end - segments.start
+        max_segment_seconds = float(durations.max()) if len(segments) else 0.0
+
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute(
+                "INSERT INTO transcripts VALUES (?, ?, ?, ?, ?, ?)",
+                (transcript_id, owner, time.time(), len(segments), max(max_segment_seconds, 0.0), json.dumps(metadata))
+            )
+            connection.executemany(
+                "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (transcript_id, seq, start, end, speaker, text, error)
+                    for seq, (speaker, start, end, text, error) in enumerate(segments.rows())
+                )
+            )
+            self._evict(connection)
+        return transcript_id
+
+    def get(self, transcript_id: str, owner: str | None) -> dict | None:
+        """
+        Returns the transcript's metadata (not its segments), None if it is unknown, expired or someone else's
+        """
+        row = self._connection().execute(
+            "SELECT owner, created, segment_count, max_segment_seconds, metadata FROM transcripts WHERE transcript_id = ?",
+            (transcript_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        stored_owner, created, segment_count, max_segment_seconds, metadata = row
+        if time.time() - created > self.ttl_seconds or stored_owner != owner:
+            return None
+
+        return {
+            "transcript_id": transcript_id,
+            "created": created,
+            "segment_count": segment_count,
+            "max_segment_seconds": max_segment_seconds,
+            **json.loads(metadata)
+        }
+
+    def load_segments(self, transcript_id: str) -> SegmentColumns:
+        """
+        All segments of a transcript, in start order (check access with get() first)
+        """
+        builder = SegmentColumnsBuilder()
+        for speaker, start, end, text, error in self._connection().execute(
+            "SELECT speaker, start, end, text, error FROM segments WHERE transcript_id = ? ORDER BY start, seq",
+            (transcript_id,)
+        ):
+            builder.append(speaker, start, end, text, error)
+        return builder.build()
+
+    def query_segments(
+        self,
+        transcript: dict,
+        time_from: float | None = None,
+        time_to: float | None = None,
+        speaker: str | None = None,
+        limit: int = 100,
+        cursor: str | None = None
+    ) -> tuple[SegmentColumns, str | None]:
+        """
+        One page of the segments overlapping [time_from, time_to), optionally of one speaker, in start order.
+        Keyset pagination: the cursor is the (start, seq) of the last returned segment, so deep pages
+        cost the same as the first one.
+
+        Args:
+            transcript (dict): Result of get() (access already checked).
+            time_from / time_to (float | None): Time range in seconds, open ended when None.
+            speaker (str | None): Only this speaker's segments.
+            limit (int): Page size (capped at SEGMENT_PAGE_MAX).
+            cursor (str | None): next_cursor of the previous page.
+
+        Returns:
+            tuple[SegmentColumns, str | None]: The page, and the cursor of the next page (None on the last page).
+
+        Raises:
+            ValueError: Malformed cursor.
+        """
+        limit = max(1, min(limit, SEGMENT_PAGE_MAX))
+        conditions = ["transcript_id = ?"]
+        params = [transcript["transcript_id"]]
+
+        if speaker is not None:
+            conditions.append("speaker = ?")
+            params.append(speaker)
+        if time_from is not None:
+            # Overlap means end > from, bounding start too keeps the scan on the index range
+            conditions.append("start >= ? AND end > ?")
+            params += [time_from - transcript["max_segment_seconds"], time_from]
+        if time_to is not None:
+            conditions.append("start < ?")
+            params.append(time_to)
+        if cursor:
+            try:
+                cursor_start, cursor_seq = cursor.split(":")
+                cursor_start, cursor_seq = float(cursor_start), int(cursor_seq)
+            except ValueError:
+                raise ValueError(f"Invalid cursor '{cursor}'")
+            conditions.append("(start > ? OR (start = ? AND seq > ?))")
+            params += [cursor_start, cursor_start, cursor_seq]
+
+        rows = self._connection().execute(
+            f"SELECT seq, speaker, start, end, text, error FROM segments WHERE {' AND '.join(conditions)} "
+            "ORDER BY start, seq LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1][2]!r}:{rows[-1][0]}"
+
+        builder = SegmentColumnsBuilder()
+        for _, row_speaker, start, end, text, error in rows:
+            builder.append(row_speaker, start, end, text, error)
+        return builder.build(), next_cursor
+
+
+transcript_store = TranscriptStore(TRANSCRIPT_DB_PATH, TRANSCRIPT_STORE_MAX, TRANSCRIPT_STORE_TTL_SECONDS)